@@ -0,0 +1,40 @@
+"""Strong ETags and If-None-Match handling for conditional GETs."""
+import hashlib
+from typing import Optional
+
+from fastapi import Request, Response
+from prometheus_client import Counter
+
+CONDITIONAL_GETS = Counter(
+    "dcm_conditional_get_total",
+    "GETs on ETag-enabled routes by outcome (not_modified / modified / unconditional)",
+    ["route", "outcome"],
+)
+
+
+def make_etag(*parts) -> str:
+    """Build a strong ETag from the values that version a representation."""
+    digest = hashlib.sha1("|".join(str(p) for p in parts).encode()).hexdigest()[:24]
+    return f'"{digest}"'
+
+
+def not_modified(request: Request, etag: str, route: str) -> Optional[Response]:
+    """Return a 304 response if the request's If-None-Match matches *etag*, else None."""
+    header = request.headers.get("if-none-match")
+    if header is None:
+        CONDITIONAL_GETS.labels(route=route, outcome="unconditional").inc()
+        return None
+
+    # If-None-Match uses weak comparison, so W/"x" matches "x"
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    if "*" in candidates or etag in candidates:
+        CONDITIONAL_GETS.labels(route=route, outcome="not_modified").inc()
+        return Response(status_code=304, headers=cache_headers(etag))
+
+    CONDITIONAL_GETS.labels(route=route, outcome="modified").inc()
+    return None
+
+
+def cache_headers(etag: str) -> dict[str, str]:
+    # no-cache: clients may store the body but must revalidate (cheaply, via 304)
+    return {"ETag": etag, "Cache-Control": "no-cache"}
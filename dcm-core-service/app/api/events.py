@@ -0,0 +1,51 @@
+from typing import AsyncIterator
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+
+from ..config import settings
+from ..services import event_broadcaster
+
+router = APIRouter(tags=["events"])
+
+
+@router.get("/events")
+async def stream_events():
+    """Server-Sent Events feed of catalogue changes.
+
+    Events: `study_ingested` and `study_deleted`, each with the study's
+    identifiers and the `rollup_delta` rows ({dimension, key, count}) it added
+    to the /statistics rollup, and `resync` when this connection fell too far
+    behind — refetch rather than applying deltas. Comment lines keep idle
+    connections open.
+    """
+    if not event_broadcaster.has_capacity():
+        raise HTTPException(
+            status_code=503,
+            detail="Too many event subscribers",
+            headers={"Retry-After": str(settings.sse_retry_seconds)},
+        )
+    return StreamingResponse(
+        _stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def _stream() -> AsyncIterator[bytes]:
+    # Subscribed here, not in the endpoint: a response that is never iterated (client
+    # gone, send failed) then never registers, so nothing is left to unsubscribe
+    retry = b"retry: %d\n\n" % (settings.sse_retry_seconds * 1000)
+    try:
+        subscription = event_broadcaster.subscribe()
+    except event_broadcaster.TooManySubscribers:
+        # Filled up since the endpoint checked; the client reconnects after `retry`
+        yield retry
+        return
+    try:
+        yield retry
+        while True:
+            event = await subscription.next(settings.sse_heartbeat_seconds)
+            yield event.encode() if event is not None else b": keepalive\n\n"
+    finally:
+        subscription.close()
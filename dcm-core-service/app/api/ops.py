@@ -0,0 +1,11 @@
+from fastapi import APIRouter, Query
+
+from ..services import query_metrics
+
+router = APIRouter(prefix="/ops", tags=["ops"])
+
+
+@router.get("/slow-queries")
+async def slow_queries(limit: int = Query(50, ge=1, le=500)):
+    """Recent statements slower than `slow_query_ms`, newest first, with sampled plans."""
+    return query_metrics.recent_slow_queries()[:limit]
@@ -2,8 +2,12 @@ from fastapi import APIRouter
 from .studies import router as studies_router
 from .statistics import router as statistics_router
 from .webhook import router as webhook_router
+from .events import router as events_router
+from .ops import router as ops_router
 
 router = APIRouter()
 router.include_router(studies_router)
 router.include_router(statistics_router)
 router.include_router(webhook_router)
+router.include_router(events_router)
+router.include_router(ops_router)
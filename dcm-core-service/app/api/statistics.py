@@ -1,129 +1,286 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy import select, func, case, text
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Awaitable, Callable, Optional
+
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import select, func, any_, bindparam, cast, literal_column, text
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.types import Date, Text
 
 from ..database import get_db
-from ..models import Study, Series, Instance
+from ..config import settings
+from ..models import Study, StatisticsRollup, StatisticsSketch
+from ..services import hll, query_cache, request_timing, stats_rollup
+from ..services.concurrency_limit import ConcurrencyLimiter
+from ..services.request_budget import budget
+from .conditional import make_etag, not_modified, cache_headers
 
 router = APIRouter(prefix="/statistics", tags=["statistics"])
 
+# Shared by all /statistics routes; only requests that miss the query cache take a slot
+_LIMIT = ConcurrencyLimiter(
+    "statistics", settings.limit_statistics_concurrency, settings.limit_statistics_queue,
+    settings.limit_queue_timeout_seconds,
+)
 
-@router.get("")
-async def get_statistics(db: AsyncSession = Depends(get_db)):
-    # --- Totals ---
-    total_studies = await db.scalar(
-        select(func.count(Study.id)).where(Study.deleted_at.is_(None))
-    )
-    total_series = await db.scalar(
-        select(func.count(Series.id)).where(Series.deleted_at.is_(None))
-    )
-    total_instances = await db.scalar(
-        select(func.count(Instance.id)).where(Instance.deleted_at.is_(None))
-    )
 
-    # --- Studies by modality (count distinct studies that have a series with given modality) ---
-    modality_result = await db.execute(
-        select(Series.modality, func.count(Series.study_id.distinct()).label("count"))
-        .where(Series.deleted_at.is_(None))
-        .group_by(Series.modality)
-        .order_by(func.count(Series.study_id.distinct()).desc())
-    )
-    studies_by_modality = [
-        {"modality": row.modality or "Unknown", "count": row.count}
-        for row in modality_result
-    ]
-
-    # --- Studies by institution (top 10) ---
-    institution_result = await db.execute(
-        select(Study.institution_name, func.count().label("count"))
-        .where(Study.deleted_at.is_(None), Study.institution_name.is_not(None))
-        .group_by(Study.institution_name)
-        .order_by(func.count().desc())
-        .limit(10)
-    )
-    studies_by_institution = [
-        {"institution": row.institution_name, "count": row.count}
-        for row in institution_result
-    ]
-
-    # --- Studies by month (last 24 months, sorted ascending) ---
-    # Use positional GROUP BY/ORDER BY (GROUP BY 1) to avoid asyncpg re-parametrizing
-    # the same literal 'YYYY-MM' as separate bind vars which confuses PostgreSQL.
-    month_result = await db.execute(
-        select(
-            func.to_char(Study.study_date, "YYYY-MM").label("year_month"),
-            func.count().label("count"),
+_SEX_LABELS = {"M": "Male", "F": "Female"}
+
+
+def _by_count(counts: dict[str, int], limit: Optional[int] = None) -> list[tuple[str, int]]:
+    return sorted(counts.items(), key=lambda kv: (-kv[1], kv[0]))[:limit]
+
+
+# Response section -> (rollup dimension, formatter of that dimension's key -> count map)
+_SECTIONS: dict[str, tuple[str, Callable[[dict[str, int]], object]]] = {
+    "totals": (stats_rollup.TOTALS, lambda c: {
+        "studies": c.get("studies", 0),
+        "series": c.get("series", 0),
+        "instances": c.get("instances", 0),
+    }),
+    "studies_by_modality": (stats_rollup.MODALITY, lambda c: [
+        {"modality": key or "Unknown", "count": n} for key, n in _by_count(c)
+    ]),
+    # Top 10
+    "studies_by_institution": (stats_rollup.INSTITUTION, lambda c: [
+        {"institution": key, "count": n} for key, n in _by_count(c, 10)
+    ]),
+    # Latest 24 months, ascending (use /statistics/timeseries for other ranges)
+    "studies_by_month": (stats_rollup.MONTH, lambda c: [
+        {"year_month": key, "count": n} for key, n in sorted(c.items())[-24:]
+    ]),
+    "sex_distribution": (stats_rollup.SEX, lambda c: [
+        {"sex": _SEX_LABELS.get(key, "Unknown"), "count": n} for key, n in c.items()
+    ]),
+    # Top 10, from series
+    "body_parts": (stats_rollup.BODY_PART, lambda c: [
+        {"body_part": key, "count": n} for key, n in _by_count(c, 10)
+    ]),
+    # Instance count per series – histogram buckets
+    "instance_distribution": (stats_rollup.INSTANCE_BUCKET, lambda c: [
+        {"bucket": key, "count": n} for key, n in sorted(c.items())
+    ]),
+}
+
+
+# Estimated from HyperLogLog sketches rather than read from the rollup
+_UNIQUE_PATIENTS = "unique_patients"
+_ALL_SECTIONS = (*_SECTIONS, _UNIQUE_PATIENTS)
+
+
+def _parse_sections(value: Optional[str]) -> tuple[str, ...]:
+    if not value:
+        return _ALL_SECTIONS
+    requested = {name.strip() for name in value.split(",") if name.strip()}
+    unknown = requested - set(_ALL_SECTIONS)
+    if unknown:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Unknown sections: {', '.join(sorted(unknown))}; expected any of {', '.join(_ALL_SECTIONS)}",
         )
-        .where(Study.deleted_at.is_(None), Study.study_date.is_not(None))
-        .group_by(text("1"))
-        .order_by(text("1"))
-        .limit(24)
+    # Canonical order, so equivalent requests share a cache entry and ETag
+    return tuple(name for name in _ALL_SECTIONS if name in requested)
+
+
+@router.get("", dependencies=[Depends(budget("statement_timeout_statistics_ms"))])
+async def get_statistics(
+    request: Request,
+    sections: Optional[str] = Query(
+        None, description="Comma-separated sections to return (default: all), e.g. totals,studies_by_modality"
+    ),
+    db: AsyncSession = Depends(get_db),
+):
+    """Dashboard aggregates, read from the statistics rollup.
+
+    `unique_patients` holds HyperLogLog estimates of distinct patient IDs
+    (overall, per institution, modality and month) with their relative
+    `standard_error`; see `hll_precision`. Sketches are only rebuilt, never
+    decremented, so patients of deleted studies count until the next rebuild.
+    """
+    wanted = _parse_sections(sections)
+
+    return await _cached_json(
+        request, ("statistics", wanted), "statistics", lambda: _compute_statistics(wanted, db)
     )
-    studies_by_month = [
-        {"year_month": row.year_month, "count": row.count}
-        for row in month_result
-    ]
-
-    # --- Sex distribution ---
-    sex_result = await db.execute(
-        select(Study.patient_sex, func.count().label("count"))
-        .where(Study.deleted_at.is_(None))
-        .group_by(Study.patient_sex)
+
+
+@router.get("/timeseries", dependencies=[Depends(budget("statement_timeout_statistics_ms"))])
+async def get_timeseries(
+    request: Request,
+    bucket: str = Query("month", pattern="^(day|week|month|year)$"),
+    date_from: Optional[date] = Query(None, alias="from", description="First study date included (YYYY-MM-DD)"),
+    date_to: Optional[date] = Query(None, alias="to", description="Last study date included (YYYY-MM-DD)"),
+    modality: Optional[str] = None,
+    institution: Optional[str] = Query(None, description="Exact institution name"),
+    db: AsyncSession = Depends(get_db),
+):
+    """Studies per day/week/month/year by study date, oldest first.
+
+    Each point's `period_start` is the first day of its bucket (weeks start on
+    Monday, as in `date_trunc`). Without modality/institution filters the counts
+    come from the per-day rollup; with them, from an aggregate over `studies`.
+    """
+    key = ("timeseries", bucket, date_from, date_to, modality and modality.upper(), institution)
+    return await _cached_json(
+        request, key, "statistics_timeseries",
+        lambda: _compute_timeseries(bucket, date_from, date_to, modality, institution, db),
     )
-    sex_labels = {"M": "Male", "F": "Female"}
-    sex_distribution = [
-        {"sex": sex_labels.get(row.patient_sex or "", "Unknown"), "count": row.count}
-        for row in sex_result
-    ]
-
-    # --- Body parts examined (top 10, from series) ---
-    body_part_result = await db.execute(
-        select(Series.body_part_examined, func.count().label("count"))
-        .where(
-            Series.deleted_at.is_(None),
-            Series.body_part_examined.is_not(None),
-            Series.body_part_examined != "",
+
+
+async def _cached_json(
+    request: Request, key: tuple, route: str, compute: Callable[[], Awaitable[dict]]
+) -> Response:
+    """Serve *compute*'s result from the query cache, with ETag revalidation.
+
+    Routes using this read the primary (`get_db`), not the replica: a body loaded
+    from a replica that lags the commit which bumped the generation would be cached
+    and served until the TTL.
+    """
+    async def load() -> query_cache.CachedBody:
+        async with _LIMIT.slot():
+            payload = await compute()
+        with request_timing.measure("encode"):
+            body = orjson.dumps(payload)
+        # The body is encoded once per catalogue change, so hash it for a strong ETag
+        return query_cache.CachedBody(body, make_etag(body))
+
+    cached = await query_cache.get_or_load(key, load, route=route)
+    if (unchanged := not_modified(request, cached.etag, route)) is not None:
+        return unchanged
+    return Response(cached.body, media_type="application/json", headers=cache_headers(cached.etag))
+
+
+async def _compute_statistics(sections: tuple[str, ...], db: AsyncSession) -> dict:
+    # Everything comes from the maintained rollup tables (see services/stats_rollup.py);
+    # their size depends on the number of distinct keys, not on the archive.
+    rollup_sections = [name for name in sections if name in _SECTIONS]
+    counts: dict[str, dict[str, int]] = defaultdict(dict)
+    if rollup_sections:
+        dimensions = [_SECTIONS[name][0] for name in rollup_sections]
+        result = await db.execute(
+            select(StatisticsRollup.dimension, StatisticsRollup.key, StatisticsRollup.count)
+            .where(
+                StatisticsRollup.count > 0,
+                StatisticsRollup.dimension == any_(bindparam("dimensions", dimensions, type_=ARRAY(Text))),
+            )
+            .execution_options(statement_name="statistics_rollup", explain=True)
         )
-        .group_by(Series.body_part_examined)
-        .order_by(func.count().desc())
-        .limit(10)
-    )
-    body_parts = [
-        {"body_part": row.body_part_examined, "count": row.count}
-        for row in body_part_result
-    ]
-
-    # --- Instance count per series – histogram buckets ---
-    instance_dist_result = await db.execute(
-        select(
-            case(
-                (Series.num_instances <= 10, "1–10"),
-                (Series.num_instances <= 50, "11–50"),
-                (Series.num_instances <= 100, "51–100"),
-                (Series.num_instances <= 500, "101–500"),
-                else_="500+",
-            ).label("bucket"),
-            func.count().label("count"),
+        for row in result:
+            counts[row.dimension][row.key] = row.count
+
+    stats = {name: _SECTIONS[name][1](counts[_SECTIONS[name][0]]) for name in rollup_sections}
+    if _UNIQUE_PATIENTS in sections:
+        stats[_UNIQUE_PATIENTS] = await _unique_patients(db)
+    return stats
+
+
+async def _unique_patients(db: AsyncSession) -> dict:
+    precision = settings.hll_precision
+    estimates: dict[str, dict[str, int]] = defaultdict(dict)
+    result = await db.execute(select(StatisticsSketch.dimension, StatisticsSketch.key, StatisticsSketch.registers))
+    for row in result:
+        estimates[row.dimension][row.key] = hll.merged([row.registers], precision).count()
+
+    return {
+        "total": estimates[stats_rollup.TOTALS].get("patients", 0),
+        "standard_error": round(hll.standard_error(precision), 4),
+        "by_institution": [
+            {"institution": key, "patients": n} for key, n in _by_count(estimates[stats_rollup.INSTITUTION], 10)
+        ],
+        "by_modality": [
+            {"modality": key, "patients": n} for key, n in _by_count(estimates[stats_rollup.MODALITY])
+        ],
+        "by_month": [
+            {"year_month": key, "patients": n} for key, n in sorted(estimates[stats_rollup.MONTH].items())[-24:]
+        ],
+    }
+
+
+@router.get("/unique-patients", dependencies=[Depends(budget("statement_timeout_statistics_ms"))])
+async def get_unique_patients(
+    request: Request,
+    month_from: Optional[str] = Query(None, alias="from", pattern=r"^\d{4}-\d{2}$", description="First month (YYYY-MM)"),
+    month_to: Optional[str] = Query(None, alias="to", pattern=r"^\d{4}-\d{2}$", description="Last month (YYYY-MM)"),
+    db: AsyncSession = Depends(get_db),
+):
+    """Estimated distinct patients with studies in a range of months.
+
+    Merges the per-month HyperLogLog sketches, so the range is month-granular.
+    """
+    async def compute() -> dict:
+        q = select(StatisticsSketch.registers).where(StatisticsSketch.dimension == stats_rollup.MONTH)
+        if month_from:
+            q = q.where(StatisticsSketch.key >= month_from)
+        if month_to:
+            q = q.where(StatisticsSketch.key <= month_to)
+        result = await db.execute(q)
+        precision = settings.hll_precision
+        return {
+            "from": month_from,
+            "to": month_to,
+            "patients": hll.merged(result.scalars(), precision).count(),
+            "standard_error": round(hll.standard_error(precision), 4),
+        }
+
+    return await _cached_json(request, ("unique_patients", month_from, month_to), "statistics_unique_patients", compute)
+
+
+def _period_start(day: date, bucket: str) -> date:
+    """Python equivalent of date_trunc(bucket, day) for the rollup path."""
+    if bucket == "week":
+        return day - timedelta(days=day.weekday())
+    if bucket == "month":
+        return day.replace(day=1)
+    if bucket == "year":
+        return day.replace(month=1, day=1)
+    return day
+
+
+async def _compute_timeseries(
+    bucket: str,
+    date_from: Optional[date],
+    date_to: Optional[date],
+    modality: Optional[str],
+    institution: Optional[str],
+    db: AsyncSession,
+) -> dict:
+    counts: dict[date, int] = defaultdict(int)
+    if modality is None and institution is None:
+        # ISO date keys sort like dates, so the range is a key range on the primary key
+        q = select(StatisticsRollup.key, StatisticsRollup.count).where(
+            StatisticsRollup.dimension == stats_rollup.DAY, StatisticsRollup.count > 0
         )
-        .where(Series.deleted_at.is_(None))
-        .group_by("bucket")
-        .order_by("bucket")
-    )
-    instance_distribution = [
-        {"bucket": row.bucket, "count": row.count}
-        for row in instance_dist_result
-    ]
+        if date_from:
+            q = q.where(StatisticsRollup.key >= date_from.isoformat())
+        if date_to:
+            q = q.where(StatisticsRollup.key <= date_to.isoformat())
+        for row in await db.execute(q):
+            counts[_period_start(date.fromisoformat(row.key), bucket)] += row.count
+    else:
+        # bucket is one of four fixed words (validated above); inline it so the
+        # select and GROUP BY 1 don't each get their own bind parameter
+        period = cast(func.date_trunc(literal_column(f"'{bucket}'"), Study.study_date), Date)
+        q = (
+            select(period.label("period_start"), func.count().label("count"))
+            .where(Study.deleted_at.is_(None), Study.study_date.is_not(None))
+            .group_by(text("1"))
+        )
+        if date_from:
+            q = q.where(Study.study_date >= date_from)
+        if date_to:
+            q = q.where(Study.study_date <= date_to)
+        if modality:
+            q = q.where(Study.modalities_in_study.overlap([modality.upper()]))
+        if institution:
+            q = q.where(Study.institution_name == institution)
+        for row in await db.execute(q):
+            counts[row.period_start] += row.count
 
     return {
-        "totals": {
-            "studies": total_studies or 0,
-            "series": total_series or 0,
-            "instances": total_instances or 0,
-        },
-        "studies_by_modality": studies_by_modality,
-        "studies_by_institution": studies_by_institution,
-        "studies_by_month": studies_by_month,
-        "sex_distribution": sex_distribution,
-        "body_parts": body_parts,
-        "instance_distribution": instance_distribution,
+        "bucket": bucket,
+        "from": date_from,
+        "to": date_to,
+        "points": [{"period_start": start, "count": n} for start, n in sorted(counts.items())],
     }
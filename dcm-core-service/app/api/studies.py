@@ -1,13 +1,30 @@
-from datetime import date
-from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy import select, func
-from sqlalchemy.orm import selectinload
-from sqlalchemy.ext.asyncio import AsyncSession
+import csv
+import io
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, datetime, time
+from typing import AsyncIterator, Optional, Union
 
-from ..database import get_db
-from ..models import Study, Series
-from ..schemas import StudyOut, StudyListOut
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import Response
+from sqlalchemy import select, func, or_, exists, any_, bindparam
+from sqlalchemy.dialects.postgresql import ARRAY, UUID
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.types import Text
+
+from ..config import settings
+from ..database import get_db, get_read_db, use_replica, AsyncSessionLocal, ReadSessionLocal
+from ..models import Study, Series, Instance
+from ..schemas import (
+    StudyOut, SeriesOut, StudyListOut, StudySummaryListOut, InstanceListOut,
+    StudyBatchRequest, StudyBatchOut, StudySummaryBatchOut,
+)
+from ..services import count_cache, query_cache, request_timing
+from ..services.concurrency_limit import ConcurrencyLimiter, LimitedStreamingResponse
+from ..services.request_budget import budget
+from ..services.request_timing import TimedORJSONResponse
+from .conditional import make_etag, not_modified, cache_headers
 
 
 def _parse_query_date(val: Optional[str]) -> Optional[date]:
@@ -19,63 +36,402 @@ def _parse_query_date(val: Optional[str]) -> Optional[date]:
     except ValueError:
         return None
 
+
+def _parse_tag_filters(values: list[str], param: str) -> tuple[tuple[str, str], ...]:
+    """Parse repeated `Name:Value` query parameters into (name, value) pairs."""
+    pairs = []
+    for val in values:
+        name, sep, tag_value = val.partition(":")
+        if not sep or not name.strip():
+            raise HTTPException(status_code=422, detail=f"{param} must be Name:Value, got {val!r}")
+        pairs.append((name.strip(), tag_value))
+    return tuple(pairs)
+
 router = APIRouter(prefix="/studies", tags=["studies"])
 
 
-@router.get("", response_model=StudyListOut)
-async def list_studies(
-    page: int = Query(1, ge=1),
-    page_size: int = Query(20, ge=1, le=200),
+# Columns selected by view=summary, in StudySummaryOut order
+_SUMMARY_COLUMNS = (
+    Study.id, Study.study_uid, Study.orthanc_id, Study.patient_id, Study.patient_name,
+    Study.patient_sex, Study.study_date, Study.study_description, Study.institution_name,
+    Study.num_series, Study.num_instances, Study.modalities_in_study.label("modalities"),
+    Study.ingested_at, Study.deleted_at,
+)
+
+# Full-view projections taken field-for-field from the response schemas, so Core
+# rows can be encoded as-is without building ORM objects or validating per row
+_STUDY_OUT_COLUMNS = tuple(Study.__table__.c[name] for name in StudyOut.model_fields if name != "series")
+_SERIES_OUT_COLUMNS = tuple(Series.__table__.c[name] for name in SeriesOut.model_fields)
+
+# Free-text columns matched by q=; each has a pg_trgm GIN index so '%…%' ILIKE is index-backed
+_SEARCH_COLUMNS = (Study.patient_name, Study.study_description, Study.accession_number, Study.institution_name)
+
+_EXPORT_FIELDS = [c.key for c in _SUMMARY_COLUMNS]
+_EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def _summary_item(row) -> dict:
+    return {**row, "modalities": row["modalities"] or []}
+
+
+async def _with_series(studies: list[dict], db: AsyncSession) -> list[dict]:
+    """Attach each study's series as plain dicts, loaded with one array-bound query."""
+    if not studies:
+        return studies
+    study_ids = [s["id"] for s in studies]
+    result = await db.execute(
+        select(Series.study_id, *_SERIES_OUT_COLUMNS)
+        .where(Series.study_id == any_(bindparam("study_ids", study_ids, type_=ARRAY(UUID(as_uuid=True)))))
+    )
+    by_study = defaultdict(list)
+    for row in result.mappings().all():
+        series = dict(row)
+        by_study[series.pop("study_id")].append(series)
+    return [{**s, "series": by_study.get(s["id"], [])} for s in studies]
+
+
+@dataclass(frozen=True)
+class StudyFilters:
+    """Query-string filters shared by every endpoint that lists studies."""
+    modality: Optional[str] = None
+    patient_sex: Optional[str] = None
+    study_date_from: Optional[date] = None
+    study_date_to: Optional[date] = None
+    institution_name: Optional[str] = None
+    q: Optional[str] = None
+    tags: tuple[tuple[str, str], ...] = ()
+    series_tags: tuple[tuple[str, str], ...] = ()
+    include_deleted: bool = False
+
+    def cache_key(self) -> tuple:
+        return (
+            self.modality and self.modality.upper(),
+            self.patient_sex and self.patient_sex.upper()[:1],
+            self.study_date_from,
+            self.study_date_to,
+            self.institution_name,
+            self.q,
+            self.tags,
+            self.series_tags,
+            self.include_deleted,
+        )
+
+    def relevance(self):
+        """Best trigram similarity of q across the search columns (NULL columns are skipped)."""
+        return func.greatest(*(func.similarity(col, self.q) for col in _SEARCH_COLUMNS))
+
+    def apply(self, q):
+        """Apply the filters to a select() rooted at Study."""
+        if not self.include_deleted:
+            q = q.where(Study.deleted_at.is_(None))
+
+        if self.patient_sex:
+            q = q.where(Study.patient_sex == self.patient_sex.upper()[:1])
+
+        if self.study_date_from:
+            q = q.where(Study.study_date >= self.study_date_from)
+
+        if self.study_date_to:
+            q = q.where(Study.study_date <= self.study_date_to)
+
+        if self.institution_name:
+            q = q.where(Study.institution_name.ilike(f"%{self.institution_name}%"))
+
+        if self.modality:
+            q = q.where(Study.modalities_in_study.overlap([self.modality.upper()]))
+
+        if self.q:
+            q = q.where(or_(*(col.ilike(f"%{self.q}%") for col in _SEARCH_COLUMNS)))
+
+        # JSONB containment (@>) so idx_studies_raw_tags / idx_series_raw_tags apply
+        for name, tag_value in self.tags:
+            q = q.where(Study.raw_main_dicom_tags.contains({name: tag_value}))
+
+        if self.series_tags:
+            q = q.where(exists(
+                select(Series.id).where(
+                    Series.study_id == Study.id,
+                    Series.deleted_at.is_(None),
+                    *(Series.raw_main_dicom_tags.contains({name: tag_value}) for name, tag_value in self.series_tags),
+                )
+            ))
+
+        return q
+
+
+def study_filters(
     modality: Optional[str] = None,
     patient_sex: Optional[str] = None,
     study_date_from: Optional[str] = None,
     study_date_to: Optional[str] = None,
     institution_name: Optional[str] = None,
+    q: Optional[str] = Query(None, description="Substring search over patient name, description, accession and institution"),
+    tag: list[str] = Query([], description="Study-level DICOM tag match, Name:Value (repeatable)"),
+    series_tag: list[str] = Query([], description="Match studies with a series carrying all these tags, Name:Value (repeatable)"),
     include_deleted: bool = False,
+) -> StudyFilters:
+    return StudyFilters(
+        modality=modality,
+        patient_sex=patient_sex,
+        study_date_from=_parse_query_date(study_date_from),
+        study_date_to=_parse_query_date(study_date_to),
+        institution_name=institution_name,
+        q=q.strip() if q and q.strip() else None,
+        tags=_parse_tag_filters(tag, "tag"),
+        series_tags=_parse_tag_filters(series_tag, "series_tag"),
+        include_deleted=include_deleted,
+    )
+
+
+@router.get(
+    "",
+    response_model=Union[StudyListOut, StudySummaryListOut],
+    response_class=TimedORJSONResponse,
+    dependencies=[Depends(budget("statement_timeout_studies_ms"))],
+)
+async def list_studies(
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1, le=200),
+    filters: StudyFilters = Depends(study_filters),
+    count: str = Query("exact", pattern="^(exact|estimate|none)$"),
+    view: str = Query("full", pattern="^(full|summary)$"),
+    rank: bool = Query(False, description="Order q= matches by trigram similarity"),
     db: AsyncSession = Depends(get_db),
 ):
-    q = select(Study).options(selectinload(Study.series))
+    """List studies.
 
-    if not include_deleted:
-        q = q.where(Study.deleted_at.is_(None))
+    `count` controls how `total` is produced: `exact` runs a full count for every
+    uncached page, `estimate` reuses a recent count for the same filters (see
+    `study_count_cache_ttl_seconds`), and `none` skips counting entirely —
+    use `has_more` to drive paging in that case.
 
-    if patient_sex:
-        q = q.where(Study.patient_sex == patient_sex.upper()[:1])
+    `view=summary` returns only the columns the studies table renders, including
+    the denormalized modality list, as plain rows without loading any series.
 
-    parsed_from = _parse_query_date(study_date_from)
-    if parsed_from:
-        q = q.where(Study.study_date >= parsed_from)
+    `q` searches patient name, description, accession and institution; with
+    `rank=true` the best matches come first.
 
-    parsed_to = _parse_query_date(study_date_to)
-    if parsed_to:
-        q = q.where(Study.study_date <= parsed_to)
+    Rows are fetched as Core mappings and encoded with orjson directly; their
+    shape is fixed by the column projections above, not validated per request.
+    Encoded pages are kept in the query cache until the next ingest or delete.
+    They are loaded from the primary: the cache is invalidated when the primary
+    commits, and a lagging replica read would otherwise be cached past that.
+    """
+    key = ("studies", page, page_size, filters.cache_key(), count, view, rank)
 
-    if institution_name:
-        q = q.where(Study.institution_name.ilike(f"%{institution_name}%"))
+    async def load() -> query_cache.CachedBody:
+        payload = await _list_studies_payload(page, page_size, filters, count, view, rank, db)
+        with request_timing.measure("encode"):
+            return query_cache.CachedBody(orjson.dumps(payload))
 
-    if modality:
-        q = q.join(Series, Series.study_id == Study.id)
-        q = q.where(Series.modality.ilike(modality))
-        q = q.distinct()
+    cached = await query_cache.get_or_load(key, load, route="studies")
+    return Response(cached.body, media_type="application/json")
 
-    total_result = await db.execute(select(func.count()).select_from(q.subquery()))
-    total = total_result.scalar_one()
 
-    q = q.offset((page - 1) * page_size).limit(page_size)
-    result = await db.execute(q)
-    studies = result.scalars().unique().all()
+async def _list_studies_payload(
+    page: int, page_size: int, filters: StudyFilters, count: str, view: str, rank: bool, db: AsyncSession
+) -> dict:
+    q = filters.apply(select(*(_SUMMARY_COLUMNS if view == "summary" else _STUDY_OUT_COLUMNS)))
 
-    return StudyListOut(total=total, page=page, page_size=page_size, items=list(studies))
+    total = None
+    if count == "estimate":
+        total = count_cache.get(filters.cache_key())
+    # Only a reused total can be stale; one counted just now is exact whatever was asked
+    total_is_estimate = total is not None
+    if total is None and count != "none":
+        count_q = filters.apply(select(Study.id))
+        total_result = await db.execute(
+            select(func.count()).select_from(count_q.subquery())
+            .execution_options(statement_name="studies_count", explain=True)
+        )
+        total = total_result.scalar_one()
+        if count == "estimate":
+            count_cache.put(filters.cache_key(), total)
 
+    if rank and filters.q:
+        q = q.order_by(filters.relevance().desc())
 
-@router.get("/{study_uid}", response_model=StudyOut)
-async def get_study(study_uid: str, db: AsyncSession = Depends(get_db)):
+    # Fetch one extra row so has_more is known without a count
+    q = q.offset((page - 1) * page_size).limit(page_size + 1)
+    result = await db.execute(q.execution_options(statement_name="studies_page", explain=True))
+    rows = list(result.mappings().all())
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+
+    if view == "summary":
+        items = [_summary_item(row) for row in rows]
+    else:
+        items = await _with_series([dict(row) for row in rows], db)
+
+    return {
+        "view": view,
+        "total": total,
+        "total_is_estimate": total_is_estimate,
+        "has_more": has_more,
+        "page": page,
+        "page_size": page_size,
+        "items": items,
+    }
+
+
+async def _export_rows(
+    filters: StudyFilters, fmt: str, session_factory: async_sessionmaker
+) -> AsyncIterator[Union[str, bytes]]:
+    """Yield the filtered studies as NDJSON or CSV, one fetch batch at a time.
+
+    Uses its own session: the request-scoped one from get_read_db is closed before a
+    StreamingResponse body is iterated.
+    """
+    q = filters.apply(select(*_SUMMARY_COLUMNS))
+    q = q.execution_options(yield_per=settings.export_batch_size)
+
+    if fmt == "csv":
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        writer.writerow(_EXPORT_FIELDS)
+        yield buf.getvalue()
+
+    async with session_factory() as db:
+        result = await db.stream(q)
+        async for batch in result.mappings().partitions():
+            if fmt == "csv":
+                buf = io.StringIO()
+                writer = csv.writer(buf)
+                for row in batch:
+                    writer.writerow([_csv_value(k, row[k]) for k in _EXPORT_FIELDS])
+                yield buf.getvalue()
+            else:
+                # orjson, like the JSON endpoints: ISO 8601 dates and timestamps
+                yield b"".join(
+                    orjson.dumps({**row, "modalities": row["modalities"] or []}) + b"\n"
+                    for row in batch
+                )
+
+
+def _csv_value(field: str, value):
+    if field == "modalities":
+        return "\\".join(value or [])
+    if isinstance(value, (date, time, datetime)):
+        return value.isoformat()
+    return value
+
+
+_EXPORT_LIMIT = ConcurrencyLimiter(
+    "export", settings.limit_export_concurrency, settings.limit_export_queue,
+    settings.limit_queue_timeout_seconds,
+)
+
+
+@router.get("/export")
+async def export_studies(
+    request: Request,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    filters: StudyFilters = Depends(study_filters),
+):
+    """Stream every study matching the /studies filters from a server-side cursor."""
+    # Held until the body has been streamed, not just until this function returns
+    await _EXPORT_LIMIT.acquire()
+    return LimitedStreamingResponse(
+        _export_rows(filters, format, ReadSessionLocal if use_replica(request) else AsyncSessionLocal),
+        limiter=_EXPORT_LIMIT,
+        media_type=_EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="studies.{format}"'},
+    )
+
+
+@router.post(
+    "/batch",
+    response_model=Union[StudyBatchOut, StudySummaryBatchOut],
+    response_class=TimedORJSONResponse,
+    dependencies=[Depends(budget("statement_timeout_studies_ms"))],
+)
+async def batch_get_studies(body: StudyBatchRequest, db: AsyncSession = Depends(get_read_db)):
+    """Fetch many studies by StudyInstanceUID and/or Orthanc ID in one query.
+
+    Each identifier list is bound as a single array parameter (`= ANY($1)`),
+    so the statement text is the same whatever the batch size. Identifiers
+    that matched nothing are returned in `missing`.
+    """
+    if len(body.study_uids) + len(body.orthanc_ids) > settings.study_batch_max_size:
+        raise HTTPException(
+            status_code=422,
+            detail=f"At most {settings.study_batch_max_size} identifiers per batch",
+        )
+
+    if not body.study_uids and not body.orthanc_ids:
+        return TimedORJSONResponse({"view": body.view, "items": [], "missing": []})
+
+    columns = _SUMMARY_COLUMNS if body.view == "summary" else _STUDY_OUT_COLUMNS
     result = await db.execute(
-        select(Study)
-        .options(selectinload(Study.series).selectinload(Series.instances))
-        .where(Study.study_uid == study_uid)
+        select(*columns).where(or_(
+            Study.study_uid == any_(bindparam("study_uids", body.study_uids, type_=ARRAY(Text))),
+            Study.orthanc_id == any_(bindparam("orthanc_ids", body.orthanc_ids, type_=ARRAY(Text))),
+        ))
     )
-    study = result.scalar_one_or_none()
+    rows = result.mappings().all()
+
+    if body.view == "summary":
+        items = [_summary_item(row) for row in rows]
+    else:
+        items = await _with_series([dict(row) for row in rows], db)
+
+    found = {s["study_uid"] for s in items} | {s["orthanc_id"] for s in items}
+    missing = [i for i in (*body.study_uids, *body.orthanc_ids) if i not in found]
+    return TimedORJSONResponse({"view": body.view, "items": items, "missing": missing})
+
+
+@router.get(
+    "/{study_uid}",
+    response_model=StudyOut,
+    response_class=TimedORJSONResponse,
+    dependencies=[Depends(budget("statement_timeout_studies_ms"))],
+)
+async def get_study(study_uid: str, request: Request, db: AsyncSession = Depends(get_read_db)):
+    """Return a study with its series; instances are paged via the sub-resource below."""
+    updated_at = await db.scalar(select(Study.updated_at).where(Study.study_uid == study_uid))
+    if updated_at is None:
+        raise HTTPException(status_code=404, detail="Study not found")
+    etag = make_etag(study_uid, updated_at)
+    if (cached := not_modified(request, etag, "study")) is not None:
+        return cached
+
+    result = await db.execute(select(*_STUDY_OUT_COLUMNS).where(Study.study_uid == study_uid))
+    study = result.mappings().one_or_none()
     if study is None:
         raise HTTPException(status_code=404, detail="Study not found")
-    return study
+    (study,) = await _with_series([dict(study)], db)
+    return TimedORJSONResponse(study, headers=cache_headers(etag))
+
+
+@router.get("/{study_uid}/series/{series_uid}/instances", response_model=InstanceListOut)
+async def list_series_instances(
+    study_uid: str,
+    series_uid: str,
+    page: int = Query(1, ge=1),
+    page_size: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_read_db),
+):
+    series_id = await db.scalar(
+        select(Series.id)
+        .join(Study, Study.id == Series.study_id)
+        .where(Study.study_uid == study_uid, Series.series_uid == series_uid)
+    )
+    if series_id is None:
+        raise HTTPException(status_code=404, detail="Series not found")
+
+    total = await db.scalar(
+        select(func.count(Instance.id)).where(Instance.series_id == series_id)
+    )
+    result = await db.execute(
+        select(Instance)
+        .where(Instance.series_id == series_id)
+        .order_by(Instance.instance_number, Instance.sop_instance_uid)
+        .offset((page - 1) * page_size)
+        .limit(page_size)
+    )
+    return InstanceListOut(
+        total=total or 0,
+        page=page,
+        page_size=page_size,
+        items=list(result.scalars().all()),
+    )
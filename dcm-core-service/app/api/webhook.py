@@ -1,20 +1,47 @@
-"""Optional Orthanc webhook receiver (fallback to poller — not required)."""
-from fastapi import APIRouter, Depends
-from sqlalchemy.ext.asyncio import AsyncSession
+"""Optional Orthanc webhook receiver (fallback to poller — not required).
 
-from ..database import get_db
+Events are queued and acknowledged with 202; `services.webhook_intake`
+workers do the ingest/delete in the background.
+"""
+from fastapi import APIRouter, HTTPException
+
+from ..config import settings
 from ..schemas import OrthancChangeEvent
-from ..services.metadata_ingester import ingest_study
-from ..services.delete_handler import soft_delete_study
+from ..services import webhook_intake
+from ..services.orthanc_poller import compact
 
 router = APIRouter(prefix="/webhook", tags=["webhook"])
 
 
-@router.post("/orthanc")
-async def orthanc_change(event: OrthancChangeEvent, db: AsyncSession = Depends(get_db)):
-    """Receive an Orthanc change event (if configured in orthanc.json)."""
-    if event.ChangeType == "StableStudy":
-        await ingest_study(event.ID, db)
-    elif event.ChangeType == "DeletedStudy":
-        await soft_delete_study(event.ID, db)
-    return {"received": event.ChangeType, "id": event.ID}
+def _queue_full() -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="webhook_queue_full",
+        headers={"Retry-After": str(settings.webhook_retry_after_seconds)},
+    )
+
+
+@router.post("/orthanc", status_code=202)
+async def orthanc_change(event: OrthancChangeEvent):
+    """Receive an Orthanc change event (if configured in orthanc.json) and queue it."""
+    try:
+        queued = webhook_intake.enqueue(event.model_dump())
+    except webhook_intake.QueueFull:
+        raise _queue_full()
+    return {"received": event.ChangeType, "id": event.ID, "queued": queued}
+
+
+@router.post("/orthanc/batch", status_code=202)
+async def orthanc_changes(events: list[OrthancChangeEvent]):
+    """Queue a batch of change events, keeping only the last one per study.
+
+    On 503 nothing is lost by resending the whole batch: studies already queued
+    are coalesced, not queued twice.
+    """
+    changes = compact([event.model_dump() for event in events])
+    try:
+        for change in changes:
+            webhook_intake.enqueue(change)
+    except webhook_intake.QueueFull:
+        raise _queue_full()
+    return {"received": len(events), "queued": len(changes)}
@@ -1,10 +1,105 @@
+import asyncio
+import logging
+import time
+from uuid import uuid4
+
+from fastapi import Depends, Request
+from prometheus_client import Counter, Gauge, Histogram
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
 
 from .config import settings
+from .services import query_metrics, request_timing
+
+logger = logging.getLogger(__name__)
+
+DB_POOL_CHECKOUT_SECONDS = Histogram(
+    "dcm_db_pool_checkout_seconds",
+    "Time spent waiting for a pooled database connection",
+    ["pool"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+DB_POOL_IN_USE = Gauge("dcm_db_pool_connections_in_use", "Pooled connections checked out", ["engine"])
+DB_POOL_IDLE = Gauge("dcm_db_pool_connections_idle", "Pooled connections open and idle", ["engine"])
+DB_POOL_OVERFLOW = Gauge("dcm_db_pool_overflow", "Connections open beyond db_pool_size", ["engine"])
+DB_READ_SESSIONS = Counter("dcm_db_read_sessions_total", "Read-only sessions by target database", ["target"])
+
+# Set after a client's write; its reads stay on the primary until the cookie expires
+READ_PIN_COOKIE = "dcm_read_primary"
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long each checkout waited for a connection."""
+    label = "primary"
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            waited = time.perf_counter() - started
+            DB_POOL_CHECKOUT_SECONDS.labels(pool=self.label).observe(waited)
+            request_timing.add("pool", waited)
+
+
+class ReadTimedQueuePool(TimedQueuePool):
+    label = "read"
 
-engine = create_async_engine(settings.database_url, echo=False, pool_pre_ping=True)
+
+def engine_options(poolclass: type[TimedQueuePool] = TimedQueuePool) -> dict:
+    if settings.db_pgbouncer:
+        # Transaction-mode PgBouncer does the pooling and may hand each transaction a
+        # different server connection, so named prepared statements can't be reused
+        return {
+            "poolclass": NullPool,
+            "connect_args": {
+                "statement_cache_size": 0,
+                "prepared_statement_cache_size": 0,
+                "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+            },
+        }
+    return {
+        "poolclass": poolclass,
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout_seconds,
+        "pool_recycle": settings.db_pool_recycle_seconds,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+        "connect_args": {"prepared_statement_cache_size": settings.db_statement_cache_size},
+    }
+
+
+engine = create_async_engine(settings.database_url, echo=False, **engine_options())
 AsyncSessionLocal = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+# Optional replica for read-only endpoints (see get_read_db)
+read_engine = (
+    create_async_engine(settings.database_read_url, echo=False, **engine_options(ReadTimedQueuePool))
+    if settings.database_read_url else None
+)
+ReadSessionLocal = (
+    async_sessionmaker(read_engine, expire_on_commit=False, class_=AsyncSession)
+    if read_engine is not None else None
+)
+
+query_metrics.instrument(engine.sync_engine)
+if read_engine is not None:
+    query_metrics.instrument(read_engine.sync_engine)
+
+
+def _export_pool_gauges(pooled, label: str) -> None:
+    pool = pooled.pool
+    if not isinstance(pool, QueuePool):
+        return
+    DB_POOL_IN_USE.labels(engine=label).set_function(pool.checkedout)
+    DB_POOL_IDLE.labels(engine=label).set_function(pool.checkedin)
+    DB_POOL_OVERFLOW.labels(engine=label).set_function(lambda: max(pool.overflow(), 0))
+
+
+_export_pool_gauges(engine, TimedQueuePool.label)
+if read_engine is not None and read_engine is not engine:
+    _export_pool_gauges(read_engine, ReadTimedQueuePool.label)
 
 
 class Base(DeclarativeBase):
@@ -16,6 +111,68 @@ async def get_db():
         yield session
 
 
+def use_replica(request: Request) -> bool:
+    """Whether *request*'s reads may go to the replica: one is configured and this client
+    hasn't written within `read_your_writes_seconds` (the replica may not have it yet)."""
+    return ReadSessionLocal is not None and not request.cookies.get(READ_PIN_COOKIE)
+
+
+async def get_read_db(request: Request, db: AsyncSession = Depends(get_db)):
+    """Session for read-only endpoints (see use_replica).
+
+    The primary session is only created, not connected, when the replica is used.
+    """
+    if not use_replica(request):
+        DB_READ_SESSIONS.labels(target="primary").inc()
+        yield db
+        return
+    DB_READ_SESSIONS.labels(target="replica").inc()
+    async with ReadSessionLocal() as session:
+        yield session
+
+
+class PinReadsAfterWrites:
+    """ASGI middleware: a successful write pins that client's reads to the primary briefly."""
+
+    _SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in self._SAFE_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_pin(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                cookie = (
+                    f"{READ_PIN_COOKIE}=1; Max-Age={settings.read_your_writes_seconds}; "
+                    "Path=/; HttpOnly; SameSite=lax"
+                )
+                message = {**message, "headers": [*message.get("headers", []), (b"set-cookie", cookie.encode())]}
+            await send(message)
+
+        await self.app(scope, receive, send_with_pin)
+
+
+async def warm_pool() -> None:
+    """Open `db_pool_size` connections per engine at startup so early requests don't pay to connect."""
+    for pooled in (engine, read_engine):
+        if pooled is None or not isinstance(pooled.pool, QueuePool):
+            continue
+
+        async def open_one():
+            async with pooled.connect() as connection:
+                await connection.execute(text("SELECT 1"))
+
+        # Held concurrently, so each one is a distinct connection left idle in the pool
+        try:
+            await asyncio.gather(*(open_one() for _ in range(settings.db_pool_size)))
+        except Exception as exc:
+            logger.warning("Could not pre-warm the connection pool: %s", exc)
+
+
 async def create_tables():
     # Tables are created via postgres/init.sql — nothing to do here.
     # This function exists so main.py can call it on startup without error.
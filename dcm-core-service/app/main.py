@@ -4,10 +4,14 @@ from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from prometheus_fastapi_instrumentator import Instrumentator
+from sqlalchemy.exc import DBAPIError
 
 from .api.router import router
 from .config import settings
-from .database import create_tables
+from .database import PinReadsAfterWrites, create_tables, read_engine, warm_pool
+from .services import change_feed, webhook_intake
+from .services.request_budget import DisconnectGuard, statement_timeout_handler
+from .services.request_timing import ServerTimingMiddleware, TimedORJSONResponse
 from .services.orthanc_poller import start_poller
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
@@ -16,6 +20,9 @@ logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await create_tables()
+    await warm_pool()
+    change_feed.start()
+    webhook_intake.start()
     poller_task = asyncio.create_task(start_poller(settings.poll_interval_seconds))
     yield
     poller_task.cancel()
@@ -23,11 +30,24 @@ async def lifespan(app: FastAPI):
         await poller_task
     except asyncio.CancelledError:
         pass
+    await webhook_intake.stop()
+    await change_feed.stop()
 
 
-app = FastAPI(title="DCM Core Service", version="0.1.0", lifespan=lifespan)
+app = FastAPI(
+    title="DCM Core Service",
+    version="0.1.0",
+    lifespan=lifespan,
+    default_response_class=TimedORJSONResponse,
+)
 
 Instrumentator().instrument(app).expose(app)
+app.add_middleware(ServerTimingMiddleware)
+app.add_middleware(DisconnectGuard)
+app.add_exception_handler(DBAPIError, statement_timeout_handler)
+
+if read_engine is not None:
+    app.add_middleware(PinReadsAfterWrites)
 
 app.include_router(router)
 
@@ -1,7 +1,7 @@
 from datetime import date, time, datetime
 from typing import Optional
-from sqlalchemy import String, Integer, SmallInteger, BigInteger, Date, Time, DateTime, Text, ForeignKey
-from sqlalchemy.dialects.postgresql import UUID, JSONB, CHAR
+from sqlalchemy import String, Integer, SmallInteger, BigInteger, Date, Time, DateTime, Text, ForeignKey, LargeBinary, UniqueConstraint
+from sqlalchemy.dialects.postgresql import UUID, JSONB, CHAR, ARRAY
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.sql import func
 import uuid
@@ -17,6 +17,22 @@ class PollerState(Base):
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
 
 
+class StatisticsRollup(Base):
+    __tablename__ = "statistics_rollup"
+
+    dimension: Mapped[str] = mapped_column(Text, primary_key=True)
+    key: Mapped[str] = mapped_column(Text, primary_key=True)
+    count: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+
+
+class StatisticsSketch(Base):
+    __tablename__ = "statistics_sketch"
+
+    dimension: Mapped[str] = mapped_column(Text, primary_key=True)
+    key: Mapped[str] = mapped_column(Text, primary_key=True)
+    registers: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+
+
 class Study(Base):
     __tablename__ = "studies"
 
@@ -35,6 +51,7 @@ class Study(Base):
     institution_name: Mapped[Optional[str]] = mapped_column(Text)
     num_series: Mapped[int] = mapped_column(Integer, default=0)
     num_instances: Mapped[int] = mapped_column(Integer, default=0)
+    modalities_in_study: Mapped[list[str]] = mapped_column(ARRAY(Text), default=list)
     raw_main_dicom_tags: Mapped[dict] = mapped_column(JSONB, default={})
     ingested_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -65,11 +82,18 @@ class Series(Base):
 
 class Instance(Base):
     __tablename__ = "instances"
+    # Hash-partitioned by series_id (postgres/init.sql): the key columns include it, and
+    # so do the ORM's UPDATE ... WHERE clauses, which lets them prune to one partition
+    __table_args__ = (
+        UniqueConstraint("series_id", "sop_instance_uid"),
+        UniqueConstraint("series_id", "orthanc_id"),
+        {"postgresql_partition_by": "HASH (series_id)"},
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    sop_instance_uid: Mapped[str] = mapped_column(Text, unique=True, nullable=False)
-    orthanc_id: Mapped[str] = mapped_column(Text, unique=True, nullable=False)
-    series_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("series.id"), nullable=False)
+    sop_instance_uid: Mapped[str] = mapped_column(Text, nullable=False)
+    orthanc_id: Mapped[str] = mapped_column(Text, nullable=False)
+    series_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("series.id"), primary_key=True)
     instance_number: Mapped[Optional[int]] = mapped_column(Integer)
     sop_class_uid: Mapped[Optional[str]] = mapped_column(Text)
     transfer_syntax_uid: Mapped[Optional[str]] = mapped_column(Text)
@@ -1,5 +1,5 @@
 from datetime import date, time, datetime
-from typing import Optional, Any
+from typing import Optional, Any, Literal
 from uuid import UUID
 from pydantic import BaseModel
 
@@ -20,6 +20,26 @@ class SeriesOut(BaseModel):
     deleted_at: Optional[datetime]
 
 
+class InstanceOut(BaseModel):
+    model_config = {"from_attributes": True}
+
+    id: UUID
+    sop_instance_uid: str
+    orthanc_id: str
+    instance_number: Optional[int]
+    sop_class_uid: Optional[str]
+    transfer_syntax_uid: Optional[str]
+    raw_main_dicom_tags: dict[str, Any]
+    deleted_at: Optional[datetime]
+
+
+class InstanceListOut(BaseModel):
+    total: int
+    page: int
+    page_size: int
+    items: list[InstanceOut]
+
+
 class StudyOut(BaseModel):
     model_config = {"from_attributes": True}
 
@@ -38,6 +58,7 @@ class StudyOut(BaseModel):
     institution_name: Optional[str]
     num_series: int
     num_instances: int
+    modalities_in_study: list[str] = []
     raw_main_dicom_tags: dict[str, Any]
     ingested_at: datetime
     updated_at: datetime
@@ -45,11 +66,60 @@ class StudyOut(BaseModel):
     series: list[SeriesOut] = []
 
 
+class StudySummaryOut(BaseModel):
+    """Column subset rendered by the studies table — no raw tags, no series rows."""
+    id: UUID
+    study_uid: str
+    orthanc_id: str
+    patient_id: Optional[str]
+    patient_name: Optional[str]
+    patient_sex: Optional[str]
+    study_date: Optional[date]
+    study_description: Optional[str]
+    institution_name: Optional[str]
+    num_series: int
+    num_instances: int
+    modalities: list[str] = []
+    ingested_at: datetime
+    deleted_at: Optional[datetime]
+
+
 class StudyListOut(BaseModel):
-    total: int
+    view: Literal["full"] = "full"
+    total: Optional[int]
+    total_is_estimate: bool = False
+    has_more: bool = False
+    page: int
+    page_size: int
+    items: list[StudyOut]
+
+
+class StudySummaryListOut(BaseModel):
+    view: Literal["summary"] = "summary"
+    total: Optional[int]
+    total_is_estimate: bool = False
+    has_more: bool = False
     page: int
     page_size: int
+    items: list[StudySummaryOut]
+
+
+class StudyBatchRequest(BaseModel):
+    study_uids: list[str] = []
+    orthanc_ids: list[str] = []
+    view: Literal["full", "summary"] = "summary"
+
+
+class StudyBatchOut(BaseModel):
+    view: Literal["full"] = "full"
     items: list[StudyOut]
+    missing: list[str] = []
+
+
+class StudySummaryBatchOut(BaseModel):
+    view: Literal["summary"] = "summary"
+    items: list[StudySummaryOut]
+    missing: list[str] = []
 
 
 class OrthancChangeEvent(BaseModel):
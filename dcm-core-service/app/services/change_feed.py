@@ -0,0 +1,116 @@
+"""Publish catalogue changes to other services with Postgres NOTIFY.
+
+`ingest_study` and `soft_delete_study` call `publish()` after they commit.
+Events are buffered briefly and sent as compact JSON batches on
+`change_feed_channel`, so a bulk load costs one NOTIFY per batch rather than
+one per study:
+
+    {"events": [{"op": "ingested" | "deleted", "study_uid": ..., "orthanc_id": ...}, ...]}
+
+Payloads stay under Postgres's 8000-byte NOTIFY limit by splitting large
+batches. Delivery is best-effort: listeners that were disconnected should
+treat a reconnect as "anything may have changed".
+"""
+import asyncio
+import logging
+from typing import Optional
+
+import orjson
+from prometheus_client import Counter
+from sqlalchemy import select, func
+
+from ..config import settings
+from ..database import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+CHANGE_FEED_EVENTS = Counter("dcm_change_feed_events_total", "Catalogue changes published via NOTIFY", ["op"])
+CHANGE_FEED_NOTIFIES = Counter("dcm_change_feed_notifies_total", "NOTIFY statements sent (one per batch)")
+
+# Postgres rejects NOTIFY payloads of 8000 bytes or more
+_MAX_PAYLOAD_BYTES = 7900
+
+_enabled = False
+_pending: list[dict] = []
+_flush_timer: Optional[asyncio.TimerHandle] = None
+_flush_tasks: set[asyncio.Task] = set()
+
+
+def start() -> None:
+    """Begin publishing (called from the app lifespan; a no-op feed otherwise)."""
+    global _enabled
+    _enabled = True
+
+
+async def stop() -> None:
+    """Flush what is buffered and stop publishing."""
+    global _enabled
+    _enabled = False
+    _cancel_timer()
+    await flush()
+    if _flush_tasks:
+        await asyncio.gather(*_flush_tasks, return_exceptions=True)
+
+
+def publish(op: str, study_uid: str, orthanc_id: str) -> None:
+    """Buffer one change; it is sent within `change_feed_flush_ms`."""
+    global _flush_timer
+    if not _enabled:
+        return
+    CHANGE_FEED_EVENTS.labels(op=op).inc()
+    _pending.append({"op": op, "study_uid": study_uid, "orthanc_id": orthanc_id})
+    if len(_pending) >= settings.change_feed_max_batch:
+        _cancel_timer()
+        _spawn_flush()
+    elif _flush_timer is None:
+        _flush_timer = asyncio.get_running_loop().call_later(
+            settings.change_feed_flush_ms / 1000, _spawn_flush
+        )
+
+
+def _cancel_timer() -> None:
+    global _flush_timer
+    if _flush_timer is not None:
+        _flush_timer.cancel()
+        _flush_timer = None
+
+
+def _spawn_flush() -> None:
+    global _flush_timer
+    _flush_timer = None
+    task = asyncio.get_running_loop().create_task(flush())
+    _flush_tasks.add(task)
+    task.add_done_callback(_flush_tasks.discard)
+
+
+def _payloads(events: list[dict]) -> list[bytes]:
+    """Encode *events* as as few payloads as fit under the NOTIFY size limit."""
+    payloads: list[bytes] = []
+    batch: list[bytes] = []
+    size = len(b'{"events":[]}')
+    for event in events:
+        encoded = orjson.dumps(event)
+        if batch and size + len(encoded) + 1 > _MAX_PAYLOAD_BYTES:
+            payloads.append(b'{"events":[' + b",".join(batch) + b"]}")
+            batch, size = [], len(b'{"events":[]}')
+        batch.append(encoded)
+        size += len(encoded) + 1
+    if batch:
+        payloads.append(b'{"events":[' + b",".join(batch) + b"]}")
+    return payloads
+
+
+async def flush() -> None:
+    """Send everything buffered so far (one NOTIFY per payload, one transaction)."""
+    if not _pending:
+        return
+    events = _pending[:]
+    _pending.clear()
+    try:
+        async with AsyncSessionLocal() as db:
+            for payload in _payloads(events):
+                await db.execute(select(func.pg_notify(settings.change_feed_channel, payload.decode())))
+                CHANGE_FEED_NOTIFIES.inc()
+            await db.commit()
+    except Exception as exc:
+        logger.warning("Change feed: dropped %d events, NOTIFY failed: %s", len(events), exc)
@@ -0,0 +1,111 @@
+"""Per-route concurrency limits with a bounded wait queue, for expensive endpoints.
+
+A `ConcurrencyLimiter` admits up to ``max_concurrent`` requests. Up to
+``max_queue`` more wait in FIFO order, for at most ``queue_timeout``
+seconds. Past that, requests are shed straight away, so a burst fails fast
+instead of piling onto the database pool:
+
+- 429 when the queue is full
+- 503 when a queued request times out
+
+Both answers carry ``Retry-After``. Routes that aren't limited, such as
+/health and single-study lookups, never wait behind a limited one.
+"""
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from prometheus_client import Counter, Gauge
+
+from ..config import settings
+
+LIMITER_ACTIVE = Gauge("dcm_limiter_active", "Requests holding a concurrency slot", ["route"])
+LIMITER_QUEUE_DEPTH = Gauge("dcm_limiter_queue_depth", "Requests waiting for a concurrency slot", ["route"])
+LIMITER_SHED = Counter("dcm_limiter_shed_total", "Requests rejected by a concurrency limiter", ["route", "reason"])
+
+
+class ConcurrencyLimiter:
+    def __init__(self, route: str, max_concurrent: int, max_queue: int, queue_timeout: float):
+        self.route = route
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._active = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        LIMITER_ACTIVE.labels(route=route).set_function(lambda: self._active)
+        LIMITER_QUEUE_DEPTH.labels(route=route).set_function(lambda: len(self._waiters))
+
+    async def acquire(self) -> None:
+        """Take a slot, waiting in the queue if need be; raises HTTPException when shedding."""
+        if self._active < self.max_concurrent and not self._waiters:
+            self._active += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            self._shed("queue_full", 429)
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            # release() hands its slot over by resolving the waiter
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._abandon(waiter)
+            self._shed("queue_timeout", 503)
+        except asyncio.CancelledError:
+            self._abandon(waiter)
+            raise
+
+    def release(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._active -= 1
+
+    @asynccontextmanager
+    async def slot(self):
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def dependency(self):
+        """FastAPI dependency holding a slot until the endpoint has returned."""
+        async with self.slot():
+            yield
+
+    def _abandon(self, waiter: asyncio.Future) -> None:
+        if waiter.done() and not waiter.cancelled():
+            # Handed a slot just as we gave up: pass it on
+            self.release()
+        else:
+            try:
+                self._waiters.remove(waiter)
+            except ValueError:
+                pass
+
+    def _shed(self, reason: str, status_code: int):
+        LIMITER_SHED.labels(route=self.route, reason=reason).inc()
+        raise HTTPException(
+            status_code=status_code,
+            detail=f"Too many concurrent {self.route} requests, retry shortly",
+            headers={"Retry-After": str(settings.limit_retry_after_seconds)},
+        )
+
+
+class LimitedStreamingResponse(StreamingResponse):
+    """StreamingResponse that keeps a slot acquired by the endpoint until the body is sent."""
+
+    def __init__(self, content, limiter: ConcurrencyLimiter, **kwargs):
+        super().__init__(content, **kwargs)
+        self._limiter = limiter
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self._limiter.release()
@@ -0,0 +1,34 @@
+"""Short-lived in-process cache of /studies totals, keyed by filter combination."""
+import time as _time
+from typing import Hashable, Optional
+
+from ..config import settings
+
+_MAX_ENTRIES = 1024
+
+# key -> (expires_at monotonic seconds, total)
+_entries: dict[Hashable, tuple[float, int]] = {}
+
+
+def get(key: Hashable) -> Optional[int]:
+    """Return the cached total for *key*, or None if absent or expired."""
+    hit = _entries.get(key)
+    if hit is None:
+        return None
+    expires_at, total = hit
+    if expires_at < _time.monotonic():
+        _entries.pop(key, None)
+        return None
+    return total
+
+
+def put(key: Hashable, total: int) -> None:
+    """Store *total* for *key* for `study_count_cache_ttl_seconds`."""
+    if key not in _entries and len(_entries) >= _MAX_ENTRIES:
+        # dicts keep insertion order — drop the oldest entry
+        _entries.pop(next(iter(_entries)))
+    _entries[key] = (_time.monotonic() + settings.study_count_cache_ttl_seconds, total)
+
+
+def clear() -> None:
+    _entries.clear()
@@ -7,12 +7,14 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
 from ..models import Study, Series, Instance
+from . import change_feed, event_broadcaster, query_cache, stats_rollup
 
 logger = logging.getLogger(__name__)
 
 
 async def soft_delete_study(orthanc_study_id: str, db: AsyncSession) -> None:
     """Mark a study and all its series/instances as deleted."""
+    await stats_rollup.lock_study(orthanc_study_id, db)
     result = await db.execute(
         select(Study)
         .where(Study.orthanc_id == orthanc_study_id)
@@ -24,6 +26,8 @@ async def soft_delete_study(orthanc_study_id: str, db: AsyncSession) -> None:
         logger.info("DeletedStudy event for unknown orthanc_id %s — skipping", orthanc_study_id)
         return
 
+    rollup_before = stats_rollup.loaded_study_contribution(study)
+
     now = datetime.now(timezone.utc)
     study.deleted_at = now
 
@@ -32,5 +36,11 @@ async def soft_delete_study(orthanc_study_id: str, db: AsyncSession) -> None:
         for instance in series.instances:
             instance.deleted_at = now
 
+    rollup_delta = await stats_rollup.apply_change(rollup_before, stats_rollup.Contribution(), db)
     await db.commit()
+    query_cache.bump_generation()
+    event_broadcaster.publish("study_deleted", {
+        "study_uid": study.study_uid, "orthanc_id": orthanc_study_id, "rollup_delta": rollup_delta,
+    })
+    change_feed.publish("deleted", study.study_uid, orthanc_study_id)
     logger.info("Soft-deleted study %s (orthanc_id=%s)", study.study_uid, orthanc_study_id)
@@ -0,0 +1,98 @@
+"""In-process fan-out of catalogue change events to Server-Sent Event subscribers.
+
+Ingest and soft-delete `publish()` after they commit; each `/events`
+connection holds a `Subscription` with a bounded queue. Publishing never
+blocks: a subscriber whose queue is full has its backlog replaced by a single
+``resync`` event, telling the client to refetch instead of replaying deltas.
+Further events for that subscriber are dropped until it has read the
+``resync``, so no delta is queued behind it.
+"""
+import asyncio
+import itertools
+from dataclasses import dataclass
+from typing import Any, Optional
+
+import orjson
+from prometheus_client import Counter, Gauge
+
+from ..config import settings
+
+SSE_SUBSCRIBERS = Gauge("dcm_sse_subscribers", "Connected /events subscribers")
+SSE_EVENTS_PUBLISHED = Counter("dcm_sse_events_published_total", "Events published to /events", ["event"])
+SSE_RESYNCS = Counter("dcm_sse_resyncs_total", "Subscriber backlogs dropped for falling behind")
+
+
+class TooManySubscribers(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class Event:
+    id: int
+    event: str
+    data: Any
+
+    def encode(self) -> bytes:
+        return b"id: %d\nevent: %s\ndata: %s\n\n" % (self.id, self.event.encode(), orjson.dumps(self.data))
+
+
+_ids = itertools.count(1)
+# Removed by Subscription.close(), which the /events stream calls when it ends
+_subscribers: set["Subscription"] = set()
+SSE_SUBSCRIBERS.set_function(lambda: len(_subscribers))
+
+
+class Subscription:
+    def __init__(self, max_queue: int):
+        self.queue: asyncio.Queue[Event] = asyncio.Queue(max_queue)
+        self.resync_pending = False
+
+    def offer(self, event: Event) -> None:
+        if self.resync_pending:
+            # The refetch the client is about to do will include this change
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Too far behind for deltas to be useful: drop the backlog, ask for a refetch
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(Event(event.id, "resync", {}))
+            self.resync_pending = True
+            SSE_RESYNCS.inc()
+
+    async def next(self, timeout: float) -> Optional[Event]:
+        """The next event, or None if nothing arrived within *timeout* seconds."""
+        try:
+            event = await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        if event.event == "resync":
+            self.resync_pending = False
+        return event
+
+    def close(self) -> None:
+        _subscribers.discard(self)
+
+
+def has_capacity() -> bool:
+    return len(_subscribers) < settings.sse_max_subscribers
+
+
+def subscribe() -> Subscription:
+    """Register a subscriber; raises TooManySubscribers at `sse_max_subscribers`."""
+    if not has_capacity():
+        raise TooManySubscribers()
+    subscription = Subscription(settings.sse_queue_size)
+    _subscribers.add(subscription)
+    return subscription
+
+
+def publish(event: str, data: Any) -> None:
+    """Queue *event* for every subscriber (never blocks)."""
+    SSE_EVENTS_PUBLISHED.labels(event=event).inc()
+    if not _subscribers:
+        return
+    message = Event(next(_ids), event, data)
+    for subscription in list(_subscribers):
+        subscription.offer(message)
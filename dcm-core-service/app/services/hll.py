@@ -0,0 +1,79 @@
+"""Minimal HyperLogLog for approximate distinct counts.
+
+A sketch with precision ``p`` keeps ``2**p`` one-byte registers and estimates
+cardinality with a relative standard error of about ``1.04 / sqrt(2**p)``
+(p=12: 4 KiB, ±1.6%; p=14: 16 KiB, ±0.8%). Sketches of the same precision merge
+by taking the register-wise maximum, so per-bucket sketches can be combined
+for any set of buckets without revisiting the underlying rows.
+
+Each value touches exactly one register (`register_update`), which lets the
+database apply an update as a single ``set_byte(..., greatest(...))``.
+"""
+import hashlib
+import math
+from typing import Iterable
+
+MIN_PRECISION = 4
+MAX_PRECISION = 16
+
+
+def standard_error(precision: int) -> float:
+    return 1.04 / math.sqrt(1 << precision)
+
+
+def register_update(value: str, precision: int) -> tuple[int, int]:
+    """Return (register index, rank) that adding *value* raises to at least rank."""
+    h = int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+    width = 64 - precision
+    index = h >> width
+    rest = h & ((1 << width) - 1)
+    # Position of the leftmost 1-bit in the remaining bits (width + 1 if all zero)
+    return index, width - rest.bit_length() + 1
+
+
+class HyperLogLog:
+    def __init__(self, precision: int, registers: bytes | None = None):
+        if not MIN_PRECISION <= precision <= MAX_PRECISION:
+            raise ValueError(f"precision must be between {MIN_PRECISION} and {MAX_PRECISION}")
+        self.precision = precision
+        m = 1 << precision
+        if registers is not None and len(registers) != m:
+            raise ValueError(f"expected {m} registers for precision {precision}, got {len(registers)}")
+        self.registers = bytearray(registers if registers is not None else m)
+
+    @classmethod
+    def from_bytes(cls, registers: bytes) -> "HyperLogLog":
+        precision = len(registers).bit_length() - 1
+        return cls(precision, registers)
+
+    def add(self, value: str) -> None:
+        index, rank = register_update(value, self.precision)
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other: "HyperLogLog") -> None:
+        if other.precision != self.precision:
+            raise ValueError("cannot merge sketches of different precision")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def count(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m) if m >= 128 else {16: 0.673, 32: 0.697, 64: 0.709}[m]
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Small-range correction (linear counting)
+            estimate = m * math.log(m / zeros)
+        return round(estimate)
+
+    def to_bytes(self) -> bytes:
+        return bytes(self.registers)
+
+
+def merged(sketches: Iterable[bytes], precision: int) -> HyperLogLog:
+    """Merge serialized sketches, skipping any of another precision (left from before a change)."""
+    result = HyperLogLog(precision)
+    for registers in sketches:
+        if len(registers) == 1 << precision:
+            result.merge(HyperLogLog(precision, registers))
+    return result
@@ -3,11 +3,11 @@ import logging
 from datetime import date, time, datetime
 from typing import Optional
 
-from sqlalchemy import select, update
+from sqlalchemy import select, update, func
 from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from . import orthanc_client
+from . import change_feed, event_broadcaster, orthanc_client, query_cache, stats_rollup
 from ..models import Study, Series, Instance
 
 logger = logging.getLogger(__name__)
@@ -80,11 +80,16 @@ async def ingest_study(orthanc_study_id: str, db: AsyncSession) -> None:
         deleted_at=None,
     )
 
+    await stats_rollup.lock_study(orthanc_study_id, db)
+    rollup_before = await stats_rollup.study_contribution(study_uid, db)
+
     stmt = pg_insert(Study).values(**study_values)
     stmt = stmt.on_conflict_do_update(
         index_elements=["study_uid"],
-        set_={k: stmt.excluded[k] for k in study_values if k != "study_uid"},
-    )
+        # ON CONFLICT does not apply the column's onupdate — bump updated_at
+        # explicitly so ETags derived from it change on re-ingest.
+        set_={**{k: stmt.excluded[k] for k in study_values if k != "study_uid"}, "updated_at": func.now()},
+    ).execution_options(statement_name="ingest_study_upsert")
     await db.execute(stmt)
     await db.flush()
 
@@ -94,29 +99,44 @@ async def ingest_study(orthanc_study_id: str, db: AsyncSession) -> None:
 
     # Ingest all series
     instance_count = 0
+    modalities: set[str] = set()
     for series_orthanc_id in series_ids:
-        n = await _ingest_series(series_orthanc_id, study_row.id, db)
+        n, series_tags = await _ingest_series(series_orthanc_id, study_row.id, db)
         instance_count += n
+        if series_tags.get("Modality"):
+            modalities.add(series_tags["Modality"].upper())
 
-    # Update counts
+    # Update counts and the denormalized series modalities
     study_row.num_instances = instance_count
+    study_row.modalities_in_study = sorted(modalities)
+    await db.flush()
+    rollup_delta = await stats_rollup.apply_change(
+        rollup_before, await stats_rollup.study_contribution(study_uid, db), db
+    )
+    await stats_rollup.add_to_sketches(study_row, db)
     await db.commit()
+    query_cache.bump_generation()
+    event_broadcaster.publish("study_ingested", {
+        "study_uid": study_uid, "orthanc_id": orthanc_study_id, "rollup_delta": rollup_delta,
+    })
+    change_feed.publish("ingested", study_uid, orthanc_study_id)
     logger.info("Ingested study %s (%s series, %s instances)", study_uid, len(series_ids), instance_count)
 
 
-async def _ingest_series(orthanc_series_id: str, study_pk, db: AsyncSession) -> int:
+async def _ingest_series(orthanc_series_id: str, study_pk, db: AsyncSession) -> tuple[int, dict]:
+    """Upsert one series and its instances; return (instance count, series MainDicomTags)."""
     try:
         series_data = await orthanc_client.get(f"/series/{orthanc_series_id}")
     except Exception as exc:
         logger.warning("Failed to fetch series %s: %s", orthanc_series_id, exc)
-        return 0
+        return 0, {}
 
     tags = series_data.get("MainDicomTags", {})
     instance_ids: list[str] = series_data.get("Instances", [])
 
     series_uid = tags.get("SeriesInstanceUID", "")
     if not series_uid:
-        return 0
+        return 0, {}
 
     series_values = dict(
         series_uid=series_uid,
@@ -136,7 +156,7 @@ async def _ingest_series(orthanc_series_id: str, study_pk, db: AsyncSession) ->
     stmt = stmt.on_conflict_do_update(
         index_elements=["series_uid"],
         set_={k: stmt.excluded[k] for k in series_values if k != "series_uid"},
-    )
+    ).execution_options(statement_name="ingest_series_upsert")
     await db.execute(stmt)
     await db.flush()
 
@@ -146,7 +166,7 @@ async def _ingest_series(orthanc_series_id: str, study_pk, db: AsyncSession) ->
     for inst_orthanc_id in instance_ids:
         await _ingest_instance(inst_orthanc_id, series_row.id, db)
 
-    return len(instance_ids)
+    return len(instance_ids), tags
 
 
 async def _ingest_instance(orthanc_instance_id: str, series_pk, db: AsyncSession) -> None:
@@ -174,7 +194,8 @@ async def _ingest_instance(orthanc_instance_id: str, series_pk, db: AsyncSession
 
     stmt = pg_insert(Instance).values(**inst_values)
     stmt = stmt.on_conflict_do_update(
-        index_elements=["sop_instance_uid"],
-        set_={k: stmt.excluded[k] for k in inst_values if k != "sop_instance_uid"},
-    )
+        # instances is partitioned by series_id, so its unique keys include it
+        index_elements=["series_id", "sop_instance_uid"],
+        set_={k: stmt.excluded[k] for k in inst_values if k not in ("series_id", "sop_instance_uid")},
+    ).execution_options(statement_name="ingest_instance_upsert")
     await db.execute(stmt)
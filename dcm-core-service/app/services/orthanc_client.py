@@ -1,13 +1,17 @@
 """Thin async httpx wrapper for the Orthanc REST API."""
 import httpx
 from ..config import settings
+from . import request_timing
 
 
 def _make_client() -> httpx.AsyncClient:
     auth = None
     if settings.orthanc_user:
         auth = (settings.orthanc_user, settings.orthanc_pass)
-    return httpx.AsyncClient(base_url=settings.orthanc_url, auth=auth, timeout=30.0)
+    return httpx.AsyncClient(
+        base_url=settings.orthanc_url, auth=auth, timeout=30.0,
+        event_hooks=request_timing.orthanc_event_hooks(),
+    )
 
 
 async def get(path: str) -> dict:
@@ -20,7 +20,7 @@ STUDIES_DELETED = Counter("dcm_studies_deleted_total", "Total studies soft-delet
 POLLER_LAST_SEQ = Gauge("dcm_poller_last_seq", "Last Orthanc change sequence processed")
 POLLER_LAG = Gauge("dcm_poller_lag_seconds", "Seconds since last successful poll")
 
-_HANDLED_TYPES = {"StableStudy", "DeletedStudy"}
+HANDLED_TYPES = {"StableStudy", "DeletedStudy"}
 _RECONCILE_EVERY = 6  # reconcile every N poll cycles (~30s at 5s interval)
 
 
@@ -37,7 +37,23 @@ async def _save_last_seq(seq: int, db: AsyncSession) -> None:
     await db.commit()
 
 
-async def _dispatch(change: dict, db: AsyncSession) -> None:
+def compact(changes: list[dict]) -> list[dict]:
+    """Keep only the last handled change per study, in the order those last changes occurred.
+
+    A study re-stabilized several times, or ingested and then deleted, within one
+    page needs a single dispatch: whatever the latest event says.
+    """
+    latest: dict[str, dict] = {}
+    for change in changes:
+        if change.get("ChangeType") in HANDLED_TYPES:
+            resource_id = change.get("ID", "")
+            latest.pop(resource_id, None)
+            latest[resource_id] = change
+    return list(latest.values())
+
+
+async def dispatch(change: dict, db: AsyncSession) -> None:
+    """Ingest or soft-delete the study *change* refers to (shared with webhook_intake)."""
     change_type = change.get("ChangeType", "")
     resource_id = change.get("ID", "")
 
@@ -100,10 +116,9 @@ async def start_poller(poll_interval: int = 5) -> None:
             last_successful_poll = _time.monotonic()
             POLLER_LAG.set(0)
 
-            for change in changes.get("Changes", []):
-                if change.get("ChangeType") in _HANDLED_TYPES:
-                    async with AsyncSessionLocal() as db:
-                        await _dispatch(change, db)
+            for change in compact(changes.get("Changes", [])):
+                async with AsyncSessionLocal() as db:
+                    await dispatch(change, db)
 
             new_seq: int = changes.get("Last", seq)
             if new_seq != seq:
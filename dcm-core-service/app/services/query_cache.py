@@ -0,0 +1,141 @@
+"""In-process cache of encoded read responses, invalidated by a catalogue generation.
+
+`ingest_study` and `soft_delete_study` call `bump_generation()` after they
+commit, which drops every entry. Between changes each distinct key is
+computed once: concurrent misses for the same key wait on the first caller's
+load instead of issuing their own queries.
+
+Entries are LRU-ordered, expire after `query_cache_ttl_seconds`, and the
+total size of the cached bodies is capped at `query_cache_max_bytes`.
+"""
+import asyncio
+import time as _time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Hashable, Optional
+
+from prometheus_client import Counter, Gauge
+
+from ..config import settings
+
+QUERY_CACHE_REQUESTS = Counter(
+    "dcm_query_cache_requests_total",
+    "Query cache lookups by route and result (hit / miss / coalesced)",
+    ["route", "result"],
+)
+QUERY_CACHE_BYTES = Gauge("dcm_query_cache_bytes", "Encoded bytes held by the query cache")
+QUERY_CACHE_ENTRIES = Gauge("dcm_query_cache_entries", "Entries held by the query cache")
+
+
+@dataclass(frozen=True)
+class CachedBody:
+    """An encoded JSON body and the ETag it was served with (if any)."""
+    body: bytes
+    etag: Optional[str] = None
+
+
+_generation = 0
+# key -> (expires_at monotonic seconds, body); most recently used last
+_entries: "OrderedDict[Hashable, tuple[float, CachedBody]]" = OrderedDict()
+_size = 0
+_inflight: dict[tuple[int, Hashable], asyncio.Future] = {}
+
+
+def generation() -> int:
+    return _generation
+
+
+def bump_generation() -> None:
+    """Invalidate everything cached so far; call after committing a catalogue change."""
+    global _generation
+    _generation += 1
+    clear()
+
+
+def clear() -> None:
+    global _size
+    _entries.clear()
+    _size = 0
+    _update_gauges()
+
+
+async def get_or_load(
+    key: Hashable, loader: Callable[[], Awaitable[CachedBody]], route: str
+) -> CachedBody:
+    """Return the cached body for *key*, running *loader* at most once per generation."""
+    while True:
+        cached = _lookup(key)
+        if cached is not None:
+            QUERY_CACHE_REQUESTS.labels(route=route, result="hit").inc()
+            return cached
+
+        pending = _inflight.get((_generation, key))
+        if pending is None:
+            break
+        QUERY_CACHE_REQUESTS.labels(route=route, result="coalesced").inc()
+        try:
+            return await asyncio.shield(pending)
+        except asyncio.CancelledError:
+            # The loading request went away; retry (and possibly load) ourselves
+            if pending.cancelled():
+                continue
+            raise
+
+    QUERY_CACHE_REQUESTS.labels(route=route, result="miss").inc()
+    pending = asyncio.get_running_loop().create_future()
+    # Waiters may all have gone; don't log an unretrieved exception
+    pending.add_done_callback(lambda f: f.cancelled() or f.exception())
+    started_at = _generation
+    # Keyed by generation too: a load started before a change must not serve later callers
+    _inflight[started_at, key] = pending
+    try:
+        value = await loader()
+    except Exception as exc:
+        pending.set_exception(exc)
+        raise
+    except BaseException:
+        pending.cancel()
+        raise
+    finally:
+        _inflight.pop((started_at, key), None)
+
+    pending.set_result(value)
+    # A change committed while loading may not be reflected — serve it, don't keep it
+    if started_at == _generation:
+        _store(key, value)
+    return value
+
+
+def _lookup(key: Hashable) -> Optional[CachedBody]:
+    global _size
+    hit = _entries.get(key)
+    if hit is None:
+        return None
+    expires_at, value = hit
+    if expires_at < _time.monotonic():
+        del _entries[key]
+        _size -= len(value.body)
+        _update_gauges()
+        return None
+    _entries.move_to_end(key)
+    return value
+
+
+def _store(key: Hashable, value: CachedBody) -> None:
+    global _size
+    if len(value.body) > settings.query_cache_max_bytes:
+        return
+    previous = _entries.pop(key, None)
+    if previous is not None:
+        _size -= len(previous[1].body)
+    _entries[key] = (_time.monotonic() + settings.query_cache_ttl_seconds, value)
+    _size += len(value.body)
+    while _size > settings.query_cache_max_bytes or len(_entries) > settings.query_cache_max_entries:
+        _, (_, evicted) = _entries.popitem(last=False)
+        _size -= len(evicted.body)
+    _update_gauges()
+
+
+def _update_gauges() -> None:
+    QUERY_CACHE_BYTES.set(_size)
+    QUERY_CACHE_ENTRIES.set(len(_entries))
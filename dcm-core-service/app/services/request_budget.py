@@ -0,0 +1,102 @@
+"""Per-route database time budgets, and cancellation when the client goes away.
+
+Routes opt in with ``dependencies=[Depends(budget("<setting>"))]``, naming
+a setting that holds the route's ``statement_timeout`` in milliseconds
+(0 = none). For the rest of the request:
+
+- every transaction a session begins first runs
+  ``set_config('statement_timeout', ..., true)``, so Postgres cancels any
+  statement over budget. That surfaces as a 503 via `statement_timeout_handler`.
+- a watcher waits for the client's ``http.disconnect``. If it arrives before
+  the response, the request task is cancelled, which makes asyncpg cancel the
+  in-flight query server-side. `DisconnectGuard` then ends the request quietly.
+"""
+import asyncio
+import logging
+from contextvars import ContextVar
+from typing import Optional
+
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from prometheus_client import Counter
+from sqlalchemy import event, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+STATEMENT_TIMEOUTS = Counter("dcm_statement_timeouts_total", "Requests that hit their statement_timeout", ["route"])
+DISCONNECT_CANCELLATIONS = Counter(
+    "dcm_disconnect_cancellations_total", "Requests cancelled because the client disconnected", ["route"]
+)
+
+# Postgres SQLSTATE for a statement cancelled by statement_timeout
+_QUERY_CANCELED = "57014"
+
+_statement_timeout_ms: ContextVar[Optional[int]] = ContextVar("statement_timeout_ms", default=None)
+
+
+def _route(request: Request) -> str:
+    return getattr(request.scope.get("route"), "path", "unmatched")
+
+
+def budget(setting: str):
+    """Dependency applying the statement timeout held by *setting* and disconnect cancellation."""
+
+    async def apply_budget(request: Request):
+        token = _statement_timeout_ms.set(getattr(settings, setting) or None)
+        watcher = asyncio.create_task(_cancel_on_disconnect(request, asyncio.current_task()))
+        try:
+            yield
+        finally:
+            watcher.cancel()
+            _statement_timeout_ms.reset(token)
+
+    return apply_budget
+
+
+async def _cancel_on_disconnect(request: Request, task: asyncio.Task) -> None:
+    # Any request body has been read by now (FastAPI reads it before dependencies),
+    # so the next message that matters is the disconnect
+    while True:
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            break
+    request.scope.setdefault("state", {})["client_disconnected"] = True
+    DISCONNECT_CANCELLATIONS.labels(route=_route(request)).inc()
+    task.cancel()
+
+
+@event.listens_for(Session, "after_begin")
+def _apply_statement_timeout(session, transaction, connection) -> None:
+    timeout_ms = _statement_timeout_ms.get()
+    if timeout_ms:
+        # Transaction-local, so it goes away with the transaction (and its pooled connection)
+        connection.execute(text("SELECT set_config('statement_timeout', :ms, true)"), {"ms": str(timeout_ms)})
+
+
+async def statement_timeout_handler(request: Request, exc: DBAPIError):
+    """Answer 503 for statements Postgres cancelled on timeout; anything else stays a 500."""
+    if getattr(exc.orig, "sqlstate", None) != _QUERY_CANCELED:
+        raise exc
+    STATEMENT_TIMEOUTS.labels(route=_route(request)).inc()
+    logger.warning("Statement timeout on %s %s", request.method, request.url.path)
+    return JSONResponse({"detail": "The query took longer than this endpoint allows"}, status_code=503)
+
+
+class DisconnectGuard:
+    """ASGI middleware: swallow the cancellation `budget` raises for a vanished client."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await self.app(scope, receive, send)
+        except asyncio.CancelledError:
+            if not scope.get("state", {}).get("client_disconnected"):
+                raise
+            # Nobody is listening for a response; stop here instead of logging an error
+            asyncio.current_task().uncancel()
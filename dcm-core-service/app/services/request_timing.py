@@ -0,0 +1,108 @@
+"""Per-request time breakdown, reported as a Server-Timing header and Prometheus histograms.
+
+`ServerTimingMiddleware` opens an accumulator for each HTTP request, and the
+code that waits on something adds to it:
+
+- ``sql``: statement execution (the query_metrics engine hooks)
+- ``pool``: waiting for a pooled connection (database.TimedQueuePool)
+- ``orthanc``: Orthanc REST calls (`orthanc_event_hooks` on the httpx clients)
+- ``encode``: encoding JSON bodies (`TimedORJSONResponse`, cached-body encoding)
+
+The sums, plus the request's ``total``, are sent when the response starts, so
+a streamed body only accounts for the time before its first byte. Work outside
+a request (the poller, background tasks) is not attributed to anything.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from fastapi.responses import ORJSONResponse
+from prometheus_client import Histogram
+
+COMPONENTS = ("sql", "pool", "orthanc", "encode")
+
+REQUEST_COMPONENT_SECONDS = Histogram(
+    "dcm_request_component_seconds",
+    "Per-request time spent in SQL, pool checkout, Orthanc calls and encoding, by route",
+    ["route", "component"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+
+_current: ContextVar[Optional[dict[str, float]]] = ContextVar("request_timings", default=None)
+
+
+def add(component: str, seconds: float) -> None:
+    """Attribute *seconds* to *component* of the current request, if there is one."""
+    timings = _current.get()
+    if timings is not None:
+        timings[component] = timings.get(component, 0.0) + seconds
+
+
+@contextmanager
+def measure(component: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        add(component, time.perf_counter() - started)
+
+
+class TimedORJSONResponse(ORJSONResponse):
+    """ORJSONResponse that counts its rendering as ``encode`` time."""
+
+    def render(self, content) -> bytes:
+        with measure("encode"):
+            return super().render(content)
+
+
+async def _orthanc_request(request) -> None:
+    request.extensions["dcm_started_at"] = time.perf_counter()
+
+
+async def _orthanc_response(response) -> None:
+    started_at = response.request.extensions.get("dcm_started_at")
+    if started_at is not None:
+        add("orthanc", time.perf_counter() - started_at)
+
+
+def orthanc_event_hooks() -> dict:
+    """httpx ``event_hooks`` that time Orthanc calls (up to the response headers)."""
+    return {"request": [_orthanc_request], "response": [_orthanc_response]}
+
+
+class ServerTimingMiddleware:
+    """ASGI middleware: time each request's components and report them (see module docstring)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings: dict[str, float] = {}
+        started_at = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                total = time.perf_counter() - started_at
+                # The router records the matched route in the shared scope
+                route = getattr(scope.get("route"), "path", "unmatched")
+                for component in COMPONENTS:
+                    REQUEST_COMPONENT_SECONDS.labels(route=route, component=component).observe(
+                        timings.get(component, 0.0)
+                    )
+                header = ", ".join(
+                    f"{name};dur={seconds * 1000:.1f}"
+                    for name, seconds in [*((c, timings.get(c, 0.0)) for c in COMPONENTS), ("total", total)]
+                )
+                message = {**message, "headers": [*message.get("headers", []), (b"server-timing", header.encode())]}
+            await send(message)
+
+        token = _current.set(timings)
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
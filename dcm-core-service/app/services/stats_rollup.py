@@ -0,0 +1,255 @@
+"""Incrementally maintained counts behind /statistics.
+
+Every live study contributes a fixed set of (dimension, key) counts — one per
+modality, its institution, month, day and sex, one per series body part and
+instance-count bucket, plus the studies/series/instances totals.
+`ingest_study` and `soft_delete_study` compute a study's contribution before
+and after their change and add the difference to `statistics_rollup` in the
+same transaction, so /statistics only has to read that small table.
+
+Unique patients are estimated with HyperLogLog sketches in `statistics_sketch`,
+one per institution, modality and month plus an overall one. Ingest adds the
+study's patient to each of its sketches; sketches cannot forget, so a patient
+whose studies are all deleted is still counted until the next rebuild.
+
+`rebuild()` recomputes both tables from scratch (after a migration, after
+changing `hll_precision`, or if they are ever suspected to have drifted):
+
+    python -m app.services.stats_rollup
+"""
+import asyncio
+import logging
+from collections import Counter
+from typing import Iterable, Optional
+
+from sqlalchemy import select, func, case, delete, literal_column, text, cast
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.types import Text
+
+from ..config import settings
+from ..models import Study, Series, Instance, StatisticsRollup, StatisticsSketch
+from . import hll
+
+logger = logging.getLogger(__name__)
+
+TOTALS = "totals"
+MODALITY = "modality"
+INSTITUTION = "institution"
+MONTH = "month"
+DAY = "day"
+SEX = "sex"
+BODY_PART = "body_part"
+INSTANCE_BUCKET = "instance_bucket"
+
+# (upper bound inclusive, label); anything larger is "500+"
+_INSTANCE_BUCKETS = ((10, "1–10"), (50, "11–50"), (100, "51–100"), (500, "101–500"))
+_LAST_BUCKET = "500+"
+
+Contribution = Counter  # (dimension, key) -> count
+
+
+def instance_bucket(num_instances: Optional[int]) -> str:
+    n = num_instances or 0
+    for upper, label in _INSTANCE_BUCKETS:
+        if n <= upper:
+            return label
+    return _LAST_BUCKET
+
+
+def _contribution(study, series: Iterable, num_instances: int) -> Contribution:
+    """Counts one live study adds; *series* are its live series rows."""
+    counts: Contribution = Counter()
+    counts[TOTALS, "studies"] += 1
+    counts[TOTALS, "instances"] += num_instances
+    for modality in study.modalities_in_study or []:
+        counts[MODALITY, modality] += 1
+    if study.institution_name is not None:
+        counts[INSTITUTION, study.institution_name] += 1
+    if study.study_date is not None:
+        counts[MONTH, study.study_date.strftime("%Y-%m")] += 1
+        counts[DAY, study.study_date.isoformat()] += 1
+    counts[SEX, study.patient_sex or ""] += 1
+    for s in series:
+        counts[TOTALS, "series"] += 1
+        if s.body_part_examined:
+            counts[BODY_PART, s.body_part_examined] += 1
+        counts[INSTANCE_BUCKET, instance_bucket(s.num_instances)] += 1
+    return counts
+
+
+async def lock_study(orthanc_study_id: str, db: AsyncSession) -> None:
+    """Serialize changes to one study until commit, so before/after snapshots don't interleave."""
+    await db.execute(select(func.pg_advisory_xact_lock(func.hashtext(orthanc_study_id))))
+
+
+async def study_contribution(study_uid: str, db: AsyncSession) -> Contribution:
+    """Read a study's current contribution from the database (empty if absent or deleted)."""
+    result = await db.execute(
+        select(
+            Study.id, Study.deleted_at, Study.modalities_in_study, Study.institution_name,
+            Study.study_date, Study.patient_sex,
+        ).where(Study.study_uid == study_uid)
+    )
+    study = result.one_or_none()
+    if study is None or study.deleted_at is not None:
+        return Counter()
+
+    series = (await db.execute(
+        select(Series.body_part_examined, Series.num_instances)
+        .where(Series.study_id == study.id, Series.deleted_at.is_(None))
+    )).all()
+    num_instances = await db.scalar(
+        select(func.count(Instance.id))
+        .join(Series, Series.id == Instance.series_id)
+        .where(Series.study_id == study.id, Instance.deleted_at.is_(None))
+    )
+    return _contribution(study, series, num_instances or 0)
+
+
+def loaded_study_contribution(study: Study) -> Contribution:
+    """Contribution of a Study whose series and instances are already loaded."""
+    if study.deleted_at is not None:
+        return Counter()
+    series = [s for s in study.series if s.deleted_at is None]
+    num_instances = sum(1 for s in series for i in s.instances if i.deleted_at is None)
+    return _contribution(study, series, num_instances)
+
+
+async def apply_change(before: Contribution, after: Contribution, db: AsyncSession) -> list[dict]:
+    """Add ``after - before`` to the rollup table (one statement); return the non-zero deltas."""
+    delta = Counter(after)
+    delta.subtract(before)
+    # A stable row order keeps concurrent transactions from deadlocking on the upsert
+    rows = [
+        {"dimension": dimension, "key": key, "count": n}
+        for (dimension, key), n in sorted(delta.items())
+        if n
+    ]
+    if not rows:
+        return rows
+    stmt = pg_insert(StatisticsRollup).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["dimension", "key"],
+        set_={"count": StatisticsRollup.count + stmt.excluded.count},
+    )
+    await db.execute(stmt)
+    return rows
+
+
+def sketch_keys(study) -> list[tuple[str, str]]:
+    """The (dimension, key) sketches a live study's patient belongs to."""
+    keys = [(TOTALS, "patients")]
+    keys += [(MODALITY, modality) for modality in study.modalities_in_study or []]
+    if study.institution_name is not None:
+        keys.append((INSTITUTION, study.institution_name))
+    if study.study_date is not None:
+        keys.append((MONTH, study.study_date.strftime("%Y-%m")))
+    return sorted(keys)
+
+
+async def add_to_sketches(study, db: AsyncSession) -> None:
+    """Add a live study's patient to its unique-patient sketches (one statement)."""
+    if study.patient_id is None or study.deleted_at is not None:
+        return
+    precision = settings.hll_precision
+    index, rank = hll.register_update(study.patient_id, precision)
+    fresh = hll.HyperLogLog(precision)
+    fresh.registers[index] = rank
+
+    stmt = pg_insert(StatisticsSketch).values(
+        [{"dimension": d, "key": k, "registers": fresh.to_bytes()} for d, k in sketch_keys(study)]
+    )
+    # The patient touches one register: raise it in place, concurrently with other ingests.
+    # A sketch left at another precision (hll_precision changed, rebuild not yet run) is
+    # re-seeded rather than indexed out of range, which would fail the whole ingest.
+    registers = StatisticsSketch.registers
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["dimension", "key"],
+        set_={"registers": case(
+            (
+                func.length(registers) == len(fresh.registers),
+                func.set_byte(registers, index, func.greatest(func.get_byte(registers, index), rank)),
+            ),
+            else_=stmt.excluded.registers,
+        )},
+    )
+    await db.execute(stmt)
+
+
+async def _rebuild_sketches(db: AsyncSession) -> None:
+    sketches: dict[tuple[str, str], hll.HyperLogLog] = {}
+    result = await db.stream(
+        select(Study.patient_id, Study.modalities_in_study, Study.institution_name, Study.study_date)
+        .where(Study.deleted_at.is_(None), Study.patient_id.is_not(None))
+        .execution_options(yield_per=settings.export_batch_size)
+    )
+    async for study in result:
+        for key in sketch_keys(study):
+            sketch = sketches.get(key)
+            if sketch is None:
+                sketch = sketches[key] = hll.HyperLogLog(settings.hll_precision)
+            sketch.add(study.patient_id)
+
+    await db.execute(delete(StatisticsSketch))
+    if sketches:
+        await db.execute(
+            StatisticsSketch.__table__.insert(),
+            [{"dimension": d, "key": k, "registers": s.to_bytes()} for (d, k), s in sketches.items()],
+        )
+
+
+def _dimension(name: str):
+    # Inline literal: asyncpg re-parametrizes repeated bind values, which breaks GROUP BY 2
+    return literal_column(f"'{name}'")
+
+
+async def rebuild(db: AsyncSession) -> None:
+    """Recompute the rollup and sketch tables from studies/series/instances (caller commits)."""
+    live_studies = Study.deleted_at.is_(None)
+    live_series = Series.deleted_at.is_(None)
+    bucket = case(
+        *((func.coalesce(Series.num_instances, 0) <= upper, label) for upper, label in _INSTANCE_BUCKETS),
+        else_=_LAST_BUCKET,
+    )
+    aggregates = [
+        select(_dimension(TOTALS), literal_column("'studies'"), func.count()).where(live_studies),
+        select(_dimension(TOTALS), literal_column("'series'"), func.count()).select_from(Series).where(live_series),
+        select(_dimension(TOTALS), literal_column("'instances'"), func.count())
+        .select_from(Instance).where(Instance.deleted_at.is_(None)),
+        select(_dimension(MODALITY), func.unnest(Study.modalities_in_study), func.count())
+        .where(live_studies).group_by(text("2")),
+        select(_dimension(INSTITUTION), Study.institution_name, func.count())
+        .where(live_studies, Study.institution_name.is_not(None)).group_by(text("2")),
+        select(_dimension(MONTH), func.to_char(Study.study_date, "YYYY-MM"), func.count())
+        .where(live_studies, Study.study_date.is_not(None)).group_by(text("2")),
+        select(_dimension(DAY), func.to_char(Study.study_date, "YYYY-MM-DD"), func.count())
+        .where(live_studies, Study.study_date.is_not(None)).group_by(text("2")),
+        select(_dimension(SEX), cast(func.coalesce(Study.patient_sex, ""), Text), func.count())
+        .where(live_studies).group_by(text("2")),
+        select(_dimension(BODY_PART), Series.body_part_examined, func.count())
+        .where(live_series, Series.body_part_examined.is_not(None), Series.body_part_examined != "")
+        .group_by(text("2")),
+        select(_dimension(INSTANCE_BUCKET), bucket, func.count()).where(live_series).group_by(text("2")),
+    ]
+
+    await db.execute(delete(StatisticsRollup))
+    for aggregate in aggregates:
+        await db.execute(
+            StatisticsRollup.__table__.insert().from_select(["dimension", "key", "count"], aggregate)
+        )
+    await _rebuild_sketches(db)
+
+
+async def _main() -> None:
+    from ..database import AsyncSessionLocal
+
+    async with AsyncSessionLocal() as db:
+        await rebuild(db)
+        await db.commit()
+    logger.info("Rebuilt statistics_rollup")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main())
@@ -0,0 +1,129 @@
+"""Queue Orthanc webhook events and process them in background workers.
+
+`POST /webhook/orthanc` only validates and `enqueue()`s, so Orthanc's HTTP
+sender gets its answer in milliseconds however large the study is.
+`webhook_workers` tasks dispatch queued changes the way the poller does, each
+on its own session.
+
+The queue holds at most one change per study: an event for a study that is
+still waiting replaces the waiting one in place (same rule as
+`orthanc_poller.compact`), so Orthanc retries and bursts of StableStudy
+events cost no extra work. When `webhook_queue_size` studies are waiting,
+`enqueue()` refuses and the route answers 503 with Retry-After.
+
+The webhook is a shortcut, not the record: the poller still reads /changes,
+so an event that fails here, or is still queued at shutdown, is picked up
+on its next pass.
+"""
+import asyncio
+import logging
+import time as _time
+from collections import OrderedDict
+from typing import Optional
+
+from prometheus_client import Counter, Gauge, Histogram
+
+from ..config import settings
+from ..database import AsyncSessionLocal
+from .orthanc_poller import HANDLED_TYPES, dispatch
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_EVENTS = Counter(
+    "dcm_webhook_events_total",
+    "Webhook events by outcome (queued / coalesced / ignored / rejected)",
+    ["result"],
+)
+WEBHOOK_PROCESSED = Counter("dcm_webhook_processed_total", "Queued webhook events processed", ["result"])
+WEBHOOK_QUEUE_DEPTH = Gauge("dcm_webhook_queue_depth", "Studies waiting in the webhook queue")
+WEBHOOK_QUEUE_WAIT = Histogram("dcm_webhook_queue_wait_seconds", "Time a webhook event waited for a worker")
+
+# study ID -> (change, enqueued_at monotonic seconds); oldest first
+_pending: "OrderedDict[str, tuple[dict, float]]" = OrderedDict()
+WEBHOOK_QUEUE_DEPTH.set_function(lambda: len(_pending))
+_wakeup: Optional[asyncio.Event] = None
+_workers: list[asyncio.Task] = []
+
+
+class QueueFull(Exception):
+    pass
+
+
+def enqueue(change: dict) -> bool:
+    """Queue *change* for processing; False if its type is not one we handle.
+
+    Raises QueueFull when `webhook_queue_size` studies are already waiting.
+    """
+    if change.get("ChangeType") not in HANDLED_TYPES:
+        WEBHOOK_EVENTS.labels(result="ignored").inc()
+        return False
+    resource_id = change.get("ID", "")
+    waiting = _pending.get(resource_id)
+    if waiting is not None:
+        # Keep its place in line, act on the latest event
+        _pending[resource_id] = (change, waiting[1])
+        WEBHOOK_EVENTS.labels(result="coalesced").inc()
+        return True
+    if len(_pending) >= settings.webhook_queue_size:
+        WEBHOOK_EVENTS.labels(result="rejected").inc()
+        raise QueueFull()
+    _pending[resource_id] = (change, _time.monotonic())
+    WEBHOOK_EVENTS.labels(result="queued").inc()
+    if _wakeup is not None:
+        _wakeup.set()
+    return True
+
+
+async def _process(change: dict, enqueued_at: float) -> None:
+    WEBHOOK_QUEUE_WAIT.observe(_time.monotonic() - enqueued_at)
+    try:
+        async with AsyncSessionLocal() as db:
+            await dispatch(change, db)
+    except Exception as exc:
+        WEBHOOK_PROCESSED.labels(result="failed").inc()
+        logger.error(
+            "Webhook %s for %s failed (the poller will retry it): %s",
+            change.get("ChangeType"), change.get("ID"), exc, exc_info=True,
+        )
+    else:
+        WEBHOOK_PROCESSED.labels(result="ok").inc()
+
+
+async def drain() -> None:
+    """Process everything queued, in the calling task."""
+    while _pending:
+        _, (change, enqueued_at) = _pending.popitem(last=False)
+        await _process(change, enqueued_at)
+
+
+async def _worker() -> None:
+    while True:
+        if not _pending:
+            _wakeup.clear()
+            await _wakeup.wait()
+            continue
+        _, (change, enqueued_at) = _pending.popitem(last=False)
+        await _process(change, enqueued_at)
+
+
+def start() -> None:
+    """Start the workers (called from the app lifespan; events just queue otherwise)."""
+    global _wakeup
+    _wakeup = asyncio.Event()
+    if _pending:
+        _wakeup.set()
+    _workers.extend(asyncio.create_task(_worker()) for _ in range(settings.webhook_workers))
+
+
+async def stop() -> None:
+    """Stop the workers, giving queued events up to `webhook_drain_seconds` to finish."""
+    global _wakeup
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+    _wakeup = None
+    try:
+        await asyncio.wait_for(drain(), settings.webhook_drain_seconds)
+    except asyncio.TimeoutError:
+        logger.warning("Webhook: %d queued events left to the poller at shutdown", len(_pending))
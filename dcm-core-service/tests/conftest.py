@@ -4,6 +4,7 @@ from httpx import AsyncClient, ASGITransport
 from unittest.mock import AsyncMock, MagicMock, patch
 
 from app.main import app
+from app.services import query_cache
 
 
 @pytest.fixture(scope="session")
@@ -11,6 +12,14 @@ def anyio_backend():
     return "asyncio"
 
 
+@pytest.fixture(autouse=True)
+def _empty_query_cache():
+    """Responses cached by one test must not leak into the next."""
+    query_cache.clear()
+    yield
+    query_cache.clear()
+
+
 @pytest_asyncio.fixture
 async def client():
     """FastAPI test client using in-process ASGI transport (no real DB or poller)."""
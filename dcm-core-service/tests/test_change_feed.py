@@ -0,0 +1,82 @@
+"""Unit tests for the NOTIFY change feed publisher."""
+import asyncio
+import orjson
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app.services import change_feed
+
+
+@pytest.fixture
+def feed():
+    session = AsyncMock()
+    factory = MagicMock()
+    factory.return_value.__aenter__.return_value = session
+    with patch.object(change_feed, "AsyncSessionLocal", factory):
+        change_feed.start()
+        yield session
+        change_feed._enabled = False
+        change_feed._cancel_timer()
+        change_feed._pending.clear()
+
+
+def _sent(session) -> list[dict]:
+    events = []
+    for call in session.execute.await_args_list:
+        params = call.args[0].compile().params
+        payload = next(v for v in params.values() if isinstance(v, str) and v.startswith("{"))
+        assert len(payload.encode()) < 8000
+        events += orjson.loads(payload)["events"]
+    return events
+
+
+def test_publish_is_a_noop_until_started():
+    change_feed.publish("ingested", "1.2.3", "abc")
+    assert change_feed._pending == []
+
+
+@pytest.mark.asyncio
+async def test_changes_are_batched_into_one_notify(feed):
+    with patch.object(change_feed.settings, "change_feed_flush_ms", 10):
+        change_feed.publish("ingested", "1.2.3", "abc")
+        change_feed.publish("deleted", "1.2.4", "def")
+        await asyncio.sleep(0.05)
+
+    assert feed.execute.await_count == 1
+    feed.commit.assert_awaited_once()
+    assert _sent(feed) == [
+        {"op": "ingested", "study_uid": "1.2.3", "orthanc_id": "abc"},
+        {"op": "deleted", "study_uid": "1.2.4", "orthanc_id": "def"},
+    ]
+
+
+@pytest.mark.asyncio
+async def test_large_batches_are_split_under_the_payload_limit(feed):
+    with patch.object(change_feed.settings, "change_feed_max_batch", 10_000):
+        for i in range(300):
+            change_feed.publish("ingested", f"1.2.840.10008.{i:060d}", f"orthanc-{i:040d}")
+        await change_feed.stop()
+
+    assert feed.execute.await_count > 1
+    assert [e["study_uid"] for e in _sent(feed)] == [f"1.2.840.10008.{i:060d}" for i in range(300)]
+
+
+@pytest.mark.asyncio
+async def test_full_batch_flushes_without_waiting(feed):
+    with patch.object(change_feed.settings, "change_feed_max_batch", 2), \
+         patch.object(change_feed.settings, "change_feed_flush_ms", 60_000):
+        change_feed.publish("ingested", "1", "a")
+        change_feed.publish("ingested", "2", "b")
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+
+    assert len(_sent(feed)) == 2
+    assert change_feed._flush_timer is None
+
+
+@pytest.mark.asyncio
+async def test_notify_failure_is_logged_not_raised(feed):
+    feed.execute.side_effect = RuntimeError("connection lost")
+    change_feed.publish("ingested", "1", "a")
+    await change_feed.flush()
+    assert change_feed._pending == []
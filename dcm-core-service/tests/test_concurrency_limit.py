@@ -0,0 +1,126 @@
+"""Tests for the per-route concurrency limiter."""
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from fastapi import HTTPException
+
+from app.services.concurrency_limit import ConcurrencyLimiter
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+@pytest.mark.asyncio
+async def test_excess_requests_queue_in_order():
+    limiter = ConcurrencyLimiter("t-order", max_concurrent=1, max_queue=2, queue_timeout=1)
+    order = []
+
+    async def request(n):
+        async with limiter.slot():
+            order.append(n)
+            await asyncio.sleep(0.01)
+
+    await asyncio.gather(*(request(n) for n in range(3)))
+
+    assert order == [0, 1, 2]
+    assert limiter._active == 0 and not limiter._waiters
+
+
+@pytest.mark.asyncio
+async def test_full_queue_is_shed_with_429():
+    limiter = ConcurrencyLimiter("t-full", max_concurrent=1, max_queue=1, queue_timeout=1)
+    await limiter.acquire()
+    queued = asyncio.create_task(limiter.acquire())
+    await _settle()
+
+    with pytest.raises(HTTPException) as excinfo:
+        await limiter.acquire()
+
+    assert excinfo.value.status_code == 429
+    assert excinfo.value.headers["Retry-After"] == "2"
+    limiter.release()
+    await queued  # the queued request got the released slot
+    limiter.release()
+    assert limiter._active == 0
+
+
+@pytest.mark.asyncio
+async def test_queue_timeout_is_shed_with_503():
+    limiter = ConcurrencyLimiter("t-timeout", max_concurrent=1, max_queue=1, queue_timeout=0.01)
+    await limiter.acquire()
+
+    with pytest.raises(HTTPException) as excinfo:
+        await limiter.acquire()
+
+    assert excinfo.value.status_code == 503
+    assert not limiter._waiters
+    limiter.release()
+    assert limiter._active == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_leaves_the_queue():
+    limiter = ConcurrencyLimiter("t-cancel", max_concurrent=1, max_queue=1, queue_timeout=1)
+    await limiter.acquire()
+    waiter = asyncio.create_task(limiter.acquire())
+    await _settle()
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+
+    assert not limiter._waiters
+    limiter.release()
+    assert limiter._active == 0
+
+
+@pytest.mark.asyncio
+async def test_export_holds_its_slot_until_the_body_is_sent(client):
+    from app.api import studies
+
+    held_while_streaming = []
+
+    async def rows(filters, fmt, session_factory):
+        held_while_streaming.append(studies._EXPORT_LIMIT._active)
+        yield b"{}\n"
+
+    with patch.object(studies, "_export_rows", rows):
+        resp = await client.get("/studies/export")
+
+    assert resp.status_code == 200
+    assert held_while_streaming == [1]
+    assert studies._EXPORT_LIMIT._active == 0
+
+
+@pytest.mark.asyncio
+async def test_export_is_rejected_when_saturated(client):
+    from app.api import studies
+
+    limiter = ConcurrencyLimiter("t-export", max_concurrent=0, max_queue=0, queue_timeout=1)
+    with patch.object(studies, "_EXPORT_LIMIT", limiter):
+        resp = await client.get("/studies/export")
+
+    assert resp.status_code == 429
+    assert resp.headers["retry-after"] == "2"
+
+
+@pytest.mark.asyncio
+async def test_statistics_cache_hits_bypass_the_limiter():
+    from starlette.requests import Request
+    from app.api import statistics
+
+    request = Request({"type": "http", "method": "GET", "headers": []})
+    compute = AsyncMock(return_value={"total_studies": 1})
+    await statistics._cached_json(request, ("t-stats",), "statistics", compute)
+
+    saturated = ConcurrencyLimiter("t-stats", max_concurrent=0, max_queue=0, queue_timeout=1)
+    with patch.object(statistics, "_LIMIT", saturated):
+        resp = await statistics._cached_json(request, ("t-stats",), "statistics", compute)
+        with pytest.raises(HTTPException) as excinfo:
+            await statistics._cached_json(request, ("t-stats-miss",), "statistics", compute)
+
+    assert resp.status_code == 200
+    assert excinfo.value.status_code == 429
+    compute.assert_awaited_once()
@@ -0,0 +1,159 @@
+"""Tests for connection pool configuration, metrics, pre-warming and read routing."""
+import asyncio
+import time
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from fastapi import FastAPI, HTTPException, Request
+from httpx import AsyncClient, ASGITransport
+from prometheus_client import REGISTRY
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app import database
+
+
+def test_default_engine_uses_the_timed_queue_pool():
+    assert isinstance(database.engine.pool, database.TimedQueuePool)
+    assert database.engine.pool.size() == database.settings.db_pool_size
+
+
+def test_pool_options_come_from_settings():
+    with patch.object(database.settings, "db_pool_size", 3), \
+         patch.object(database.settings, "db_pool_pre_ping", False), \
+         patch.object(database.settings, "db_statement_cache_size", 0):
+        options = database.engine_options()
+
+    assert options["pool_size"] == 3
+    assert options["pool_pre_ping"] is False
+    assert options["connect_args"] == {"prepared_statement_cache_size": 0}
+
+
+def test_pgbouncer_mode_disables_pooling_and_statement_reuse():
+    with patch.object(database.settings, "db_pgbouncer", True):
+        options = database.engine_options()
+
+    assert options["poolclass"] is NullPool
+    args = options["connect_args"]
+    assert args["statement_cache_size"] == 0
+    assert args["prepared_statement_cache_size"] == 0
+    assert args["prepared_statement_name_func"]() != args["prepared_statement_name_func"]()
+
+
+def test_checkout_wait_is_recorded():
+    pool = database.TimedQueuePool(MagicMock(), pool_size=1)
+    waited = lambda: REGISTRY.get_sample_value("dcm_db_pool_checkout_seconds_sum", {"pool": "primary"}) or 0
+    before = waited()
+    with patch.object(database.AsyncAdaptedQueuePool, "_do_get", side_effect=lambda: time.sleep(0.01)):
+        pool._do_get()
+    assert waited() - before >= 0.01
+
+
+def test_pool_gauges_are_exported_per_engine():
+    read_engine = create_async_engine(
+        "postgresql+asyncpg://dcm@replica/dcmdb", **database.engine_options(database.ReadTimedQueuePool)
+    )
+    database._export_pool_gauges(read_engine, "read")
+
+    for engine in ("primary", "read"):
+        assert REGISTRY.get_sample_value("dcm_db_pool_connections_in_use", {"engine": engine}) == 0
+        assert REGISTRY.get_sample_value("dcm_db_pool_overflow", {"engine": engine}) == 0
+
+
+@pytest.mark.asyncio
+async def test_warm_pool_opens_pool_size_connections_concurrently():
+    open_now = peak = 0
+
+    class Connection:
+        async def __aenter__(self):
+            nonlocal open_now, peak
+            open_now += 1
+            peak = max(peak, open_now)
+            return self
+
+        async def __aexit__(self, *exc):
+            nonlocal open_now
+            open_now -= 1
+
+        async def execute(self, stmt):
+            await asyncio.sleep(0)
+
+    with patch.object(database.settings, "db_pool_size", 4), \
+         patch.object(database, "engine", MagicMock(pool=database.engine.pool, connect=Connection)):
+        await database.warm_pool()
+
+    assert peak == 4
+
+
+@pytest.mark.asyncio
+async def test_warm_pool_failure_does_not_block_startup():
+    connect = MagicMock(side_effect=OSError("refused"))
+    with patch.object(database, "engine", MagicMock(pool=database.engine.pool, connect=connect)):
+        await database.warm_pool()
+    connect.assert_called()
+
+
+def _request(cookies: str = "") -> Request:
+    headers = [(b"cookie", cookies.encode())] if cookies else []
+    return Request({"type": "http", "method": "GET", "headers": headers})
+
+
+def test_reads_use_the_primary_without_a_replica():
+    assert database.ReadSessionLocal is None
+    assert database.use_replica(_request()) is False
+
+
+def test_reads_use_the_replica_unless_pinned():
+    with patch.object(database, "ReadSessionLocal", MagicMock()):
+        assert database.use_replica(_request()) is True
+        assert database.use_replica(_request(f"{database.READ_PIN_COOKIE}=1")) is False
+
+
+@pytest.mark.asyncio
+async def test_get_read_db_falls_back_to_the_primary_session():
+    primary = AsyncMock()
+    sessions = database.get_read_db(_request(), primary)
+    assert await sessions.__anext__() is primary
+
+
+def _dependency_calls(dependant):
+    for sub in dependant.dependencies:
+        yield sub.call
+        yield from _dependency_calls(sub)
+
+
+def test_query_cached_routes_read_the_primary():
+    """Cache fills must not read a replica that may lag the commit that invalidated the cache."""
+    from app.main import app
+
+    cached = {"/studies", "/statistics", "/statistics/timeseries", "/statistics/unique-patients"}
+    routes = [r for r in app.routes if getattr(r, "path", None) in cached and "GET" in r.methods]
+    assert {r.path for r in routes} == cached
+    for route in routes:
+        assert database.get_read_db not in set(_dependency_calls(route.dependant)), route.path
+
+
+@pytest.mark.asyncio
+async def test_successful_writes_pin_reads_to_the_primary():
+    app = FastAPI()
+    app.add_middleware(database.PinReadsAfterWrites)
+
+    @app.get("/read")
+    async def read():
+        return {}
+
+    @app.post("/write")
+    async def write():
+        return {}
+
+    @app.post("/reject")
+    async def reject():
+        raise HTTPException(status_code=422)
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        assert database.READ_PIN_COOKIE not in (await client.get("/read")).cookies
+        assert database.READ_PIN_COOKIE not in (await client.post("/reject")).cookies
+        response = await client.post("/write")
+
+    assert response.cookies[database.READ_PIN_COOKIE] == "1"
+    assert f"Max-Age={database.settings.read_your_writes_seconds}" in response.headers["set-cookie"]
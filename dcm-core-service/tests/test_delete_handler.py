@@ -1,34 +1,46 @@
 """Unit tests for delete_handler service."""
 import pytest
-from unittest.mock import AsyncMock, MagicMock
+from unittest.mock import AsyncMock, MagicMock, patch
 from uuid import uuid4
 from datetime import datetime, timezone
 
 
 def make_series_mock(num_instances=2):
     instances = [MagicMock(deleted_at=None) for _ in range(num_instances)]
-    series = MagicMock(deleted_at=None)
+    series = MagicMock(deleted_at=None, body_part_examined="CHEST", num_instances=num_instances)
     series.instances = instances
     return series
 
 
+def make_study_mock(orthanc_id, study_uid, series):
+    study = MagicMock()
+    study.orthanc_id = orthanc_id
+    study.study_uid = study_uid
+    study.deleted_at = None
+    study.series = series
+    study.modalities_in_study = ["CT"]
+    study.institution_name = "General Hospital"
+    study.study_date = datetime(2023, 6, 15).date()
+    study.patient_sex = "M"
+    return study
+
+
 @pytest.mark.asyncio
 async def test_soft_delete_study_sets_deleted_at():
     """soft_delete_study should set deleted_at on the study and its children."""
     from app.services.delete_handler import soft_delete_study
 
     series1 = make_series_mock(2)
-    study = MagicMock()
-    study.orthanc_id = "orthanc-abc"
-    study.study_uid = "1.2.840.test"
-    study.deleted_at = None
-    study.series = [series1]
+    study = make_study_mock("orthanc-abc", "1.2.840.test", [series1])
 
     db = AsyncMock()
     result = MagicMock()
     result.scalar_one_or_none.return_value = study
     db.execute = AsyncMock(return_value=result)
 
+    from app.services import query_cache
+    generation = query_cache.generation()
+
     await soft_delete_study("orthanc-abc", db)
 
     assert study.deleted_at is not None
@@ -36,6 +48,7 @@ async def test_soft_delete_study_sets_deleted_at():
     for inst in series1.instances:
         assert inst.deleted_at is not None
     db.commit.assert_awaited_once()
+    assert query_cache.generation() == generation + 1
 
 
 @pytest.mark.asyncio
@@ -59,11 +72,7 @@ async def test_soft_delete_study_multiple_series():
     from app.services.delete_handler import soft_delete_study
 
     series_list = [make_series_mock(3), make_series_mock(1)]
-    study = MagicMock()
-    study.orthanc_id = "orthanc-xyz"
-    study.study_uid = "1.2.840.multi"
-    study.deleted_at = None
-    study.series = series_list
+    study = make_study_mock("orthanc-xyz", "1.2.840.multi", series_list)
 
     db = AsyncMock()
     result = MagicMock()
@@ -77,3 +86,28 @@ async def test_soft_delete_study_multiple_series():
         assert s.deleted_at is not None
         for i in s.instances:
             assert i.deleted_at is not None
+
+
+@pytest.mark.asyncio
+async def test_soft_delete_study_subtracts_rollup_contribution():
+    """The study's statistics contribution is removed in the same transaction."""
+    from app.services.delete_handler import soft_delete_study
+
+    study = make_study_mock("orthanc-xyz", "1.2.840.multi", [make_series_mock(3), make_series_mock(1)])
+    db = AsyncMock()
+    result = MagicMock()
+    result.scalar_one_or_none.return_value = study
+    db.execute = AsyncMock(return_value=result)
+
+    with patch("app.services.delete_handler.stats_rollup.apply_change", new_callable=AsyncMock) as apply_change:
+        await soft_delete_study("orthanc-xyz", db)
+
+    before, after = apply_change.await_args.args[:2]
+    assert not after
+    assert before[("totals", "studies")] == 1
+    assert before[("totals", "series")] == 2
+    assert before[("totals", "instances")] == 4
+    assert before[("modality", "CT")] == 1
+    assert before[("month", "2023-06")] == 1
+    assert before[("body_part", "CHEST")] == 2
+    assert before[("instance_bucket", "1–10")] == 2
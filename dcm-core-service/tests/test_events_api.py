@@ -0,0 +1,122 @@
+"""Unit tests for the /events SSE feed and its broadcaster."""
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from app.services import event_broadcaster
+
+
+@pytest.fixture(autouse=True)
+def _no_subscribers():
+    yield
+    for subscription in list(event_broadcaster._subscribers):
+        subscription.close()
+
+
+@pytest.mark.asyncio
+async def test_stream_yields_published_events():
+    from app.api.events import _stream
+
+    stream = _stream()
+    assert (await anext(stream)).startswith(b"retry: ")
+    (subscription,) = event_broadcaster._subscribers
+
+    event_broadcaster.publish("study_ingested", {"study_uid": "1.2.3", "rollup_delta": []})
+    chunk = await anext(stream)
+
+    assert b"event: study_ingested\n" in chunk
+    assert b'data: {"study_uid":"1.2.3","rollup_delta":[]}\n\n' in chunk
+
+    await stream.aclose()
+    assert subscription not in event_broadcaster._subscribers
+
+
+@pytest.mark.asyncio
+async def test_stream_sends_keepalive_when_idle():
+    from app.api.events import _stream
+
+    with patch.object(event_broadcaster.settings, "sse_heartbeat_seconds", 0.01):
+        stream = _stream()
+        await anext(stream)
+        assert await anext(stream) == b": keepalive\n\n"
+        await stream.aclose()
+
+
+@pytest.mark.asyncio
+async def test_unstarted_stream_holds_no_subscription():
+    """A response dropped before its body is iterated must not count toward the cap."""
+    from app.api.events import stream_events
+
+    response = await stream_events()
+    assert not event_broadcaster._subscribers
+    await response.body_iterator.aclose()
+
+
+@pytest.mark.asyncio
+async def test_stream_ends_when_cap_filled_after_the_check():
+    from app.api.events import _stream
+
+    with patch.object(event_broadcaster.settings, "sse_max_subscribers", 0):
+        chunks = [chunk async for chunk in _stream()]
+
+    assert len(chunks) == 1 and chunks[0].startswith(b"retry: ")
+    assert not event_broadcaster._subscribers
+
+
+@pytest.mark.asyncio
+async def test_slow_subscriber_gets_resync_instead_of_backlog():
+    with patch.object(event_broadcaster.settings, "sse_queue_size", 3):
+        slow = event_broadcaster.subscribe()
+    fast = event_broadcaster.subscribe()
+
+    for i in range(5):
+        event_broadcaster.publish("study_deleted", {"n": i})
+
+    assert slow.queue.qsize() == 1
+    assert fast.queue.qsize() == 5
+
+    # Nothing queues behind the resync until the client has read it
+    event_broadcaster.publish("study_deleted", {"n": 5})
+    assert slow.queue.qsize() == 1
+    assert (await slow.next(0.1)).event == "resync"
+
+    event_broadcaster.publish("study_deleted", {"n": 6})
+    assert (await slow.next(0.1)).data == {"n": 6}
+
+
+@pytest.mark.asyncio
+async def test_subscriber_cap_returns_503():
+    from httpx import AsyncClient, ASGITransport
+    from app.main import app
+
+    with patch.object(event_broadcaster.settings, "sse_max_subscribers", 1):
+        held = event_broadcaster.subscribe()
+        assert len(event_broadcaster._subscribers) == 1
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+            with patch("app.services.orthanc_poller.start_poller", new_callable=AsyncMock):
+                resp = await ac.get("/events")
+
+    assert resp.status_code == 503
+    assert resp.headers["retry-after"] == "5"
+    held.close()
+
+
+@pytest.mark.asyncio
+async def test_soft_delete_publishes_event():
+    from unittest.mock import MagicMock
+    from app.services.delete_handler import soft_delete_study
+
+    study = MagicMock(study_uid="1.2.840.test", deleted_at=None, series=[], modalities_in_study=[],
+                      institution_name=None, study_date=None, patient_sex="F")
+    db = AsyncMock()
+    result = MagicMock()
+    result.scalar_one_or_none.return_value = study
+    db.execute = AsyncMock(return_value=result)
+    subscription = event_broadcaster.subscribe()
+
+    await soft_delete_study("orthanc-abc", db)
+
+    event = await subscription.next(0.1)
+    assert event.event == "study_deleted"
+    assert event.data["study_uid"] == "1.2.840.test"
+    assert {"dimension": "totals", "key": "studies", "count": -1} in event.data["rollup_delta"]
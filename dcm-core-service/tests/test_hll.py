@@ -0,0 +1,55 @@
+"""Unit tests for the HyperLogLog sketch."""
+import pytest
+
+from app.services.hll import HyperLogLog, merged, register_update, standard_error
+
+
+def test_estimate_within_error_bound():
+    sketch = HyperLogLog(12)
+    for i in range(20_000):
+        sketch.add(f"patient-{i}")
+    # 3 standard errors
+    assert abs(sketch.count() / 20_000 - 1) < 3 * standard_error(12)
+
+
+def test_duplicates_do_not_count_twice():
+    sketch = HyperLogLog(10)
+    for _ in range(5):
+        for i in range(100):
+            sketch.add(f"patient-{i}")
+    assert sketch.count() == pytest.approx(100, rel=0.1)
+
+
+def test_merge_equals_union():
+    a, b, union = HyperLogLog(12), HyperLogLog(12), HyperLogLog(12)
+    for i in range(3000):
+        a.add(str(i))
+        union.add(str(i))
+    for i in range(2000, 6000):
+        b.add(str(i))
+        union.add(str(i))
+    a.merge(b)
+    assert a.to_bytes() == union.to_bytes()
+
+
+def test_single_register_update_matches_add():
+    sketch = HyperLogLog(12)
+    sketch.add("P001")
+    index, rank = register_update("P001", 12)
+    assert sketch.registers[index] == rank
+    assert sum(1 for r in sketch.registers if r) == 1
+
+
+def test_merged_skips_other_precisions():
+    old = HyperLogLog(10)
+    old.add("x")
+    current = HyperLogLog(12)
+    current.add("y")
+    assert merged([old.to_bytes(), current.to_bytes()], 12).count() == 1
+
+
+def test_rejects_mismatched_merge_and_precision():
+    with pytest.raises(ValueError):
+        HyperLogLog(12).merge(HyperLogLog(10))
+    with pytest.raises(ValueError):
+        HyperLogLog(20)
@@ -78,6 +78,22 @@ async def test_ingest_study_creates_records():
     db.commit.assert_called()
 
 
+@pytest.mark.asyncio
+async def test_instance_upsert_conflicts_on_the_partitioned_key():
+    """instances is partitioned by series_id, so the upsert key must include it."""
+    from sqlalchemy.dialects import postgresql
+    from app.services.metadata_ingester import _ingest_instance
+
+    db = AsyncMock()
+    with patch("app.services.metadata_ingester.orthanc_client") as mock_client:
+        mock_client.get = AsyncMock(return_value=MOCK_INSTANCE_DATA)
+        await _ingest_instance("instance-111", uuid4(), db)
+
+    sql = str(db.execute.await_args.args[0].compile(dialect=postgresql.dialect()))
+    assert "ON CONFLICT (series_id, sop_instance_uid) DO UPDATE" in sql
+    assert "series_id = excluded.series_id" not in sql
+
+
 @pytest.mark.asyncio
 async def test_ingest_study_skips_missing_study_uid():
     """If Orthanc returns a study with no StudyInstanceUID, we skip it silently."""
@@ -119,3 +135,70 @@ async def test_parse_date_edge_cases():
     assert _parse_date(None) is None
     assert _parse_date("bad-date") is None
     assert _parse_date("20231") is None
+
+
+@pytest.mark.asyncio
+async def test_ingest_study_denormalizes_modalities():
+    """ingest_study should store the distinct series modalities on the study row."""
+    from app.services.metadata_ingester import ingest_study
+
+    study_row = MagicMock()
+    study_row.id = uuid4()
+    series_row = MagicMock()
+    series_row.id = uuid4()
+
+    second_series = {
+        "ID": "series-bbb",
+        "MainDicomTags": {"SeriesInstanceUID": "1.2.840.test.series2", "Modality": "sr"},
+        "Instances": [],
+    }
+    study_data = {**MOCK_STUDY_DATA, "Series": ["series-aaa", "series-bbb"]}
+
+    # execute() order: study upsert, study select, then per series: upsert, select, instance upserts
+    execute_results = [
+        MagicMock(), MagicMock(scalar_one=lambda: study_row),
+        MagicMock(), MagicMock(scalar_one=lambda: series_row), MagicMock(),
+        MagicMock(), MagicMock(scalar_one=lambda: series_row),
+    ]
+    db = AsyncMock()
+    db.execute = AsyncMock(side_effect=execute_results)
+
+    with patch("app.services.metadata_ingester.orthanc_client") as mock_client, \
+            patch("app.services.metadata_ingester.stats_rollup", AsyncMock()):
+        mock_client.get = AsyncMock(side_effect=[study_data, MOCK_SERIES_DATA, MOCK_INSTANCE_DATA, second_series])
+        await ingest_study("orthanc-study-abc", db)
+
+    assert study_row.modalities_in_study == ["CT", "SR"]
+    assert study_row.num_instances == 1
+
+
+@pytest.mark.asyncio
+async def test_ingest_study_applies_rollup_delta_before_commit():
+    """The statistics rollup is updated with the study's before/after contribution, then committed."""
+    from app.services.metadata_ingester import ingest_study
+
+    study_row = MagicMock()
+    study_row.id = uuid4()
+    series_row = MagicMock()
+    series_row.id = uuid4()
+    execute_results = [
+        MagicMock(), MagicMock(scalar_one=lambda: study_row),
+        MagicMock(), MagicMock(scalar_one=lambda: series_row), MagicMock(),
+    ]
+    db = AsyncMock()
+    db.execute = AsyncMock(side_effect=execute_results)
+    calls = []
+    db.commit = AsyncMock(side_effect=lambda: calls.append("commit"))
+
+    rollup = AsyncMock()
+    rollup.study_contribution = AsyncMock(side_effect=[{"old": 1}, {"new": 1}])
+    rollup.apply_change = AsyncMock(side_effect=lambda *a: calls.append("apply"))
+
+    with patch("app.services.metadata_ingester.orthanc_client") as mock_client, \
+            patch("app.services.metadata_ingester.stats_rollup", rollup):
+        mock_client.get = AsyncMock(side_effect=[MOCK_STUDY_DATA, MOCK_SERIES_DATA, MOCK_INSTANCE_DATA])
+        await ingest_study("orthanc-study-abc", db)
+
+    rollup.lock_study.assert_awaited_once_with("orthanc-study-abc", db)
+    assert rollup.apply_change.await_args.args[:2] == ({"old": 1}, {"new": 1})
+    assert calls == ["apply", "commit"]
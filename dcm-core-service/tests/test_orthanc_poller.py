@@ -49,18 +49,18 @@ async def test_save_last_seq_commits():
     db.commit.assert_awaited_once()
 
 
-# ── _dispatch ─────────────────────────────────────────────────────────────────
+# ── dispatch ──────────────────────────────────────────────────────────────────
 
 @pytest.mark.asyncio
 async def test_dispatch_stable_study():
-    from app.services.orthanc_poller import _dispatch
+    from app.services.orthanc_poller import dispatch
 
     db = AsyncMock()
     change = {"ChangeType": "StableStudy", "ID": "study-1"}
 
     with patch("app.services.orthanc_poller.ingest_study", new_callable=AsyncMock) as mock_ingest:
         with patch("app.services.orthanc_poller.STUDIES_INGESTED") as mock_counter:
-            await _dispatch(change, db)
+            await dispatch(change, db)
 
     mock_ingest.assert_awaited_once_with("study-1", db)
     mock_counter.inc.assert_called_once()
@@ -68,14 +68,14 @@ async def test_dispatch_stable_study():
 
 @pytest.mark.asyncio
 async def test_dispatch_deleted_study():
-    from app.services.orthanc_poller import _dispatch
+    from app.services.orthanc_poller import dispatch
 
     db = AsyncMock()
     change = {"ChangeType": "DeletedStudy", "ID": "study-del"}
 
     with patch("app.services.orthanc_poller.soft_delete_study", new_callable=AsyncMock) as mock_del:
         with patch("app.services.orthanc_poller.STUDIES_DELETED") as mock_counter:
-            await _dispatch(change, db)
+            await dispatch(change, db)
 
     mock_del.assert_awaited_once_with("study-del", db)
     mock_counter.inc.assert_called_once()
@@ -83,14 +83,14 @@ async def test_dispatch_deleted_study():
 
 @pytest.mark.asyncio
 async def test_dispatch_unknown_type_is_noop():
-    from app.services.orthanc_poller import _dispatch
+    from app.services.orthanc_poller import dispatch
 
     db = AsyncMock()
     change = {"ChangeType": "NewSeries", "ID": "series-1"}
 
     with patch("app.services.orthanc_poller.ingest_study", new_callable=AsyncMock) as mock_ingest:
         with patch("app.services.orthanc_poller.soft_delete_study", new_callable=AsyncMock) as mock_del:
-            await _dispatch(change, db)
+            await dispatch(change, db)
 
     mock_ingest.assert_not_awaited()
     mock_del.assert_not_awaited()
@@ -98,14 +98,14 @@ async def test_dispatch_unknown_type_is_noop():
 
 @pytest.mark.asyncio
 async def test_dispatch_missing_change_type_is_noop():
-    from app.services.orthanc_poller import _dispatch
+    from app.services.orthanc_poller import dispatch
 
     db = AsyncMock()
     change = {"ID": "study-x"}  # no ChangeType key
 
     with patch("app.services.orthanc_poller.ingest_study", new_callable=AsyncMock) as mock_ingest:
         with patch("app.services.orthanc_poller.soft_delete_study", new_callable=AsyncMock) as mock_del:
-            await _dispatch(change, db)
+            await dispatch(change, db)
 
     mock_ingest.assert_not_awaited()
     mock_del.assert_not_awaited()
@@ -182,3 +182,19 @@ async def test_reconcile_handles_orthanc_error_gracefully():
             await _reconcile_deletions()  # must not raise
 
     mock_del.assert_not_awaited()
+
+
+# ── compact ───────────────────────────────────────────────────────────────────
+
+def test_compact_keeps_last_handled_change_per_study():
+    from app.services.orthanc_poller import compact
+
+    changes = [
+        {"ChangeType": "StableStudy", "ID": "a", "Seq": 1},
+        {"ChangeType": "NewInstance", "ID": "i", "Seq": 2},
+        {"ChangeType": "StableStudy", "ID": "b", "Seq": 3},
+        {"ChangeType": "StableStudy", "ID": "a", "Seq": 4},
+        {"ChangeType": "DeletedStudy", "ID": "b", "Seq": 5},
+    ]
+
+    assert [c["Seq"] for c in compact(changes)] == [4, 5]
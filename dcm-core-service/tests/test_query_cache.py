@@ -0,0 +1,90 @@
+"""Unit tests for the in-process query cache."""
+import asyncio
+import pytest
+from unittest.mock import patch
+
+from app.services import query_cache
+from app.services.query_cache import CachedBody
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_share_one_load():
+    calls = 0
+
+    async def load():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return CachedBody(b"[]")
+
+    results = await asyncio.gather(*(query_cache.get_or_load("k", load, route="t") for _ in range(5)))
+
+    assert calls == 1
+    assert all(r.body == b"[]" for r in results)
+    assert (await query_cache.get_or_load("k", load, route="t")).body == b"[]"
+    assert calls == 1
+
+
+@pytest.mark.asyncio
+async def test_bump_generation_invalidates():
+    bodies = iter([b"1", b"2"])
+
+    async def load():
+        return CachedBody(next(bodies))
+
+    assert (await query_cache.get_or_load("k", load, route="t")).body == b"1"
+    query_cache.bump_generation()
+    assert (await query_cache.get_or_load("k", load, route="t")).body == b"2"
+
+
+@pytest.mark.asyncio
+async def test_load_spanning_a_change_is_not_kept():
+    bodies = iter([b"stale", b"fresh"])
+
+    async def load():
+        body = next(bodies)
+        if body == b"stale":
+            query_cache.bump_generation()
+        return CachedBody(body)
+
+    assert (await query_cache.get_or_load("k", load, route="t")).body == b"stale"
+    assert (await query_cache.get_or_load("k", load, route="t")).body == b"fresh"
+
+
+@pytest.mark.asyncio
+async def test_failed_load_propagates_to_waiters_and_is_not_cached():
+    async def boom():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("db down")
+
+    results = await asyncio.gather(
+        *(query_cache.get_or_load("k", boom, route="t") for _ in range(3)), return_exceptions=True
+    )
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+    async def ok():
+        return CachedBody(b"ok")
+
+    assert (await query_cache.get_or_load("k", ok, route="t")).body == b"ok"
+
+
+@pytest.mark.asyncio
+async def test_byte_cap_evicts_least_recently_used():
+    async def load_a():
+        return CachedBody(b"a" * 40)
+
+    async def load_b():
+        return CachedBody(b"b" * 40)
+
+    async def load_c():
+        return CachedBody(b"c" * 40)
+
+    with patch.object(query_cache.settings, "query_cache_max_bytes", 100):
+        await query_cache.get_or_load("a", load_a, route="t")
+        await query_cache.get_or_load("b", load_b, route="t")
+        await query_cache.get_or_load("a", load_a, route="t")  # touch a
+        await query_cache.get_or_load("c", load_c, route="t")
+
+    assert query_cache._lookup("b") is None
+    assert query_cache._lookup("a") is not None
+    assert query_cache._lookup("c") is not None
@@ -0,0 +1,79 @@
+"""Tests for statement timing and slow-query capture."""
+import pytest
+from unittest.mock import MagicMock, patch
+
+from prometheus_client import REGISTRY
+from sqlalchemy import create_engine, text
+
+from app.services import query_metrics
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://")
+    query_metrics.instrument(engine)
+    query_metrics._slow_queries.clear()
+    yield engine
+    query_metrics._slow_queries.clear()
+    engine.dispose()
+
+
+def _count(name: str) -> float:
+    return REGISTRY.get_sample_value("dcm_db_statement_seconds_count", {"statement": name}) or 0
+
+
+def test_statements_are_timed_by_name(engine):
+    before_named, before_other = _count("probe"), _count("other")
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1").execution_options(statement_name="probe"))
+        conn.execute(text("SELECT 2"))
+
+    assert _count("probe") == before_named + 1
+    assert _count("other") == before_other + 1
+    assert query_metrics.recent_slow_queries() == []
+
+
+def test_slow_queries_are_kept_with_a_sampled_plan_when_marked(engine):
+    with patch.object(query_metrics.settings, "slow_query_ms", 0), \
+         patch.object(query_metrics.settings, "slow_query_explain_sample_rate", 1.0), \
+         patch.object(query_metrics, "_explain", return_value="Result  (cost=0.00..0.01 rows=1 width=32)") as explain:
+        with engine.connect() as conn:
+            conn.execute(
+                text("SELECT :patient").execution_options(statement_name="probe", explain=True),
+                {"patient": "DOE^JANE"},
+            )
+            # Unmarked, like SELECT pg_notify(...) or an advisory lock: never explained
+            conn.execute(text("SELECT abs(-1)").execution_options(statement_name="side_effect"))
+            conn.execute(text("CREATE TABLE t (x INT)"))
+
+    explain.assert_called_once()
+    ddl, unmarked, marked = query_metrics.recent_slow_queries()
+    assert marked["statement"] == "probe"
+    assert marked["plan"].startswith("Result")
+    assert "DOE^JANE" not in str(marked)
+    assert unmarked["plan"] is None
+    assert ddl["plan"] is None
+
+
+def test_explain_plans_without_running_the_statement():
+    conn = MagicMock()
+    cursor = conn.connection.cursor.return_value
+    cursor.fetchall.return_value = [("Seq Scan on studies",), ("  Filter: (id = $1)",)]
+
+    plan = query_metrics._explain(conn, "SELECT * FROM studies WHERE id = $1", ("x",))
+
+    cursor.execute.assert_called_once_with("EXPLAIN SELECT * FROM studies WHERE id = $1", ("x",))
+    cursor.close.assert_called_once()
+    assert plan == "Seq Scan on studies\n  Filter: (id = $1)"
+
+
+@pytest.mark.asyncio
+async def test_ops_slow_queries_lists_newest_first(client):
+    query_metrics._slow_queries.extend([{"statement": "a"}, {"statement": "b"}])
+    try:
+        resp = await client.get("/ops/slow-queries?limit=1")
+    finally:
+        query_metrics._slow_queries.clear()
+
+    assert resp.status_code == 200
+    assert resp.json() == [{"statement": "b"}]
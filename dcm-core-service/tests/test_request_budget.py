@@ -0,0 +1,102 @@
+"""Tests for per-route statement timeouts and cancellation on client disconnect."""
+import asyncio
+import pytest
+from unittest.mock import MagicMock, patch
+
+from fastapi import Depends, FastAPI
+from httpx import AsyncClient, ASGITransport
+from prometheus_client import REGISTRY
+from sqlalchemy.exc import DBAPIError
+
+from app.services import request_budget
+from app.services.request_budget import DisconnectGuard, budget, statement_timeout_handler
+
+
+def test_transactions_get_the_route_budget():
+    connection = MagicMock()
+    token = request_budget._statement_timeout_ms.set(250)
+    try:
+        request_budget._apply_statement_timeout(None, None, connection)
+    finally:
+        request_budget._statement_timeout_ms.reset(token)
+
+    stmt, params = connection.execute.call_args.args
+    assert "set_config('statement_timeout', :ms, true)" in str(stmt)
+    assert params == {"ms": "250"}
+
+
+def test_transactions_outside_a_budget_are_untouched():
+    connection = MagicMock()
+    request_budget._apply_statement_timeout(None, None, connection)
+    connection.execute.assert_not_called()
+
+
+def _dbapi_error(sqlstate: str) -> DBAPIError:
+    orig = Exception("canceling statement due to statement timeout")
+    orig.sqlstate = sqlstate
+    return DBAPIError("SELECT 1", {}, orig)
+
+
+@pytest.mark.asyncio
+async def test_statement_timeout_is_a_503_other_errors_stay_500():
+    app = FastAPI()
+    app.add_exception_handler(DBAPIError, statement_timeout_handler)
+
+    @app.get("/slow")
+    async def slow():
+        raise _dbapi_error("57014")
+
+    @app.get("/broken")
+    async def broken():
+        raise _dbapi_error("42P01")
+
+    transport = ASGITransport(app=app, raise_app_exceptions=False)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        assert (await client.get("/slow")).status_code == 503
+        assert (await client.get("/broken")).status_code == 500
+
+
+@pytest.mark.asyncio
+async def test_client_disconnect_cancels_the_request():
+    app = FastAPI()
+    app.add_middleware(DisconnectGuard)
+    started, cancelled = asyncio.Event(), asyncio.Event()
+
+    @app.get("/statistics", dependencies=[Depends(budget("statement_timeout_statistics_ms"))])
+    async def statistics():
+        started.set()
+        try:
+            await asyncio.sleep(10)  # stands in for a long query
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    messages = [{"type": "http.request", "body": b"", "more_body": False}]
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        await started.wait()
+        return {"type": "http.disconnect"}
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": "/statistics", "raw_path": b"/statistics", "root_path": "",
+        "query_string": b"", "headers": [], "client": ("test", 1), "server": ("test", 80),
+    }
+    metric = lambda: REGISTRY.get_sample_value(
+        "dcm_disconnect_cancellations_total", {"route": "/statistics"}
+    ) or 0
+    before = metric()
+
+    await asyncio.wait_for(asyncio.create_task(app(scope, receive, send)), timeout=2)
+
+    assert cancelled.is_set()
+    assert sent == []
+    assert metric() == before + 1
+
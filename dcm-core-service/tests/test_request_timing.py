@@ -0,0 +1,66 @@
+"""Tests for the Server-Timing breakdown."""
+import httpx
+import pytest
+from fastapi import FastAPI
+from httpx import AsyncClient, ASGITransport
+from prometheus_client import REGISTRY
+
+from app.services import request_timing
+from app.services.request_timing import ServerTimingMiddleware, TimedORJSONResponse
+
+
+def _timing_app() -> FastAPI:
+    app = FastAPI(default_response_class=TimedORJSONResponse)
+    app.add_middleware(ServerTimingMiddleware)
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: int):
+        request_timing.add("sql", 0.012)
+        request_timing.add("sql", 0.003)
+
+        async def orthanc(request):
+            return httpx.Response(200, json={})
+
+        async with httpx.AsyncClient(
+            transport=httpx.MockTransport(orthanc), event_hooks=request_timing.orthanc_event_hooks()
+        ) as client:
+            await client.get("http://orthanc/system")
+        return {"id": item_id, "rows": [{"n": n, "label": str(n)} for n in range(50_000)]}
+
+    return app
+
+
+def _server_timing(header: str) -> dict[str, float]:
+    entries = (part.strip().split(";dur=") for part in header.split(","))
+    return {name: float(ms) for name, ms in entries}
+
+
+@pytest.mark.asyncio
+async def test_components_are_summed_into_server_timing():
+    count = lambda c: REGISTRY.get_sample_value(
+        "dcm_request_component_seconds_count", {"route": "/items/{item_id}", "component": c}
+    ) or 0
+    before = count("sql")
+
+    async with AsyncClient(transport=ASGITransport(app=_timing_app()), base_url="http://test") as client:
+        resp = await client.get("/items/7")
+
+    timings = _server_timing(resp.headers["server-timing"])
+    assert list(timings) == ["sql", "pool", "orthanc", "encode", "total"]
+    assert timings["sql"] == 15.0
+    assert timings["pool"] == 0.0
+    assert timings["orthanc"] > 0
+    assert timings["encode"] > 0
+    assert timings["total"] >= timings["sql"]
+    assert count("sql") == before + 1
+
+
+def test_add_outside_a_request_is_ignored():
+    request_timing.add("sql", 1.0)
+    assert request_timing._current.get() is None
+
+
+@pytest.mark.asyncio
+async def test_service_responses_carry_server_timing(client):
+    resp = await client.get("/health")
+    assert "total;dur=" in resp.headers["server-timing"]
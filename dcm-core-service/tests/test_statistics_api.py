@@ -0,0 +1,245 @@
+"""Unit tests for the statistics endpoint."""
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+
+def _make_mock_session():
+    session = AsyncMock()
+    rollup = [
+        ("totals", "studies", 5), ("totals", "series", 12), ("totals", "instances", 340),
+        ("modality", "CT", 3), ("modality", "MR", 4),
+        ("month", "2023-07", 2), ("month", "2023-06", 3),
+        ("sex", "F", 2), ("sex", "", 3),
+        ("instance_bucket", "11–50", 7), ("instance_bucket", "1–10", 5),
+    ]
+    result = MagicMock()
+    result.__iter__.return_value = iter(
+        [MagicMock(dimension=d, key=k, count=n) for d, k, n in rollup]
+    )
+    session.execute = AsyncMock(return_value=result)
+    return session
+
+
+@pytest.mark.asyncio
+async def test_statistics_sets_etag():
+    from httpx import AsyncClient, ASGITransport
+    from app.main import app
+    from app.database import get_db
+
+    session = _make_mock_session()
+
+    async def override_db():
+        yield session
+
+    app.dependency_overrides[get_db] = override_db
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        with patch("app.services.orthanc_poller.start_poller", new_callable=AsyncMock):
+            resp = await ac.get("/statistics")
+
+    app.dependency_overrides.clear()
+
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["totals"] == {"studies": 5, "series": 12, "instances": 340}
+    assert body["studies_by_modality"] == [{"modality": "MR", "count": 4}, {"modality": "CT", "count": 3}]
+    assert [m["year_month"] for m in body["studies_by_month"]] == ["2023-06", "2023-07"]
+    assert {"sex": "Unknown", "count": 3} in body["sex_distribution"]
+    assert body["studies_by_institution"] == []
+    assert body["unique_patients"]["total"] == 0
+    # One read of the rollup table, one of the unique-patient sketches
+    assert session.execute.await_count == 2
+    assert resp.headers["etag"].startswith('"')
+    assert resp.headers["cache-control"] == "no-cache"
+
+
+@pytest.mark.asyncio
+async def test_statistics_served_from_cache_and_revalidated():
+    from httpx import AsyncClient, ASGITransport
+    from app.main import app
+    from app.database import get_db
+
+    session = _make_mock_session()
+
+    async def override_db():
+        yield session
+
+    app.dependency_overrides[get_db] = override_db
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        with patch("app.services.orthanc_poller.start_poller", new_callable=AsyncMock):
+            first = await ac.get("/statistics")
+            queries = session.scalar.await_count + session.execute.await_count
+            again = await ac.get("/statistics")
+            revalidated = await ac.get(
+                "/statistics", headers={"If-None-Match": f'W/{first.headers["etag"]}'}
+            )
+
+    app.dependency_overrides.clear()
+
+    assert first.status_code == 200
+    assert again.json() == first.json()
+    assert again.headers["etag"] == first.headers["etag"]
+    assert revalidated.status_code == 304
+    assert revalidated.content == b""
+    # Both repeat requests were answered without touching the database
+    assert session.scalar.await_count + session.execute.await_count == queries
+
+
+@pytest.mark.asyncio
+async def test_statistics_sections_limits_response_and_query():
+    from httpx import AsyncClient, ASGITransport
+    from app.main import app
+    from app.database import get_db
+
+    session = _make_mock_session()
+
+    async def override_db():
+        yield session
+
+    app.dependency_overrides[get_db] = override_db
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        with patch("app.services.orthanc_poller.start_poller", new_callable=AsyncMock):
+            resp = await ac.get("/statistics", params={"sections": "studies_by_modality, totals"})
+
+    app.dependency_overrides.clear()
+
+    assert resp.status_code == 200
+    assert list(resp.json()) == ["totals", "studies_by_modality"]
+    statement = session.execute.await_args.args[0]
+    assert statement.compile().params["dimensions"] == ["totals", "modality"]
+
+
+@pytest.mark.asyncio
+async def test_statistics_unknown_section():
+    from httpx import AsyncClient, ASGITransport
+    from app.main import app
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        with patch("app.services.orthanc_poller.start_poller", new_callable=AsyncMock):
+            resp = await ac.get("/statistics", params={"sections": "totals,pie"})
+
+    assert resp.status_code == 422
+    assert "pie" in resp.json()["detail"]
+
+
+def _rows_session(rows):
+    session = AsyncMock()
+    result = MagicMock()
+    result.__iter__.return_value = iter(rows)
+    session.execute = AsyncMock(return_value=result)
+    return session
+
+
+async def _get(session, url, **params):
+    from httpx import AsyncClient, ASGITransport
+    from app.main import app
+    from app.database import get_db
+
+    async def override_db():
+        yield session
+
+    app.dependency_overrides[get_db] = override_db
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        with patch("app.services.orthanc_poller.start_poller", new_callable=AsyncMock):
+            resp = await ac.get(url, params=params)
+    app.dependency_overrides.clear()
+    return resp
+
+
+@pytest.mark.asyncio
+async def test_studies_by_month_returns_latest_24():
+    months = [f"{2020 + i // 12}-{i % 12 + 1:02d}" for i in range(30)]
+    session = _rows_session([MagicMock(dimension="month", key=m, count=1) for m in months])
+
+    resp = await _get(session, "/statistics", sections="studies_by_month")
+
+    assert [m["year_month"] for m in resp.json()["studies_by_month"]] == months[-24:]
+
+
+@pytest.mark.asyncio
+async def test_timeseries_week_buckets_from_day_rollup():
+    days = [("2024-03-04", 2), ("2024-03-10", 1), ("2024-03-11", 5)]  # Mon, Sun, next Mon
+    session = _rows_session([MagicMock(key=k, count=n) for k, n in days])
+
+    resp = await _get(session, "/statistics/timeseries", bucket="week", **{"from": "2024-03-01"})
+
+    assert resp.status_code == 200
+    assert resp.json()["points"] == [
+        {"period_start": "2024-03-04", "count": 3},
+        {"period_start": "2024-03-11", "count": 5},
+    ]
+    sql = str(session.execute.await_args.args[0].compile())
+    assert "statistics_rollup" in sql and "studies" not in sql
+
+
+@pytest.mark.asyncio
+async def test_timeseries_filtered_uses_date_trunc():
+    from datetime import date
+    from sqlalchemy.dialects import postgresql
+
+    session = _rows_session([MagicMock(period_start=date(2024, 1, 1), count=7)])
+
+    resp = await _get(session, "/statistics/timeseries", bucket="year", modality="ct", institution="General Hospital")
+
+    assert resp.json()["points"] == [{"period_start": "2024-01-01", "count": 7}]
+    sql = str(session.execute.await_args.args[0].compile(dialect=postgresql.dialect()))
+    assert "date_trunc('year', studies.study_date)" in sql
+    assert "GROUP BY 1" in sql
+
+
+@pytest.mark.asyncio
+async def test_timeseries_rejects_unknown_bucket():
+    resp = await _get(AsyncMock(), "/statistics/timeseries", bucket="hour")
+    assert resp.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_unique_patients_section_merges_nothing_and_reports_error():
+    from app.services.hll import HyperLogLog
+
+    sketch = HyperLogLog(12)
+    for i in range(50):
+        sketch.add(f"P{i}")
+    session = _rows_session([
+        MagicMock(dimension="totals", key="patients", registers=sketch.to_bytes()),
+        MagicMock(dimension="institution", key="General Hospital", registers=sketch.to_bytes()),
+    ])
+
+    resp = await _get(session, "/statistics", sections="unique_patients")
+
+    body = resp.json()
+    assert list(body) == ["unique_patients"]
+    assert body["unique_patients"]["total"] == 50
+    assert body["unique_patients"]["standard_error"] == 0.0163
+    assert body["unique_patients"]["by_institution"] == [{"institution": "General Hospital", "patients": 50}]
+    session.execute.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_unique_patients_range_merges_month_sketches():
+    from app.services.hll import HyperLogLog
+
+    march, april = HyperLogLog(12), HyperLogLog(12)
+    for i in range(40):
+        march.add(f"P{i}")
+    for i in range(20, 70):  # 20 patients seen in both months
+        april.add(f"P{i}")
+    session = AsyncMock()
+    result = MagicMock()
+    result.scalars.return_value = [march.to_bytes(), april.to_bytes()]
+    session.execute = AsyncMock(return_value=result)
+
+    resp = await _get(session, "/statistics/unique-patients", **{"from": "2024-03", "to": "2024-04"})
+
+    assert resp.status_code == 200
+    assert resp.json()["patients"] == pytest.approx(70, rel=0.05)
+    sql = str(session.execute.await_args.args[0].compile())
+    assert "statistics_sketch.key >=" in sql and "statistics_sketch.key <=" in sql
+
+
+@pytest.mark.asyncio
+async def test_unique_patients_rejects_day_dates():
+    resp = await _get(AsyncMock(), "/statistics/unique-patients", **{"from": "2024-03-01"})
+    assert resp.status_code == 422
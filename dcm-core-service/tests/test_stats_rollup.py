@@ -0,0 +1,88 @@
+"""Unit tests for the statistics rollup and sketch maintenance."""
+import pytest
+from collections import Counter
+from datetime import date
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+from sqlalchemy.dialects import postgresql
+
+from app.services import stats_rollup
+
+
+def make_study(**overrides):
+    values = dict(
+        patient_id="P001", deleted_at=None, modalities_in_study=["CT", "SR"],
+        institution_name="General Hospital", study_date=date(2024, 3, 5), patient_sex=None,
+    )
+    return SimpleNamespace(**{**values, **overrides})
+
+
+def test_contribution_counts_each_dimension():
+    series = [SimpleNamespace(body_part_examined="CHEST", num_instances=120), SimpleNamespace(body_part_examined="", num_instances=3)]
+
+    counts = stats_rollup._contribution(make_study(), series, 123)
+
+    assert counts == Counter({
+        ("totals", "studies"): 1, ("totals", "series"): 2, ("totals", "instances"): 123,
+        ("modality", "CT"): 1, ("modality", "SR"): 1, ("institution", "General Hospital"): 1,
+        ("month", "2024-03"): 1, ("day", "2024-03-05"): 1, ("sex", ""): 1,
+        ("body_part", "CHEST"): 1, ("instance_bucket", "101–500"): 1, ("instance_bucket", "1–10"): 1,
+    })
+
+
+@pytest.mark.asyncio
+async def test_apply_change_upserts_only_the_difference():
+    db = AsyncMock()
+    before = Counter({("modality", "CT"): 1, ("totals", "studies"): 1})
+    after = Counter({("modality", "MR"): 1, ("totals", "studies"): 1})
+
+    await stats_rollup.apply_change(before, after, db)
+
+    params = db.execute.await_args.args[0].compile(dialect=postgresql.dialect()).params
+    assert sorted(v for k, v in params.items() if k.startswith("count")) == [-1, 1]
+
+
+@pytest.mark.asyncio
+async def test_apply_change_noop_when_unchanged():
+    db = AsyncMock()
+    await stats_rollup.apply_change(Counter({("sex", "M"): 1}), Counter({("sex", "M"): 1}), db)
+    db.execute.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_add_to_sketches_raises_one_register_in_sql():
+    db = AsyncMock()
+
+    await stats_rollup.add_to_sketches(make_study(), db)
+
+    sql = str(db.execute.await_args.args[0].compile(dialect=postgresql.dialect()))
+    assert "ON CONFLICT (dimension, key) DO UPDATE SET registers = CASE WHEN" in sql
+    assert "set_byte(statistics_sketch.registers" in sql
+    assert "greatest(get_byte(statistics_sketch.registers" in sql
+    assert stats_rollup.sketch_keys(make_study()) == [
+        ("institution", "General Hospital"), ("modality", "CT"), ("modality", "SR"),
+        ("month", "2024-03"), ("totals", "patients"),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_add_to_sketches_skips_anonymous_patients():
+    db = AsyncMock()
+    await stats_rollup.add_to_sketches(make_study(patient_id=None), db)
+    db.execute.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_add_to_sketches_reseeds_sketch_of_other_precision():
+    """A stale-precision sketch must not make set_byte index out of range and fail ingest."""
+    db = AsyncMock()
+
+    with patch.object(stats_rollup.settings, "hll_precision", 14):
+        await stats_rollup.add_to_sketches(make_study(), db)
+
+    compiled = db.execute.await_args.args[0].compile(dialect=postgresql.dialect())
+    sql = str(compiled)
+    assert "CASE WHEN (length(statistics_sketch.registers) = %(length_1)s) THEN set_byte(" in sql
+    assert "ELSE excluded.registers END" in sql
+    assert compiled.params["length_1"] == 2 ** 14
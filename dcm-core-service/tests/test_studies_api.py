@@ -13,28 +13,35 @@ def make_study_row(
     patient_name="DOE^JOHN",
     deleted_at=None,
 ):
-    row = MagicMock()
-    row.id = uuid4()
-    row.study_uid = study_uid
-    row.orthanc_id = orthanc_id
-    row.patient_id = "P001"
-    row.patient_name = patient_name
-    row.patient_birth_date = date(1980, 1, 1)
-    row.patient_sex = "M"
-    row.study_date = date(2023, 6, 15)
-    row.study_time = None
-    row.study_description = "Chest CT"
-    row.accession_number = "ACC001"
-    row.referring_physician = None
-    row.institution_name = "General Hospital"
-    row.num_series = 2
-    row.num_instances = 40
-    row.raw_main_dicom_tags = {"0008,0060": "CT"}
-    row.ingested_at = datetime.now(timezone.utc)
-    row.updated_at = datetime.now(timezone.utc)
-    row.deleted_at = deleted_at
-    row.series = []
-    return row
+    """A studies row as returned by result.mappings() for the StudyOut projection."""
+    return {
+        "id": uuid4(),
+        "study_uid": study_uid,
+        "orthanc_id": orthanc_id,
+        "patient_id": "P001",
+        "patient_name": patient_name,
+        "patient_birth_date": date(1980, 1, 1),
+        "patient_sex": "M",
+        "study_date": date(2023, 6, 15),
+        "study_time": None,
+        "study_description": "Chest CT",
+        "accession_number": "ACC001",
+        "referring_physician": None,
+        "institution_name": "General Hospital",
+        "num_series": 2,
+        "num_instances": 40,
+        "modalities_in_study": ["CT"],
+        "raw_main_dicom_tags": {"0008,0060": "CT"},
+        "ingested_at": datetime.now(timezone.utc),
+        "updated_at": datetime.now(timezone.utc),
+        "deleted_at": deleted_at,
+    }
+
+
+def mappings_result(rows):
+    result = MagicMock()
+    result.mappings.return_value.all.return_value = rows
+    return result
 
 
 # ── Tests ─────────────────────────────────────────────────────────────────────
@@ -57,9 +64,8 @@ async def test_list_studies_empty():
     from app.database import get_db
 
     mock_session = AsyncMock()
-    # scalars().unique().all() returns []
-    execute_result = MagicMock()
-    execute_result.scalars.return_value.unique.return_value.all.return_value = []
+    # mappings().all() returns []
+    execute_result = mappings_result([])
     execute_result.scalar_one.return_value = 0
     mock_session.execute = AsyncMock(return_value=execute_result)
 
@@ -89,7 +95,7 @@ async def test_get_study_not_found():
 
     mock_session = AsyncMock()
     execute_result = MagicMock()
-    execute_result.scalar_one_or_none.return_value = None
+    execute_result.mappings.return_value.one_or_none.return_value = None
     mock_session.execute = AsyncMock(return_value=execute_result)
 
     async def override_db():
@@ -116,14 +122,11 @@ async def test_list_studies_returns_items():
     study = make_study_row()
     mock_session = AsyncMock()
 
-    # First execute = total count, second execute = paginated items
+    # First execute = total count, second = paginated items, third = their series
     count_result = MagicMock()
     count_result.scalar_one.return_value = 1
 
-    items_result = MagicMock()
-    items_result.scalars.return_value.unique.return_value.all.return_value = [study]
-
-    mock_session.execute = AsyncMock(side_effect=[count_result, items_result])
+    mock_session.execute = AsyncMock(side_effect=[count_result, mappings_result([study]), mappings_result([])])
 
     async def override_db():
         yield mock_session
@@ -139,5 +142,133 @@ async def test_list_studies_returns_items():
     assert resp.status_code == 200
     data = resp.json()
     assert data["total"] == 1
+    assert data["total_is_estimate"] is False
     assert len(data["items"]) == 1
     assert data["items"][0]["study_uid"] == "1.2.840.test"
+
+
+@pytest.mark.asyncio
+async def test_batch_get_studies_single_query_reports_missing():
+    """POST /studies/batch should resolve all identifiers with one array-bound query."""
+    from httpx import AsyncClient, ASGITransport
+    from sqlalchemy.dialects import postgresql
+    from app.main import app
+    from app.database import get_db
+
+    study = make_study_row(study_uid="1.2.840.found", orthanc_id="oid-found")
+    mock_session = AsyncMock()
+    mock_session.execute = AsyncMock(side_effect=[mappings_result([study]), mappings_result([])])
+
+    async def override_db():
+        yield mock_session
+
+    app.dependency_overrides[get_db] = override_db
+
+    payload = {
+        "study_uids": ["1.2.840.found", "1.2.840.gone"],
+        "orthanc_ids": ["oid-found"],
+        "view": "full",
+    }
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        with patch("app.services.orthanc_poller.start_poller", new_callable=AsyncMock):
+            resp = await ac.post("/studies/batch", json=payload)
+
+    app.dependency_overrides.clear()
+
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["view"] == "full"
+    assert [s["study_uid"] for s in data["items"]] == ["1.2.840.found"]
+    assert data["missing"] == ["1.2.840.gone"]
+    assert mock_session.execute.await_count == 2  # studies + their series
+    sql = str(mock_session.execute.await_args_list[0].args[0].compile(dialect=postgresql.dialect()))
+    assert "studies.study_uid = ANY (" in sql
+
+
+@pytest.mark.asyncio
+async def test_batch_get_studies_over_limit_returns_422():
+    from httpx import AsyncClient, ASGITransport
+    from app.main import app
+    from app.config import settings
+
+    payload = {"study_uids": [f"1.2.{i}" for i in range(settings.study_batch_max_size + 1)]}
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        with patch("app.services.orthanc_poller.start_poller", new_callable=AsyncMock):
+            resp = await ac.post("/studies/batch", json=payload)
+
+    assert resp.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_fast_path_responses_match_response_schemas():
+    """Core-row responses must have exactly the fields of the declared schemas."""
+    from httpx import AsyncClient, ASGITransport
+    from app.main import app
+    from app.database import get_db
+    from app.schemas import StudyListOut, StudyOut, SeriesOut
+
+    study = make_study_row()
+    series = {
+        "study_id": study["id"], "id": uuid4(), "series_uid": "1.2.840.s1", "orthanc_id": "s-oid",
+        "modality": "CT", "series_number": 1, "series_description": None, "body_part_examined": None,
+        "protocol_name": None, "num_instances": 3, "raw_main_dicom_tags": {}, "deleted_at": None,
+    }
+    count_result = MagicMock()
+    count_result.scalar_one.return_value = 1
+    study_result = MagicMock()
+    study_result.mappings.return_value.one_or_none.return_value = study
+
+    mock_session = AsyncMock()
+    mock_session.execute = AsyncMock(side_effect=[
+        count_result, mappings_result([study]), mappings_result([series]),
+        study_result, mappings_result([series]),
+    ])
+
+    async def override_db():
+        yield mock_session
+
+    app.dependency_overrides[get_db] = override_db
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        with patch("app.services.orthanc_poller.start_poller", new_callable=AsyncMock):
+            list_resp = await ac.get("/studies")
+            detail_resp = await ac.get(f"/studies/{study['study_uid']}")
+
+    app.dependency_overrides.clear()
+
+    listing = list_resp.json()
+    StudyListOut.model_validate(listing)
+    assert set(listing) == set(StudyListOut.model_fields)
+    for body in (listing["items"][0], detail_resp.json()):
+        StudyOut.model_validate(body)
+        assert set(body) == set(StudyOut.model_fields)
+        assert set(body["series"][0]) == set(SeriesOut.model_fields)
+
+
+@pytest.mark.asyncio
+async def test_get_study_not_modified():
+    from httpx import AsyncClient, ASGITransport
+    from app.main import app
+    from app.database import get_db
+    from app.api.conditional import make_etag
+
+    updated_at = datetime(2024, 3, 1, tzinfo=timezone.utc)
+    mock_session = AsyncMock()
+    mock_session.scalar = AsyncMock(return_value=updated_at)
+    mock_session.execute = AsyncMock()
+
+    async def override_db():
+        yield mock_session
+
+    app.dependency_overrides[get_db] = override_db
+
+    etag = make_etag("1.2.840.test", updated_at)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        with patch("app.services.orthanc_poller.start_poller", new_callable=AsyncMock):
+            resp = await ac.get("/studies/1.2.840.test", headers={"If-None-Match": etag})
+
+    app.dependency_overrides.clear()
+
+    assert resp.status_code == 304
+    assert resp.headers["etag"] == etag
+    mock_session.execute.assert_not_awaited()
@@ -6,40 +6,44 @@ from uuid import uuid4
 
 
 def make_study_row(study_uid="1.2.840.test", deleted_at=None):
-    row = MagicMock()
-    row.id = uuid4()
-    row.study_uid = study_uid
-    row.orthanc_id = "oid-" + study_uid[-4:]
-    row.patient_id = "P001"
-    row.patient_name = "DOE^JOHN"
-    row.patient_birth_date = date(1980, 1, 1)
-    row.patient_sex = "M"
-    row.study_date = date(2023, 6, 15)
-    row.study_time = None
-    row.study_description = "Chest CT"
-    row.accession_number = "ACC001"
-    row.referring_physician = None
-    row.institution_name = "General Hospital"
-    row.num_series = 2
-    row.num_instances = 40
-    row.raw_main_dicom_tags = {}
-    row.ingested_at = datetime.now(timezone.utc)
-    row.updated_at = datetime.now(timezone.utc)
-    row.deleted_at = deleted_at
-    row.series = []
-    return row
+    """A studies row as returned by result.mappings() for the StudyOut projection."""
+    return {
+        "id": uuid4(),
+        "study_uid": study_uid,
+        "orthanc_id": "oid-" + study_uid[-4:],
+        "patient_id": "P001",
+        "patient_name": "DOE^JOHN",
+        "patient_birth_date": date(1980, 1, 1),
+        "patient_sex": "M",
+        "study_date": date(2023, 6, 15),
+        "study_time": None,
+        "study_description": "Chest CT",
+        "accession_number": "ACC001",
+        "referring_physician": None,
+        "institution_name": "General Hospital",
+        "num_series": 2,
+        "num_instances": 40,
+        "modalities_in_study": ["CT"],
+        "raw_main_dicom_tags": {},
+        "ingested_at": datetime.now(timezone.utc),
+        "updated_at": datetime.now(timezone.utc),
+        "deleted_at": deleted_at,
+    }
+
+
+def mappings_result(rows):
+    result = MagicMock()
+    result.mappings.return_value.all.return_value = rows
+    return result
 
 
 def _make_mock_session(total: int, items: list):
-    """Return a mock db session that answers two execute() calls: count then items."""
+    """Return a mock db session that answers execute() calls: count, items, then their series."""
     mock_session = AsyncMock()
     count_result = MagicMock()
     count_result.scalar_one.return_value = total
 
-    items_result = MagicMock()
-    items_result.scalars.return_value.unique.return_value.all.return_value = items
-
-    mock_session.execute = AsyncMock(side_effect=[count_result, items_result])
+    mock_session.execute = AsyncMock(side_effect=[count_result, mappings_result(items), mappings_result([])])
     return mock_session
 
 
@@ -135,26 +139,25 @@ async def test_get_study_returns_series_and_instances():
     from unittest.mock import patch
 
     study = make_study_row()
-    # Add a mock series
-    series = MagicMock()
-    series.id = uuid4()
-    series.series_uid = "1.2.840.series"
-    series.orthanc_id = "series-oid"
-    series.modality = "CT"
-    series.series_number = 1
-    series.series_description = "Chest"
-    series.body_part_examined = "CHEST"
-    series.protocol_name = "standard"
-    series.num_instances = 20
-    series.raw_main_dicom_tags = {}
-    series.deleted_at = None
-    series.instances = []
-    study.series = [series]
+    series = {
+        "study_id": study["id"],
+        "id": uuid4(),
+        "series_uid": "1.2.840.series",
+        "orthanc_id": "series-oid",
+        "modality": "CT",
+        "series_number": 1,
+        "series_description": "Chest",
+        "body_part_examined": "CHEST",
+        "protocol_name": "standard",
+        "num_instances": 20,
+        "raw_main_dicom_tags": {},
+        "deleted_at": None,
+    }
 
     mock_session = AsyncMock()
-    result = MagicMock()
-    result.scalar_one_or_none.return_value = study
-    mock_session.execute = AsyncMock(return_value=result)
+    study_result = MagicMock()
+    study_result.mappings.return_value.one_or_none.return_value = study
+    mock_session.execute = AsyncMock(side_effect=[study_result, mappings_result([series])])
 
     async def override_db():
         yield mock_session
@@ -163,7 +166,7 @@ async def test_get_study_returns_series_and_instances():
 
     async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
         with patch("app.services.orthanc_poller.start_poller", new_callable=AsyncMock):
-            resp = await ac.get(f"/studies/{study.study_uid}")
+            resp = await ac.get(f"/studies/{study['study_uid']}")
 
     app.dependency_overrides.clear()
 
@@ -172,3 +175,394 @@ async def test_get_study_returns_series_and_instances():
     assert data["study_uid"] == "1.2.840.test"
     assert len(data["series"]) == 1
     assert data["series"][0]["modality"] == "CT"
+    assert "study_id" not in data["series"][0]
+
+
+@pytest.mark.asyncio
+async def test_list_studies_count_none_skips_count_query():
+    """count=none should run only the page query and report has_more."""
+    from httpx import AsyncClient, ASGITransport
+    from app.main import app
+    from app.database import get_db
+    from unittest.mock import patch
+
+    items = [make_study_row(f"1.2.840.{i:04d}") for i in range(3)]
+    mock_session = AsyncMock()
+    mock_session.execute = AsyncMock(side_effect=[mappings_result(items), mappings_result([])])
+
+    async def override_db():
+        yield mock_session
+
+    app.dependency_overrides[get_db] = override_db
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        with patch("app.services.orthanc_poller.start_poller", new_callable=AsyncMock):
+            resp = await ac.get("/studies?count=none&page_size=2")
+
+    app.dependency_overrides.clear()
+
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["total"] is None
+    assert data["has_more"] is True
+    assert len(data["items"]) == 2
+    # page query + series for the page — no count(*)
+    assert mock_session.execute.await_count == 2
+    assert "count(" not in str(mock_session.execute.await_args_list[0].args[0])
+
+
+@pytest.mark.asyncio
+async def test_list_studies_count_estimate_reuses_cached_total():
+    """count=estimate should count once per filter combination within the TTL."""
+    from httpx import AsyncClient, ASGITransport
+    from app.main import app
+    from app.database import get_db
+    from app.services import count_cache
+    from unittest.mock import patch
+
+    count_cache.clear()
+    count_result = MagicMock()
+    count_result.scalar_one.return_value = 57
+    mock_session = AsyncMock()
+    mock_session.execute = AsyncMock(side_effect=[count_result, mappings_result([]), mappings_result([])])
+
+    async def override_db():
+        yield mock_session
+
+    app.dependency_overrides[get_db] = override_db
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        with patch("app.services.orthanc_poller.start_poller", new_callable=AsyncMock):
+            first = await ac.get("/studies?count=estimate&patient_sex=F")
+            second = await ac.get("/studies?count=estimate&patient_sex=F&page=2")
+
+    app.dependency_overrides.clear()
+    count_cache.clear()
+
+    assert first.json()["total"] == 57
+    assert first.json()["total_is_estimate"] is False  # counted on this request
+    assert second.json()["total"] == 57
+    assert second.json()["total_is_estimate"] is True
+    assert mock_session.execute.await_count == 3
+
+
+@pytest.mark.asyncio
+async def test_list_studies_invalid_count_mode_returns_422():
+    from httpx import AsyncClient, ASGITransport
+    from app.main import app
+    from unittest.mock import patch
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        with patch("app.services.orthanc_poller.start_poller", new_callable=AsyncMock):
+            resp = await ac.get("/studies?count=approximate")
+
+    assert resp.status_code == 422
+
+
+def make_summary_row(study_uid="1.2.840.test", modalities=("CT",)):
+    return {
+        "id": uuid4(),
+        "study_uid": study_uid,
+        "orthanc_id": "oid-" + study_uid[-4:],
+        "patient_id": "P001",
+        "patient_name": "DOE^JOHN",
+        "patient_sex": "M",
+        "study_date": date(2023, 6, 15),
+        "study_description": "Chest CT",
+        "institution_name": "General Hospital",
+        "num_series": 2,
+        "num_instances": 40,
+        "ingested_at": datetime.now(timezone.utc),
+        "deleted_at": None,
+        "modalities": list(modalities) if modalities is not None else None,
+    }
+
+
+@pytest.mark.asyncio
+async def test_list_studies_summary_view_returns_projection():
+    """view=summary should return table columns and modalities without raw tags or series."""
+    from httpx import AsyncClient, ASGITransport
+    from app.main import app
+    from app.database import get_db
+    from unittest.mock import patch
+
+    count_result = MagicMock()
+    count_result.scalar_one.return_value = 2
+    rows_result = MagicMock()
+    rows_result.mappings.return_value.all.return_value = [
+        make_summary_row("1.2.840.0001", ("CT", "SR")),
+        make_summary_row("1.2.840.0002", None),
+    ]
+
+    mock_session = AsyncMock()
+    mock_session.execute = AsyncMock(side_effect=[count_result, rows_result])
+
+    async def override_db():
+        yield mock_session
+
+    app.dependency_overrides[get_db] = override_db
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        with patch("app.services.orthanc_poller.start_poller", new_callable=AsyncMock):
+            resp = await ac.get("/studies?view=summary")
+
+    app.dependency_overrides.clear()
+
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["view"] == "summary"
+    assert data["total"] == 2
+    first, second = data["items"]
+    assert first["modalities"] == ["CT", "SR"]
+    assert second["modalities"] == []
+    assert "raw_main_dicom_tags" not in first
+    assert "series" not in first
+
+
+@pytest.mark.asyncio
+async def test_list_studies_invalid_view_returns_422():
+    from httpx import AsyncClient, ASGITransport
+    from app.main import app
+    from unittest.mock import patch
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        with patch("app.services.orthanc_poller.start_poller", new_callable=AsyncMock):
+            resp = await ac.get("/studies?view=compact")
+
+    assert resp.status_code == 422
+
+
+class _FakeStreamResult:
+    """Mimics AsyncResult.mappings().partitions() for db.stream()."""
+
+    def __init__(self, batches):
+        self._batches = batches
+
+    def mappings(self):
+        return self
+
+    async def partitions(self):
+        for batch in self._batches:
+            yield batch
+
+
+def _mock_stream_session(batches):
+    db = AsyncMock()
+    db.stream = AsyncMock(return_value=_FakeStreamResult(batches))
+    db.__aenter__ = AsyncMock(return_value=db)
+    db.__aexit__ = AsyncMock(return_value=False)
+    return db
+
+
+@pytest.mark.asyncio
+async def test_export_studies_ndjson_streams_all_batches():
+    import json
+    from httpx import AsyncClient, ASGITransport
+    from app.main import app
+    from unittest.mock import patch
+
+    batches = [
+        [make_summary_row("1.2.840.0001"), make_summary_row("1.2.840.0002")],
+        [make_summary_row("1.2.840.0003", None)],
+    ]
+    db = _mock_stream_session(batches)
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        with patch("app.services.orthanc_poller.start_poller", new_callable=AsyncMock):
+            with patch("app.api.studies.AsyncSessionLocal", return_value=db):
+                resp = await ac.get("/studies/export?modality=CT")
+
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in resp.text.splitlines()]
+    assert [r["study_uid"] for r in lines] == ["1.2.840.0001", "1.2.840.0002", "1.2.840.0003"]
+    assert lines[2]["modalities"] == []
+    # Same ISO 8601 encoding as the JSON endpoints
+    assert "T" in lines[0]["ingested_at"] and " " not in lines[0]["ingested_at"]
+    assert lines[0]["study_date"] == "2023-06-15"
+    db.stream.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_export_studies_csv_has_header_and_rows():
+    import csv
+    import io
+    from httpx import AsyncClient, ASGITransport
+    from app.main import app
+    from unittest.mock import patch
+
+    db = _mock_stream_session([[make_summary_row("1.2.840.0001", ("CT", "SR"))]])
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        with patch("app.services.orthanc_poller.start_poller", new_callable=AsyncMock):
+            with patch("app.api.studies.AsyncSessionLocal", return_value=db):
+                resp = await ac.get("/studies/export?format=csv")
+
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(resp.text)))
+    assert len(rows) == 1
+    assert rows[0]["study_uid"] == "1.2.840.0001"
+    assert rows[0]["modalities"] == "CT\\SR"
+    assert rows[0]["study_date"] == "2023-06-15"
+    assert "T" in rows[0]["ingested_at"]
+
+
+@pytest.mark.asyncio
+async def test_export_studies_invalid_format_returns_422():
+    from httpx import AsyncClient, ASGITransport
+    from app.main import app
+    from unittest.mock import patch
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        with patch("app.services.orthanc_poller.start_poller", new_callable=AsyncMock):
+            resp = await ac.get("/studies/export?format=xlsx")
+
+    assert resp.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_list_series_instances_paginates():
+    from httpx import AsyncClient, ASGITransport
+    from app.main import app
+    from app.database import get_db
+    from unittest.mock import patch
+
+    inst = MagicMock()
+    inst.id = uuid4()
+    inst.sop_instance_uid = "1.2.840.inst.1"
+    inst.orthanc_id = "inst-oid"
+    inst.instance_number = 1
+    inst.sop_class_uid = "1.2.840.10008.5.1.4.1.1.2"
+    inst.transfer_syntax_uid = "1.2.840.10008.1.2.1"
+    inst.raw_main_dicom_tags = {}
+    inst.deleted_at = None
+
+    page_result = MagicMock()
+    page_result.scalars.return_value.all.return_value = [inst]
+
+    mock_session = AsyncMock()
+    mock_session.scalar = AsyncMock(side_effect=[uuid4(), 250])
+    mock_session.execute = AsyncMock(return_value=page_result)
+
+    async def override_db():
+        yield mock_session
+
+    app.dependency_overrides[get_db] = override_db
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        with patch("app.services.orthanc_poller.start_poller", new_callable=AsyncMock):
+            resp = await ac.get("/studies/1.2.840.test/series/1.2.840.series/instances?page=3&page_size=100")
+
+    app.dependency_overrides.clear()
+
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["total"] == 250
+    assert data["page"] == 3
+    assert data["items"][0]["sop_instance_uid"] == "1.2.840.inst.1"
+
+
+@pytest.mark.asyncio
+async def test_list_series_instances_unknown_series_returns_404():
+    from httpx import AsyncClient, ASGITransport
+    from app.main import app
+    from app.database import get_db
+    from unittest.mock import patch
+
+    mock_session = AsyncMock()
+    mock_session.scalar = AsyncMock(return_value=None)
+
+    async def override_db():
+        yield mock_session
+
+    app.dependency_overrides[get_db] = override_db
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        with patch("app.services.orthanc_poller.start_poller", new_callable=AsyncMock):
+            resp = await ac.get("/studies/1.2.840.test/series/1.2.840.missing/instances")
+
+    app.dependency_overrides.clear()
+
+    assert resp.status_code == 404
+    mock_session.execute.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_list_studies_q_search_with_rank_orders_by_similarity():
+    """q= should ILIKE the trigram-indexed text columns; rank=true orders by similarity."""
+    from httpx import AsyncClient, ASGITransport
+    from sqlalchemy.dialects import postgresql
+    from app.main import app
+    from app.database import get_db
+    from unittest.mock import patch
+
+    mock_session = _make_mock_session(total=0, items=[])
+
+    async def override_db():
+        yield mock_session
+
+    app.dependency_overrides[get_db] = override_db
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        with patch("app.services.orthanc_poller.start_poller", new_callable=AsyncMock):
+            resp = await ac.get("/studies?q=%20doe%20&rank=true")
+
+    app.dependency_overrides.clear()
+
+    assert resp.status_code == 200
+    page_stmt = mock_session.execute.await_args_list[1].args[0]
+    compiled = page_stmt.compile(dialect=postgresql.dialect())
+    sql = str(compiled)
+    for col in ("patient_name", "study_description", "accession_number", "institution_name"):
+        assert f"studies.{col} ILIKE" in sql
+    assert "ORDER BY greatest(similarity(" in sql
+    assert "%doe%" in compiled.params.values()
+
+
+@pytest.mark.asyncio
+async def test_list_studies_tag_filters_use_jsonb_containment():
+    """tag= / series_tag= should compile to @> so the raw-tag GIN indexes apply."""
+    from httpx import AsyncClient, ASGITransport
+    from sqlalchemy.dialects import postgresql
+    from app.main import app
+    from app.database import get_db
+    from unittest.mock import patch
+
+    mock_session = _make_mock_session(total=0, items=[])
+
+    async def override_db():
+        yield mock_session
+
+    app.dependency_overrides[get_db] = override_db
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        with patch("app.services.orthanc_poller.start_poller", new_callable=AsyncMock):
+            resp = await ac.get(
+                "/studies",
+                params=[("tag", "StudyDescription:Chest CT"), ("tag", "PatientSex:F"), ("series_tag", "Modality:CT")],
+            )
+
+    app.dependency_overrides.clear()
+
+    assert resp.status_code == 200
+    compiled = mock_session.execute.await_args_list[1].args[0].compile(dialect=postgresql.dialect())
+    assert "studies.raw_main_dicom_tags @>" in str(compiled)
+    assert "series.raw_main_dicom_tags @>" in str(compiled)
+    params = list(compiled.params.values())
+    assert {"StudyDescription": "Chest CT"} in params
+    assert {"PatientSex": "F"} in params
+    assert {"Modality": "CT"} in params
+
+
+@pytest.mark.asyncio
+async def test_list_studies_malformed_tag_returns_422():
+    from httpx import AsyncClient, ASGITransport
+    from app.main import app
+    from unittest.mock import patch
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        with patch("app.services.orthanc_poller.start_poller", new_callable=AsyncMock):
+            resp = await ac.get("/studies?tag=Modality")
+
+    assert resp.status_code == 422
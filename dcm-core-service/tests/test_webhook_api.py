@@ -1,124 +1,182 @@
-"""Unit tests for the Orthanc webhook endpoint."""
+"""Unit tests for the Orthanc webhook endpoints and their background intake."""
+import asyncio
+
 import pytest
-from unittest.mock import AsyncMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
 
-@pytest.mark.asyncio
-async def test_webhook_stable_study_calls_ingest():
-    """StableStudy event should trigger ingest_study."""
-    from httpx import AsyncClient, ASGITransport
-    from app.main import app
-    from app.database import get_db
+def _event(change_type: str, resource_id: str) -> dict:
+    return {
+        "ChangeType": change_type,
+        "ID": resource_id,
+        "Path": f"/studies/{resource_id}",
+        "ResourceType": "Study",
+        "Date": "20230615T120000",
+    }
 
-    db = AsyncMock()
 
-    async def override_db():
-        yield db
+@pytest.fixture(autouse=True)
+def empty_queue():
+    from app.services import webhook_intake
 
-    app.dependency_overrides[get_db] = override_db
+    webhook_intake._pending.clear()
+    yield
+    webhook_intake._pending.clear()
 
-    payload = {
-        "ChangeType": "StableStudy",
-        "ID": "orthanc-abc",
-        "Path": "/studies/orthanc-abc",
-        "ResourceType": "Study",
-        "Date": "20230615T120000",
-    }
+
+@pytest.fixture
+def session():
+    """The session intake workers open, and the ingest/delete handlers they call."""
+    db = AsyncMock()
+    db.__aenter__ = AsyncMock(return_value=db)
+    db.__aexit__ = AsyncMock(return_value=False)
+    with patch("app.services.webhook_intake.AsyncSessionLocal", return_value=db):
+        with patch("app.services.orthanc_poller.ingest_study", new_callable=AsyncMock) as ingest:
+            with patch("app.services.orthanc_poller.soft_delete_study", new_callable=AsyncMock) as delete:
+                yield MagicMock(db=db, ingest=ingest, delete=delete)
+
+
+async def _post(path: str, payload):
+    from httpx import AsyncClient, ASGITransport
+    from app.main import app
 
     async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
         with patch("app.services.orthanc_poller.start_poller", new_callable=AsyncMock):
-            with patch("app.api.webhook.ingest_study", new_callable=AsyncMock) as mock_ingest:
-                resp = await ac.post("/webhook/orthanc", json=payload)
+            return await ac.post(path, json=payload)
 
-    app.dependency_overrides.clear()
 
-    assert resp.status_code == 200
-    data = resp.json()
-    assert data["received"] == "StableStudy"
-    assert data["id"] == "orthanc-abc"
-    mock_ingest.assert_awaited_once_with("orthanc-abc", db)
+@pytest.mark.asyncio
+async def test_webhook_stable_study_is_queued_then_ingested(session):
+    """StableStudy is acknowledged with 202 before ingest_study runs."""
+    from app.services import webhook_intake
 
+    resp = await _post("/webhook/orthanc", _event("StableStudy", "orthanc-abc"))
 
-@pytest.mark.asyncio
-async def test_webhook_deleted_study_calls_soft_delete():
-    """DeletedStudy event should trigger soft_delete_study."""
-    from httpx import AsyncClient, ASGITransport
-    from app.main import app
-    from app.database import get_db
+    assert resp.status_code == 202
+    assert resp.json() == {"received": "StableStudy", "id": "orthanc-abc", "queued": True}
+    session.ingest.assert_not_awaited()
 
-    db = AsyncMock()
+    await webhook_intake.drain()
+    session.ingest.assert_awaited_once_with("orthanc-abc", session.db)
 
-    async def override_db():
-        yield db
 
-    app.dependency_overrides[get_db] = override_db
+@pytest.mark.asyncio
+async def test_webhook_deleted_study_is_queued_then_soft_deleted(session):
+    from app.services import webhook_intake
 
-    payload = {
-        "ChangeType": "DeletedStudy",
-        "ID": "orthanc-del",
-        "Path": "/studies/orthanc-del",
-        "ResourceType": "Study",
-        "Date": "20230616T090000",
-    }
+    resp = await _post("/webhook/orthanc", _event("DeletedStudy", "orthanc-del"))
 
-    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
-        with patch("app.services.orthanc_poller.start_poller", new_callable=AsyncMock):
-            with patch("app.api.webhook.soft_delete_study", new_callable=AsyncMock) as mock_delete:
-                resp = await ac.post("/webhook/orthanc", json=payload)
+    assert resp.status_code == 202
+    await webhook_intake.drain()
+    session.delete.assert_awaited_once_with("orthanc-del", session.db)
+
+
+@pytest.mark.asyncio
+async def test_webhook_unknown_change_type_is_not_queued():
+    """Unknown ChangeType events are acknowledged without queueing anything."""
+    from app.services import webhook_intake
 
-    app.dependency_overrides.clear()
+    payload = _event("NewInstance", "instance-xyz") | {"ResourceType": "Instance"}
+    resp = await _post("/webhook/orthanc", payload)
 
-    assert resp.status_code == 200
-    data = resp.json()
-    assert data["received"] == "DeletedStudy"
-    mock_delete.assert_awaited_once_with("orthanc-del", db)
+    assert resp.status_code == 202
+    assert resp.json()["queued"] is False
+    assert not webhook_intake._pending
 
 
 @pytest.mark.asyncio
-async def test_webhook_unknown_change_type_is_ignored():
-    """Unknown ChangeType events should return 200 without calling handlers."""
-    from httpx import AsyncClient, ASGITransport
-    from app.main import app
-    from app.database import get_db
+async def test_webhook_missing_required_field_returns_422():
+    """Malformed event (missing required fields) should return 422."""
+    resp = await _post("/webhook/orthanc", {"ChangeType": "StableStudy"})  # missing ID, Path, ...
+    assert resp.status_code == 422
 
-    db = AsyncMock()
 
-    async def override_db():
-        yield db
+@pytest.mark.asyncio
+async def test_webhook_repeated_study_is_coalesced(session):
+    """A second event for a study still waiting replaces the first instead of queueing twice."""
+    from app.services import webhook_intake
 
-    app.dependency_overrides[get_db] = override_db
+    await _post("/webhook/orthanc", _event("StableStudy", "orthanc-1"))
+    await _post("/webhook/orthanc", _event("StableStudy", "orthanc-2"))
+    await _post("/webhook/orthanc", _event("DeletedStudy", "orthanc-1"))
 
-    payload = {
-        "ChangeType": "NewInstance",
-        "ID": "instance-xyz",
-        "Path": "/instances/instance-xyz",
-        "ResourceType": "Instance",
-        "Date": "20230615T120000",
-    }
+    assert list(webhook_intake._pending) == ["orthanc-1", "orthanc-2"]
+    await webhook_intake.drain()
+    session.delete.assert_awaited_once_with("orthanc-1", session.db)
+    session.ingest.assert_awaited_once_with("orthanc-2", session.db)
 
-    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
-        with patch("app.services.orthanc_poller.start_poller", new_callable=AsyncMock):
-            with patch("app.api.webhook.ingest_study", new_callable=AsyncMock) as mock_ingest:
-                with patch("app.api.webhook.soft_delete_study", new_callable=AsyncMock) as mock_delete:
-                    resp = await ac.post("/webhook/orthanc", json=payload)
 
-    app.dependency_overrides.clear()
+@pytest.mark.asyncio
+async def test_webhook_full_queue_returns_503_with_retry_after():
+    from app.services import webhook_intake
 
-    assert resp.status_code == 200
-    mock_ingest.assert_not_awaited()
-    mock_delete.assert_not_awaited()
+    with patch.object(webhook_intake.settings, "webhook_queue_size", 1):
+        first = await _post("/webhook/orthanc", _event("StableStudy", "orthanc-1"))
+        second = await _post("/webhook/orthanc", _event("StableStudy", "orthanc-2"))
+        # Already waiting: coalesced, so still accepted
+        again = await _post("/webhook/orthanc", _event("StableStudy", "orthanc-1"))
+
+    assert first.status_code == 202
+    assert second.status_code == 503
+    assert second.headers["Retry-After"] == str(webhook_intake.settings.webhook_retry_after_seconds)
+    assert again.status_code == 202
 
 
 @pytest.mark.asyncio
-async def test_webhook_missing_required_field_returns_422():
-    """Malformed event (missing required fields) should return 422."""
-    from httpx import AsyncClient, ASGITransport
-    from app.main import app
+async def test_webhook_batch_compacts_and_queues(session):
+    from app.services import webhook_intake
 
-    payload = {"ChangeType": "StableStudy"}  # missing ID, Path, ResourceType, Date
+    batch = [
+        _event("StableStudy", "orthanc-1"),
+        _event("NewInstance", "instance-1"),
+        _event("StableStudy", "orthanc-2"),
+        _event("DeletedStudy", "orthanc-1"),
+    ]
+    resp = await _post("/webhook/orthanc/batch", batch)
 
-    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
-        with patch("app.services.orthanc_poller.start_poller", new_callable=AsyncMock):
-            resp = await ac.post("/webhook/orthanc", json=payload)
+    assert resp.status_code == 202
+    assert resp.json() == {"received": 4, "queued": 2}
+    assert list(webhook_intake._pending) == ["orthanc-2", "orthanc-1"]
+    await webhook_intake.drain()
+    session.ingest.assert_awaited_once_with("orthanc-2", session.db)
+    session.delete.assert_awaited_once_with("orthanc-1", session.db)
 
+
+@pytest.mark.asyncio
+async def test_webhook_batch_rejects_malformed_events():
+    resp = await _post("/webhook/orthanc/batch", [_event("StableStudy", "orthanc-1"), {"ID": "x"}])
     assert resp.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_workers_process_queue_and_survive_failures(session):
+    """Started workers pick up events as they arrive; a failed dispatch doesn't stop them."""
+    from app.services import webhook_intake
+
+    session.ingest.side_effect = [RuntimeError("orthanc down"), None]
+    webhook_intake.start()
+    try:
+        webhook_intake.enqueue(_event("StableStudy", "orthanc-1"))
+        webhook_intake.enqueue(_event("StableStudy", "orthanc-2"))
+        for _ in range(20):
+            if session.ingest.await_count == 2:
+                break
+            await asyncio.sleep(0)
+    finally:
+        await webhook_intake.stop()
+
+    assert session.ingest.await_count == 2
+    assert not webhook_intake._pending
+    assert not webhook_intake._workers
+
+
+@pytest.mark.asyncio
+async def test_stop_drains_queued_events(session):
+    from app.services import webhook_intake
+
+    webhook_intake.enqueue(_event("DeletedStudy", "orthanc-1"))
+    with patch.object(webhook_intake.settings, "webhook_workers", 0):
+        webhook_intake.start()
+    await webhook_intake.stop()
+
+    session.delete.assert_awaited_once_with("orthanc-1", session.db)
@@ -1,18 +1,23 @@
 from uuid import UUID
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import select
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy import select, func
 from sqlalchemy.orm import selectinload
 from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from prometheus_client import Counter
 
-from ..database import get_db
+from ..config import settings
+from ..database import get_db, get_read_db
 from ..models import CohortDefinition, Cohort
 from ..schemas import (
     CohortDefinitionCreate, CohortDefinitionUpdate, CohortDefinitionOut,
     CohortMemberOut, ResolveResult,
 )
 from ..services.cohort_query import resolve_cohort
+from ..services.concurrency_limit import ConcurrencyLimiter
+from ..services.request_budget import budget
+from ..services.request_timing import TimedORJSONResponse
+from .conditional import make_etag, not_modified, cache_headers
 from ..services.orthanc_labeler import add_cohort_label, remove_cohort_label, get_cohort_members_from_orthanc, store_cohort_tags_as_metadata
 
 router = APIRouter(prefix="/cohort-definitions", tags=["cohorts"])
@@ -20,9 +25,23 @@ members_router = APIRouter(prefix="/cohorts", tags=["cohorts"])
 
 COHORT_MEMBERS = Counter("dcm_cohort_members_total", "Total cohort memberships created")
 
+_RESOLVE_LIMIT = ConcurrencyLimiter(
+    "resolve", settings.limit_resolve_concurrency, settings.limit_resolve_queue,
+    settings.limit_queue_timeout_seconds,
+)
+
 
 @router.get("", response_model=list[CohortDefinitionOut])
-async def list_definitions(db: AsyncSession = Depends(get_db)):
+async def list_definitions(request: Request, response: Response, db: AsyncSession = Depends(get_read_db)):
+    # Edits bump updated_at; the count catches deletions (rows are hard-deleted).
+    version = (await db.execute(
+        select(func.max(CohortDefinition.updated_at), func.count())
+    )).one()
+    etag = make_etag("cohort-definitions", *version)
+    if (cached := not_modified(request, etag, "cohort_definitions")) is not None:
+        return cached
+    response.headers.update(cache_headers(etag))
+
     result = await db.execute(select(CohortDefinition).order_by(CohortDefinition.created_at.desc()))
     return result.scalars().all()
 
@@ -42,7 +61,7 @@ async def create_definition(body: CohortDefinitionCreate, db: AsyncSession = Dep
 
 
 @router.get("/{defn_id}", response_model=CohortDefinitionOut)
-async def get_definition(defn_id: UUID, db: AsyncSession = Depends(get_db)):
+async def get_definition(defn_id: UUID, db: AsyncSession = Depends(get_read_db)):
     defn = await _get_defn_or_404(defn_id, db)
     return defn
 
@@ -77,12 +96,21 @@ async def delete_definition(defn_id: UUID, db: AsyncSession = Depends(get_db)):
     await db.commit()
 
 
-@router.post("/{defn_id}/resolve", response_model=ResolveResult)
-async def resolve(defn_id: UUID, db: AsyncSession = Depends(get_db)):
+@router.post(
+    "/{defn_id}/resolve",
+    response_model=ResolveResult,
+    dependencies=[Depends(_RESOLVE_LIMIT.dependency), Depends(budget("statement_timeout_resolve_ms"))],
+)
+async def resolve(
+    defn_id: UUID,
+    db: AsyncSession = Depends(get_db),
+    read_db: AsyncSession = Depends(get_read_db),
+):
     """Execute filters + orthanc_tags criteria, populate cohort membership, label Orthanc studies."""
     defn = await _get_defn_or_404(defn_id, db)
 
-    matched = await resolve_cohort(defn.filters, defn.orthanc_tags, db)
+    # The catalogue scan may run on the replica; memberships are written to the primary
+    matched = await resolve_cohort(defn.filters, defn.orthanc_tags, read_db)
 
     study_uids = []
     for row in matched:
@@ -121,12 +149,16 @@ async def resolve(defn_id: UUID, db: AsyncSession = Depends(get_db)):
 
 # ── Cohort membership endpoints ───────────────────────────────────────────────
 
-@members_router.get("/{defn_id}", response_model=list[CohortMemberOut])
-async def list_members(defn_id: UUID, db: AsyncSession = Depends(get_db)):
+# CohortMemberOut fields as Core columns — members are encoded straight from rows
+_MEMBER_OUT_COLUMNS = tuple(Cohort.__table__.c[name] for name in CohortMemberOut.model_fields)
+
+
+@members_router.get("/{defn_id}", response_model=list[CohortMemberOut], response_class=TimedORJSONResponse)
+async def list_members(defn_id: UUID, db: AsyncSession = Depends(get_read_db)):
     result = await db.execute(
-        select(Cohort).where(Cohort.cohort_definition_id == defn_id)
+        select(*_MEMBER_OUT_COLUMNS).where(Cohort.cohort_definition_id == defn_id)
     )
-    return result.scalars().all()
+    return TimedORJSONResponse([dict(row) for row in result.mappings().all()])
 
 
 @members_router.delete("/{defn_id}/{subject_id}", status_code=204)
@@ -5,7 +5,7 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from prometheus_client import Counter
 
-from ..database import get_db
+from ..database import get_db, get_read_db
 from ..models import MLJob, JobEdgeResult
 from ..schemas import JobCreate, JobOut, EdgeResultSubmit, AggregateResult
 from ..services.federated_coordinator import aggregate_results, can_transition
@@ -16,7 +16,7 @@ JOBS_COUNTER = Counter("dcm_ml_jobs_total", "Total ML jobs by final status", ["s
 
 
 @router.get("", response_model=list[JobOut])
-async def list_jobs(db: AsyncSession = Depends(get_db)):
+async def list_jobs(db: AsyncSession = Depends(get_read_db)):
     result = await db.execute(select(MLJob).order_by(MLJob.created_at.desc()))
     return result.scalars().all()
 
@@ -37,7 +37,7 @@ async def create_job(body: JobCreate, db: AsyncSession = Depends(get_db)):
 
 
 @router.get("/{job_id}", response_model=JobOut)
-async def get_job(job_id: UUID, db: AsyncSession = Depends(get_db)):
+async def get_job(job_id: UUID, db: AsyncSession = Depends(get_read_db)):
     return await _get_job_or_404(job_id, db)
 
 
@@ -81,6 +81,7 @@ async def delete_job(job_id: UUID, db: AsyncSession = Depends(get_db)):
 
 @router.get("/{job_id}/aggregate", response_model=AggregateResult)
 async def aggregate(job_id: UUID, db: AsyncSession = Depends(get_db)):
+    # Primary session: the first complete aggregate marks the job DONE
     job = await _get_job_or_404(job_id, db)
 
     agg = await aggregate_results(job, db)
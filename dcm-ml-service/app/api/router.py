@@ -1,8 +1,10 @@
 from fastapi import APIRouter
 from .cohorts import router as cohorts_router, members_router
 from .jobs import router as jobs_router
+from .ops import router as ops_router
 
 router = APIRouter()
 router.include_router(cohorts_router)
 router.include_router(members_router)
 router.include_router(jobs_router)
+router.include_router(ops_router)
@@ -1,22 +1,46 @@
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from prometheus_fastapi_instrumentator import Instrumentator
+from sqlalchemy.exc import DBAPIError
 
 from .api.router import router
+from .database import PinReadsAfterWrites, read_engine, warm_pool
+from .services import change_listener
+from .services.request_budget import DisconnectGuard, statement_timeout_handler
+from .services.request_timing import ServerTimingMiddleware, TimedORJSONResponse
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    await warm_pool()
+    listener_task = asyncio.create_task(change_listener.listen())
     yield
+    listener_task.cancel()
+    try:
+        await listener_task
+    except asyncio.CancelledError:
+        pass
 
 
-app = FastAPI(title="DCM ML Service", version="0.1.0", lifespan=lifespan)
+app = FastAPI(
+    title="DCM ML Service",
+    version="0.1.0",
+    lifespan=lifespan,
+    default_response_class=TimedORJSONResponse,
+)
 
 Instrumentator().instrument(app).expose(app)
+app.add_middleware(ServerTimingMiddleware)
+app.add_middleware(DisconnectGuard)
+app.add_exception_handler(DBAPIError, statement_timeout_handler)
+
+if read_engine is not None:
+    app.add_middleware(PinReadsAfterWrites)
 
 app.include_router(router)
 
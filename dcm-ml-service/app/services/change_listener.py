@@ -0,0 +1,128 @@
+"""Follow the core service's catalogue change feed (Postgres LISTEN).
+
+The core service NOTIFYs batches of study changes on `change_feed_channel`
+(see dcm-core-service app/services/change_feed.py). This module holds one
+dedicated asyncpg connection LISTENing on that channel — outside the
+SQLAlchemy pool, since a pooled connection would drop the LISTEN when it is
+returned — and hands each batch to the registered handlers.
+
+The connection is re-established with backoff when it drops. NOTIFY is not
+queued for absent listeners, so anything committed while disconnected is
+missed; handlers must tolerate that (they only keep derived state tidy).
+"""
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+
+import asyncpg
+import orjson
+from prometheus_client import Counter, Gauge
+from sqlalchemy import select, func
+from sqlalchemy.engine import make_url
+
+from ..config import settings
+from ..database import AsyncSessionLocal
+from ..models import Cohort
+
+logger = logging.getLogger(__name__)
+
+CHANGE_FEED_EVENTS = Counter("dcm_ml_change_feed_events_total", "Catalogue changes received", ["op"])
+CHANGE_FEED_CONNECTED = Gauge("dcm_ml_change_feed_connected", "1 while LISTENing on the change feed")
+
+_MAX_BACKOFF_SECONDS = 30.0
+
+
+@dataclass(frozen=True)
+class ChangeEvent:
+    op: str  # "ingested" | "deleted"
+    study_uid: str
+    orthanc_id: str
+
+
+Handler = Callable[[list[ChangeEvent]], Awaitable[None]]
+_handlers: list[Handler] = []
+_dispatches: set[asyncio.Task] = set()
+
+
+def register(handler: Handler) -> Handler:
+    """Call *handler* with every batch of changes (usable as a decorator)."""
+    _handlers.append(handler)
+    return handler
+
+
+def parse(payload: str) -> list[ChangeEvent]:
+    return [ChangeEvent(e["op"], e["study_uid"], e["orthanc_id"]) for e in orjson.loads(payload)["events"]]
+
+
+async def dispatch(events: list[ChangeEvent]) -> None:
+    """Run every handler on *events*; one failing handler doesn't stop the others."""
+    for event in events:
+        CHANGE_FEED_EVENTS.labels(op=event.op).inc()
+    for handler in _handlers:
+        try:
+            await handler(events)
+        except Exception as exc:
+            logger.warning("Change feed handler %s failed: %s", handler.__name__, exc)
+
+
+def _on_notify(connection, pid, channel, payload: str) -> None:
+    try:
+        events = parse(payload)
+    except (ValueError, KeyError, TypeError) as exc:
+        logger.warning("Ignoring malformed change feed payload: %s", exc)
+        return
+    task = asyncio.get_running_loop().create_task(dispatch(events))
+    _dispatches.add(task)
+    task.add_done_callback(_dispatches.discard)
+
+
+def _dsn() -> str:
+    # asyncpg takes a plain postgresql:// DSN, not SQLAlchemy's dialect+driver form
+    url = make_url(settings.database_url).set(drivername="postgresql")
+    return url.render_as_string(hide_password=False)
+
+
+async def listen() -> None:
+    """LISTEN until cancelled, reconnecting with exponential backoff."""
+    backoff = 1.0
+    while True:
+        connection = None
+        try:
+            connection = await asyncpg.connect(_dsn())
+            lost = asyncio.Event()
+            connection.add_termination_listener(lambda _: lost.set())
+            await connection.add_listener(settings.change_feed_channel, _on_notify)
+            CHANGE_FEED_CONNECTED.set(1)
+            logger.info("Listening for catalogue changes on %s", settings.change_feed_channel)
+            backoff = 1.0
+            await lost.wait()
+            logger.warning("Change feed connection lost; reconnecting")
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.warning("Change feed unavailable (%s); retrying in %.0fs", exc, backoff)
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, _MAX_BACKOFF_SECONDS)
+        finally:
+            CHANGE_FEED_CONNECTED.set(0)
+            if connection is not None and not connection.is_closed():
+                await connection.close()
+
+
+@register
+async def report_deleted_members(events: list[ChangeEvent]) -> None:
+    """Log cohorts that still list studies just deleted from the catalogue.
+
+    Memberships are left alone: core only soft-deletes, and a study that is
+    re-ingested comes back live with its cohorts intact.
+    """
+    deleted = [e.study_uid for e in events if e.op == "deleted"]
+    if not deleted:
+        return
+    async with AsyncSessionLocal() as db:
+        count = await db.scalar(
+            select(func.count()).select_from(Cohort).where(Cohort.subject_id.in_(deleted))
+        )
+    if count:
+        logger.info("%d cohort memberships refer to studies deleted from the catalogue", count)
@@ -7,8 +7,8 @@ from datetime import date
 from typing import Any, Optional
 
 from sqlalchemy import Column, Date, Text, Integer, DateTime
-from sqlalchemy import select, func, distinct, cast
-from sqlalchemy.dialects.postgresql import UUID, JSONB
+from sqlalchemy import select, func, distinct, cast, exists
+from sqlalchemy.dialects.postgresql import UUID, JSONB, ARRAY
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import Table, MetaData
 
@@ -27,6 +27,7 @@ studies_table = Table(
     Column("patient_sex", Text),
     Column("study_date", Date),
     Column("institution_name", Text),
+    Column("modalities_in_study", ARRAY(Text)),
     Column("raw_main_dicom_tags", JSONB),
     Column("deleted_at", DateTime(timezone=True)),
 )
@@ -67,11 +68,8 @@ async def resolve_cohort(filters: dict, orthanc_tags: list[dict], db: AsyncSessi
             studies_table.c.raw_main_dicom_tags,
         )
         .where(studies_table.c.deleted_at.is_(None))
-        .distinct()
     )
 
-    need_series_join = False
-
     # ── Structured filters ──────────────────────────────────────────────────
     if study_date_from := _safe_date(filters.get("study_date_from")):
         q = q.where(studies_table.c.study_date >= study_date_from)
@@ -93,36 +91,40 @@ async def resolve_cohort(filters: dict, orthanc_tags: list[dict], db: AsyncSessi
         age_expr = func.extract("year", func.age(func.now(), studies_table.c.patient_birth_date))
         q = q.where(age_expr <= int(age_max))
 
+    # Modalities are denormalized onto studies (GIN-indexed) — no series join needed
     if modalities := filters.get("modalities"):
-        need_series_join = True
-        q = q.where(series_table.c.modality.in_([m.upper() for m in modalities]))
+        q = q.where(studies_table.c.modalities_in_study.overlap([m.upper() for m in modalities]))
 
+    # Substring match on body part stays series-level, as a semi-join so no DISTINCT is needed
     if body_part := filters.get("body_part_examined"):
-        need_series_join = True
-        q = q.where(series_table.c.body_part_examined.ilike(f"%{body_part}%"))
+        q = q.where(exists(
+            select(series_table.c.id).where(
+                series_table.c.study_id == studies_table.c.id,
+                series_table.c.deleted_at.is_(None),
+                series_table.c.body_part_examined.ilike(f"%{body_part}%"),
+            )
+        ))
 
     # ── Orthanc tag criteria (applied via raw_main_dicom_tags JSONB) ────────
+    # Containment (@>) rather than ->> equality so the GIN indexes on
+    # studies/series raw_main_dicom_tags can serve each criterion.
     for tag_criterion in orthanc_tags:
         tag_key = tag_criterion.get("tag", "")
         tag_value = tag_criterion.get("value", "")
         if tag_key and tag_value:
-            # Check both studies raw tags and series raw tags
-            # Study-level tags (MainDicomTags + PatientMainDicomTags merged)
+            # Study-level tags (MainDicomTags + PatientMainDicomTags merged),
+            # or any live series carrying the tag
             q = q.where(
-                (studies_table.c.raw_main_dicom_tags[tag_key].as_string() == tag_value)
-                |
-                # Also check series-level raw tags for series-level tag criteria
-                (studies_table.c.id.in_(
-                    select(series_table.c.study_id).where(
-                        series_table.c.raw_main_dicom_tags[tag_key].as_string() == tag_value
-                    ).where(series_table.c.deleted_at.is_(None))
-                ))
+                studies_table.c.raw_main_dicom_tags.contains({tag_key: tag_value})
+                | exists(
+                    select(series_table.c.id).where(
+                        series_table.c.study_id == studies_table.c.id,
+                        series_table.c.deleted_at.is_(None),
+                        series_table.c.raw_main_dicom_tags.contains({tag_key: tag_value}),
+                    )
+                )
             )
 
-    if need_series_join:
-        q = q.join(series_table, series_table.c.study_id == studies_table.c.id)
-        q = q.where(series_table.c.deleted_at.is_(None))
-
-    result = await db.execute(q.limit(10000))
+    result = await db.execute(q.limit(10000).execution_options(statement_name="cohort_resolve", explain=True))
     rows = result.mappings().all()
     return [dict(r) for r in rows]
@@ -32,6 +32,7 @@ async def aggregate_results(job: MLJob, db: AsyncSession) -> dict:
     """
     result = await db.execute(
         select(JobEdgeResult).where(JobEdgeResult.job_id == job.id)
+        .execution_options(statement_name="job_aggregate")
     )
     edge_results = result.scalars().all()
 
@@ -5,6 +5,7 @@ from uuid import UUID
 
 import httpx
 from ..config import settings
+from . import request_timing
 
 logger = logging.getLogger(__name__)
 
@@ -13,7 +14,10 @@ def _make_client() -> httpx.AsyncClient:
     auth = None
     if settings.orthanc_user:
         auth = (settings.orthanc_user, settings.orthanc_pass)
-    return httpx.AsyncClient(base_url=settings.orthanc_url, auth=auth, timeout=30.0)
+    return httpx.AsyncClient(
+        base_url=settings.orthanc_url, auth=auth, timeout=30.0,
+        event_hooks=request_timing.orthanc_event_hooks(),
+    )
 
 
 def _label(cohort_id: UUID) -> str:
@@ -0,0 +1,100 @@
+"""Per-statement query latency and slow-query capture, via SQLAlchemy engine events.
+
+Statements are named with ``.execution_options(statement_name="...")``;
+unnamed ones are timed as ``other``. A statement slower than `slow_query_ms`
+is logged and kept in a bounded list served by GET /ops/slow-queries.
+
+Read statements that opt in with ``.execution_options(explain=True)`` have
+the plan of a sample of their slow runs (`slow_query_explain_sample_rate`)
+captured with a plain ``EXPLAIN`` on the same connection. Without ANALYZE the
+statement is only planned, never run a second time, so functions it calls
+(``pg_notify``, advisory locks, ``set_config``) have no repeated effect.
+Bound parameters are neither logged nor kept, since they carry patient data.
+"""
+import logging
+import random
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Optional
+
+from prometheus_client import Counter, Histogram
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from ..config import settings
+from . import request_timing
+
+logger = logging.getLogger(__name__)
+
+DB_STATEMENT_SECONDS = Histogram(
+    "dcm_db_statement_seconds",
+    "Database statement latency by statement name",
+    ["statement"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+DB_SLOW_QUERIES = Counter("dcm_db_slow_queries_total", "Statements slower than slow_query_ms", ["statement"])
+
+_MAX_SQL_CHARS = 4000
+
+_slow_queries: deque[dict] = deque(maxlen=settings.slow_query_log_size)
+
+
+def instrument(engine: Engine) -> None:
+    """Time every statement run on *engine* (the sync engine behind an AsyncEngine)."""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def recent_slow_queries() -> list[dict]:
+    """Captured slow statements, most recent first."""
+    return list(reversed(_slow_queries))
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._dcm_started_at = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started_at = getattr(context, "_dcm_started_at", None)
+    if started_at is None:
+        return
+    elapsed = time.perf_counter() - started_at
+    options = context.execution_options
+    name = options.get("statement_name", "other")
+    DB_STATEMENT_SECONDS.labels(statement=name).observe(elapsed)
+    request_timing.add("sql", elapsed)
+    if elapsed * 1000 < settings.slow_query_ms:
+        return
+
+    DB_SLOW_QUERIES.labels(statement=name).inc()
+    plan = None
+    if (
+        options.get("explain")
+        and not executemany
+        and random.random() < settings.slow_query_explain_sample_rate
+    ):
+        plan = _explain(conn, statement, parameters)
+    logger.warning("Slow query %s: %.0f ms\n%s%s", name, elapsed * 1000, statement, f"\n{plan}" if plan else "")
+    _slow_queries.append({
+        "statement": name,
+        "duration_ms": round(elapsed * 1000, 1),
+        "at": datetime.now(timezone.utc).isoformat(),
+        "sql": statement[:_MAX_SQL_CHARS],
+        "plan": plan,
+    })
+
+
+def _explain(conn, statement: str, parameters) -> Optional[str]:
+    # A separate DBAPI cursor: the original one still holds the result being returned,
+    # and DBAPI-level execution doesn't re-enter these event hooks
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute(f"EXPLAIN {statement}", parameters)
+        return "\n".join(row[0] for row in cursor.fetchall())
+    except Exception as exc:
+        logger.warning("Could not EXPLAIN slow query: %s", exc)
+        return None
+    finally:
+        cursor.close()
@@ -0,0 +1,100 @@
+"""Tests for the catalogue change feed listener."""
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app.services import change_listener
+from app.services.change_listener import ChangeEvent
+
+
+PAYLOAD = (
+    '{"events":[{"op":"ingested","study_uid":"1.2.3","orthanc_id":"abc"},'
+    '{"op":"deleted","study_uid":"1.2.4","orthanc_id":"def"}]}'
+)
+
+
+def test_parse():
+    assert change_listener.parse(PAYLOAD) == [
+        ChangeEvent("ingested", "1.2.3", "abc"),
+        ChangeEvent("deleted", "1.2.4", "def"),
+    ]
+
+
+def test_dsn_drops_the_sqlalchemy_driver():
+    with patch.object(change_listener.settings, "database_url", "postgresql+asyncpg://u:p@db:5432/x"):
+        assert change_listener._dsn() == "postgresql://u:p@db:5432/x"
+
+
+@pytest.mark.asyncio
+async def test_notify_fans_out_to_every_handler():
+    received = []
+
+    async def failing(events):
+        raise RuntimeError("boom")
+
+    async def recording(events):
+        received.append(events)
+
+    with patch.object(change_listener, "_handlers", [failing, recording]):
+        change_listener._on_notify(None, 1, "dcm_catalog_changes", PAYLOAD)
+        await asyncio.gather(*change_listener._dispatches)
+
+    assert received == [change_listener.parse(PAYLOAD)]
+
+
+@pytest.mark.asyncio
+async def test_malformed_payload_is_ignored():
+    with patch.object(change_listener, "_handlers", [AsyncMock()]) as handlers:
+        change_listener._on_notify(None, 1, "dcm_catalog_changes", "not json")
+        assert not change_listener._dispatches
+        handlers[0].assert_not_awaited()
+
+
+def _session_factory(session):
+    factory = MagicMock()
+    factory.return_value.__aenter__.return_value = session
+    return factory
+
+
+@pytest.mark.asyncio
+async def test_deleted_members_are_reported_not_removed():
+    session = AsyncMock()
+    session.scalar.return_value = 2
+    with patch.object(change_listener, "AsyncSessionLocal", _session_factory(session)):
+        await change_listener.report_deleted_members(change_listener.parse(PAYLOAD))
+
+    stmt = session.scalar.await_args.args[0]
+    assert stmt.is_select
+    assert list(stmt.compile().params.values()) == [["1.2.4"]]
+    session.execute.assert_not_awaited()
+    session.commit.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_report_ignores_ingest_only_batches():
+    session = AsyncMock()
+    with patch.object(change_listener, "AsyncSessionLocal", _session_factory(session)):
+        await change_listener.report_deleted_members([ChangeEvent("ingested", "1.2.3", "abc")])
+    session.scalar.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_listen_reconnects_after_a_failure():
+    connection = MagicMock(add_listener=AsyncMock(), close=AsyncMock())
+    connection.is_closed.return_value = False
+    connect = AsyncMock(side_effect=[OSError("refused"), connection])
+    yield_to_loop = asyncio.sleep
+
+    with patch.object(change_listener.asyncpg, "connect", connect), \
+         patch.object(change_listener.asyncio, "sleep", AsyncMock()) as sleep:
+        task = asyncio.create_task(change_listener.listen())
+        for _ in range(10):
+            await yield_to_loop(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    assert connect.await_count == 2
+    sleep.assert_awaited_once_with(1.0)
+    connection.add_listener.assert_awaited_once()
+    connection.close.assert_awaited_once()
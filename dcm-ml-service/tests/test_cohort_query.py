@@ -41,7 +41,7 @@ async def test_resolve_cohort_empty_filters_builds_query():
 
 @pytest.mark.asyncio
 async def test_resolve_cohort_with_modality_filter():
-    """Modality filter should trigger series join and return matching rows."""
+    """Modality filter should return matching rows."""
     from unittest.mock import AsyncMock, MagicMock
     from app.services.cohort_query import resolve_cohort
 
@@ -73,3 +73,44 @@ async def test_resolve_cohort_with_orthanc_tag_filter():
     assert result == []
     # Verify query was built and executed
     db.execute.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_resolve_cohort_modality_filter_uses_study_array_without_join():
+    """Modalities compile to an array overlap on studies — no series JOIN or DISTINCT."""
+    from unittest.mock import AsyncMock, MagicMock
+    from sqlalchemy.dialects import postgresql
+    from app.services.cohort_query import resolve_cohort
+
+    db = AsyncMock()
+    rows = MagicMock()
+    rows.mappings.return_value.all.return_value = []
+    db.execute = AsyncMock(return_value=rows)
+
+    await resolve_cohort({"modalities": ["ct", "MR"]}, [], db)
+
+    stmt = db.execute.await_args.args[0]
+    sql = str(stmt.compile(dialect=postgresql.dialect()))
+    assert "modalities_in_study &&" in sql
+    assert "JOIN" not in sql
+    assert "DISTINCT" not in sql
+
+
+@pytest.mark.asyncio
+async def test_resolve_cohort_tag_criteria_use_jsonb_containment():
+    """Tag criteria should compile to @> on both studies and series raw tags."""
+    from unittest.mock import AsyncMock, MagicMock
+    from sqlalchemy.dialects import postgresql
+    from app.services.cohort_query import resolve_cohort
+
+    db = AsyncMock()
+    rows = MagicMock()
+    rows.mappings.return_value.all.return_value = []
+    db.execute = AsyncMock(return_value=rows)
+
+    await resolve_cohort({}, [{"tag": "Modality", "name": "Modality", "value": "CT"}], db)
+
+    compiled = db.execute.await_args.args[0].compile(dialect=postgresql.dialect())
+    assert "studies.raw_main_dicom_tags @>" in str(compiled)
+    assert "series.raw_main_dicom_tags @>" in str(compiled)
+    assert {"Modality": "CT"} in compiled.params.values()
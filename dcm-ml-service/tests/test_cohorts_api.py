@@ -139,3 +139,35 @@ async def test_resolve_cohort_calls_labeler():
     assert data["matched_count"] == 1
     assert "1.2.3" in data["study_uids"]
     mock_label.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_list_definitions_conditional_get():
+    from httpx import AsyncClient, ASGITransport
+    from app.main import app
+    from app.database import get_db
+
+    version = MagicMock()
+    version.one.return_value = (datetime(2024, 1, 1, tzinfo=timezone.utc), 3)
+    items = MagicMock()
+    items.scalars.return_value.all.return_value = []
+    db = AsyncMock()
+    db.execute = AsyncMock(side_effect=[version, items, version])
+
+    async def override():
+        yield db
+
+    app.dependency_overrides[get_db] = override
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        first = await ac.get("/cohort-definitions")
+        etag = first.headers["etag"]
+        second = await ac.get("/cohort-definitions", headers={"If-None-Match": etag})
+
+    app.dependency_overrides.clear()
+
+    assert first.status_code == 200
+    assert second.status_code == 304
+    assert second.headers["etag"] == etag
+    # The 304 is answered from the version probe alone
+    assert db.execute.await_count == 3
@@ -1,4 +1,5 @@
 """Extended unit tests for cohort-definition and cohort-membership endpoints."""
+import asyncio
 import pytest
 from unittest.mock import AsyncMock, MagicMock, patch
 from uuid import uuid4
@@ -19,6 +20,19 @@ def make_defn(name="test-cohort"):
     return d
 
 
+def make_member_row(defn_id, subject_id="1.2.3"):
+    """A cohort row as returned by result.mappings() for the CohortMemberOut projection."""
+    return {
+        "cohort_definition_id": defn_id,
+        "subject_id": subject_id,
+        "orthanc_study_id": "oid-abc",
+        "cohort_start_date": date(2023, 1, 1),
+        "cohort_end_date": None,
+        "orthanc_tags_snapshot": {},
+        "added_at": datetime.now(timezone.utc),
+    }
+
+
 def make_member(defn_id, subject_id="1.2.3"):
     m = MagicMock()
     m.cohort_definition_id = defn_id
@@ -139,12 +153,14 @@ async def test_list_members_returns_members():
     from app.main import app
     from app.database import get_db
 
+    from app.schemas import CohortMemberOut
+
     defn = make_defn()
-    members = [make_member(defn.cohort_definition_id, "uid-001")]
+    members = [make_member_row(defn.cohort_definition_id, "uid-001")]
 
     db = AsyncMock()
     res = MagicMock()
-    res.scalars.return_value.all.return_value = members
+    res.mappings.return_value.all.return_value = members
     db.execute = AsyncMock(return_value=res)
 
     async def override():
@@ -161,6 +177,8 @@ async def test_list_members_returns_members():
     data = resp.json()
     assert len(data) == 1
     assert data[0]["subject_id"] == "uid-001"
+    CohortMemberOut.model_validate(data[0])
+    assert set(data[0]) == set(CohortMemberOut.model_fields)
 
 
 @pytest.mark.asyncio
@@ -172,7 +190,7 @@ async def test_list_members_empty():
 
     db = AsyncMock()
     res = MagicMock()
-    res.scalars.return_value.all.return_value = []
+    res.mappings.return_value.all.return_value = []
     db.execute = AsyncMock(return_value=res)
 
     async def override():
@@ -290,6 +308,100 @@ async def test_resolve_cohort_with_multiple_matches():
     assert mock_label.await_count == 2
 
 
+@pytest.mark.asyncio
+async def test_resolve_scans_the_catalogue_on_the_read_session():
+    """The cohort query runs on get_read_db's session; memberships are written via get_db."""
+    from httpx import AsyncClient, ASGITransport
+    from app.main import app
+    from app.database import get_db, get_read_db
+
+    defn = make_defn("replica")
+    db = AsyncMock()
+    res = MagicMock()
+    res.scalar_one_or_none.return_value = defn
+    db.execute = AsyncMock(return_value=res)
+    read_db = AsyncMock()
+
+    async def override():
+        yield db
+
+    async def read_override():
+        yield read_db
+
+    app.dependency_overrides[get_db] = override
+    app.dependency_overrides[get_read_db] = read_override
+
+    matched = [{"study_uid": "1.2.3", "orthanc_study_id": "oid1", "study_date": None, "raw_main_dicom_tags": {}}]
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        with patch("app.api.cohorts.resolve_cohort", new_callable=AsyncMock, return_value=matched) as mock_resolve:
+            with patch("app.api.cohorts.add_cohort_label", new_callable=AsyncMock):
+                with patch("app.api.cohorts.store_cohort_tags_as_metadata", new_callable=AsyncMock):
+                    resp = await ac.post(f"/cohort-definitions/{defn.cohort_definition_id}/resolve")
+
+    app.dependency_overrides.clear()
+
+    assert resp.status_code == 200
+    assert mock_resolve.await_args.args[2] is read_db
+    assert db.execute.await_count == 2  # definition lookup + membership upsert
+    db.commit.assert_awaited_once()
+    read_db.commit.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_resolve_over_its_statement_timeout_is_a_503():
+    from httpx import AsyncClient, ASGITransport
+    from sqlalchemy.exc import DBAPIError
+    from app.main import app
+    from app.database import get_db
+
+    defn = make_defn("slow")
+    db = AsyncMock()
+    res = MagicMock()
+    res.scalar_one_or_none.return_value = defn
+    db.execute = AsyncMock(return_value=res)
+
+    async def override():
+        yield db
+
+    app.dependency_overrides[get_db] = override
+    cancelled = Exception("canceling statement due to statement timeout")
+    cancelled.sqlstate = "57014"
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        with patch("app.api.cohorts.resolve_cohort", new_callable=AsyncMock,
+                   side_effect=DBAPIError("SELECT", {}, cancelled)):
+            resp = await ac.post(f"/cohort-definitions/{defn.cohort_definition_id}/resolve")
+
+    app.dependency_overrides.clear()
+
+    assert resp.status_code == 503
+    db.commit.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_resolve_is_shed_when_the_limiter_is_saturated():
+    from httpx import AsyncClient, ASGITransport
+    from app.main import app
+    from app.api import cohorts
+
+    # Every slot and queue position taken
+    limiter = cohorts._RESOLVE_LIMIT
+    limiter._active = limiter.max_concurrent
+    limiter._waiters.extend(asyncio.get_running_loop().create_future() for _ in range(limiter.max_queue))
+    try:
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+            with patch("app.api.cohorts.resolve_cohort", new_callable=AsyncMock) as mock_resolve:
+                resp = await ac.post(f"/cohort-definitions/{uuid4()}/resolve")
+    finally:
+        limiter._active = 0
+        limiter._waiters.clear()
+
+    assert resp.status_code == 429
+    assert resp.headers["retry-after"] == "2"
+    mock_resolve.assert_not_awaited()
+
+
 # ── cohort from Orthanc ────────────────────────────────────────────────────────
 
 @pytest.mark.asyncio
@@ -0,0 +1,33 @@
+"""Tests for connection pool configuration."""
+from unittest.mock import patch
+
+from prometheus_client import REGISTRY
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app import database
+
+
+def test_default_engine_uses_the_timed_queue_pool():
+    assert isinstance(database.engine.pool, database.TimedQueuePool)
+    assert database.engine.pool.size() == database.settings.db_pool_size
+
+
+def test_pgbouncer_mode_disables_pooling_and_statement_reuse():
+    with patch.object(database.settings, "db_pgbouncer", True):
+        options = database.engine_options()
+
+    assert options["poolclass"] is NullPool
+    assert options["connect_args"]["statement_cache_size"] == 0
+    assert options["connect_args"]["prepared_statement_cache_size"] == 0
+
+
+def test_pool_gauges_are_exported_per_engine():
+    read_engine = create_async_engine(
+        "postgresql+asyncpg://dcm@replica/dcmdb", **database.engine_options(database.ReadTimedQueuePool)
+    )
+    database._export_pool_gauges(read_engine, "read")
+
+    for engine in ("primary", "read"):
+        assert REGISTRY.get_sample_value("dcm_db_pool_connections_in_use", {"engine": engine}) == 0
+        assert REGISTRY.get_sample_value("dcm_db_pool_overflow", {"engine": engine}) == 0
@@ -0,0 +1,26 @@
+"""Tests for the /ops endpoints."""
+import pytest
+from sqlalchemy import create_engine, text
+from unittest.mock import patch
+
+from app.services import query_metrics
+
+
+@pytest.mark.asyncio
+async def test_slow_queries_are_listed(client):
+    engine = create_engine("sqlite://")
+    query_metrics.instrument(engine)
+    try:
+        with patch.object(query_metrics.settings, "slow_query_ms", 0), \
+             patch.object(query_metrics.settings, "slow_query_explain_sample_rate", 0.0):
+            with engine.connect() as conn:
+                conn.execute(text("SELECT 1").execution_options(statement_name="cohort_resolve"))
+        resp = await client.get("/ops/slow-queries")
+    finally:
+        query_metrics._slow_queries.clear()
+        engine.dispose()
+
+    assert resp.status_code == 200
+    [entry] = resp.json()
+    assert entry["statement"] == "cohort_resolve"
+    assert entry["plan"] is None
@@ -0,0 +1,30 @@
+"""Tests for the Server-Timing breakdown."""
+import pytest
+from unittest.mock import AsyncMock, patch
+
+
+@pytest.mark.asyncio
+async def test_responses_carry_server_timing(client):
+    resp = await client.get("/health")
+    assert resp.headers["server-timing"].startswith("sql;dur=0.0, pool;dur=0.0, orthanc;dur=0.0, encode;dur=")
+
+
+@pytest.mark.asyncio
+async def test_orthanc_calls_are_attributed(client):
+    import httpx
+    from app.services import orthanc_labeler
+
+    async def orthanc(request):
+        return httpx.Response(200, json=["oid1"])
+
+    real_client = httpx.AsyncClient
+
+    def mock_client(**kwargs):
+        return real_client(transport=httpx.MockTransport(orthanc), **kwargs)
+
+    with patch.object(orthanc_labeler.httpx, "AsyncClient", side_effect=mock_client):
+        resp = await client.get("/cohorts/00000000-0000-0000-0000-000000000001/orthanc")
+
+    assert resp.status_code == 200
+    orthanc_ms = float(resp.headers["server-timing"].split("orthanc;dur=")[1].split(",")[0])
+    assert orthanc_ms > 0
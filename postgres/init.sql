@@ -2,6 +2,7 @@
 -- Run automatically on first container start via docker-entrypoint-initdb.d
 
 CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
+CREATE EXTENSION IF NOT EXISTS pg_trgm;     -- trigram indexes for ILIKE '%…%' search
 
 -- ─── Orthanc change poller state ─────────────────────────────────────────────
 CREATE TABLE poller_state (
@@ -28,6 +29,9 @@ CREATE TABLE studies (
     institution_name    TEXT,                   -- InstitutionName    0008,0080
     num_series          INT DEFAULT 0,
     num_instances       INT DEFAULT 0,
+    -- Denormalized from live series by the ingester so modality filters are
+    -- array-overlap predicates instead of a series join + DISTINCT
+    modalities_in_study TEXT[] NOT NULL DEFAULT '{}',  -- ModalitiesInStudy 0008,0061
     -- Full Orthanc MainDicomTags response stored for flexible tag access
     raw_main_dicom_tags JSONB DEFAULT '{}',
     ingested_at         TIMESTAMPTZ DEFAULT NOW(),
@@ -36,9 +40,15 @@ CREATE TABLE studies (
 );
 
 CREATE INDEX idx_studies_patient_id  ON studies (patient_id);
-CREATE INDEX idx_studies_study_date  ON studies (study_date);
-CREATE INDEX idx_studies_deleted_at  ON studies (deleted_at);
+-- Date filters only ever read live rows
+CREATE INDEX idx_studies_live_study_date ON studies (study_date) WHERE deleted_at IS NULL;
 CREATE INDEX idx_studies_raw_tags    ON studies USING GIN (raw_main_dicom_tags);
+CREATE INDEX idx_studies_modalities  ON studies USING GIN (modalities_in_study);
+-- Trigram indexes back the /studies q= search and the institution ILIKE filters
+CREATE INDEX idx_studies_patient_name_trgm  ON studies USING GIN (patient_name gin_trgm_ops);
+CREATE INDEX idx_studies_description_trgm   ON studies USING GIN (study_description gin_trgm_ops);
+CREATE INDEX idx_studies_accession_trgm     ON studies USING GIN (accession_number gin_trgm_ops);
+CREATE INDEX idx_studies_institution_trgm   ON studies USING GIN (institution_name gin_trgm_ops);
 
 -- ─── DICOM Series ─────────────────────────────────────────────────────────────
 CREATE TABLE series (
@@ -58,21 +68,56 @@ CREATE TABLE series (
 
 CREATE INDEX idx_series_study_id  ON series (study_id);
 CREATE INDEX idx_series_modality  ON series (modality);
+CREATE INDEX idx_series_body_part_trgm ON series USING GIN (body_part_examined gin_trgm_ops);
+CREATE INDEX idx_series_raw_tags  ON series USING GIN (raw_main_dicom_tags);
 
 -- ─── DICOM Instances ──────────────────────────────────────────────────────────
+-- Hash-partitioned by series: unique keys must include series_id
 CREATE TABLE instances (
-    id                  UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
-    sop_instance_uid    TEXT UNIQUE NOT NULL,   -- SOPInstanceUID     0008,0018
-    orthanc_id          TEXT UNIQUE NOT NULL,
+    id                  UUID NOT NULL DEFAULT uuid_generate_v4(),
+    sop_instance_uid    TEXT NOT NULL,          -- SOPInstanceUID     0008,0018
+    orthanc_id          TEXT NOT NULL,
     series_id           UUID NOT NULL REFERENCES series (id) ON DELETE CASCADE,
     instance_number     INT,                    -- InstanceNumber     0020,0013
     sop_class_uid       TEXT,                   -- SOPClassUID        0008,0016
     transfer_syntax_uid TEXT,
     raw_main_dicom_tags JSONB DEFAULT '{}',
-    deleted_at          TIMESTAMPTZ
+    deleted_at          TIMESTAMPTZ,
+    CONSTRAINT instances_pkey PRIMARY KEY (id, series_id),
+    CONSTRAINT instances_series_sop_instance_uid_key UNIQUE (series_id, sop_instance_uid),
+    CONSTRAINT instances_series_orthanc_id_key UNIQUE (series_id, orthanc_id)
+) PARTITION BY HASH (series_id);
+
+DO $$
+BEGIN
+    FOR i IN 0..15 LOOP
+        EXECUTE format(
+            'CREATE TABLE instances_p%s PARTITION OF instances '
+            'FOR VALUES WITH (MODULUS 16, REMAINDER %s)', lpad(i::text, 2, '0'), i
+        );
+    END LOOP;
+END
+$$;
+
+CREATE INDEX idx_instances_series_id ON instances (series_id, instance_number);
+
+-- ─── Statistics rollup ───────────────────────────────────────────────────────
+-- Counts behind /statistics, kept current by ingest and soft-delete
+-- (see dcm-core-service/app/services/stats_rollup.py)
+CREATE TABLE statistics_rollup (
+    dimension   TEXT NOT NULL,              -- totals | modality | institution | month | day | sex | body_part | instance_bucket
+    key         TEXT NOT NULL,
+    count       BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (dimension, key)
 );
 
-CREATE INDEX idx_instances_series_id ON instances (series_id);
+-- HyperLogLog register arrays for unique-patient estimates, per institution/modality/month
+CREATE TABLE statistics_sketch (
+    dimension   TEXT NOT NULL,
+    key         TEXT NOT NULL,
+    registers   BYTEA NOT NULL,
+    PRIMARY KEY (dimension, key)
+);
 
 -- ─── Cohort Definitions (OMOP-inspired) ───────────────────────────────────────
 -- cohort_definition: stores filter criteria and tag criteria used to build a cohort
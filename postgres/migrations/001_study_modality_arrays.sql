@@ -0,0 +1,19 @@
+-- Upgrade an existing database to the denormalized study modality array.
+-- Fresh installs get it from init.sql; run once with:
+--   psql -U dcm -d dcmdb -f postgres/migrations/001_study_modality_arrays.sql
+
+ALTER TABLE studies ADD COLUMN IF NOT EXISTS modalities_in_study TEXT[] NOT NULL DEFAULT '{}';
+
+UPDATE studies s
+SET modalities_in_study = COALESCE(agg.modalities, '{}')
+FROM (
+    SELECT study_id,
+           array_agg(DISTINCT upper(modality)) FILTER (WHERE modality IS NOT NULL AND modality <> '')
+               AS modalities
+    FROM series
+    WHERE deleted_at IS NULL
+    GROUP BY study_id
+) agg
+WHERE agg.study_id = s.id;
+
+CREATE INDEX IF NOT EXISTS idx_studies_modalities ON studies USING GIN (modalities_in_study);
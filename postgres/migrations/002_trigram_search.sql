@@ -0,0 +1,11 @@
+-- Trigram (pg_trgm) indexes for substring search on studies and series.
+-- Fresh installs get these from init.sql; run once with:
+--   psql -U dcm -d dcmdb -f postgres/migrations/002_trigram_search.sql
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS idx_studies_patient_name_trgm ON studies USING GIN (patient_name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_studies_description_trgm  ON studies USING GIN (study_description gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_studies_accession_trgm    ON studies USING GIN (accession_number gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_studies_institution_trgm  ON studies USING GIN (institution_name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_series_body_part_trgm     ON series  USING GIN (body_part_examined gin_trgm_ops);
@@ -0,0 +1,5 @@
+-- GIN index so series-level tag filters (raw_main_dicom_tags @> '{...}') avoid a full scan.
+-- Fresh installs get this from init.sql; run once with:
+--   psql -U dcm -d dcmdb -f postgres/migrations/003_series_raw_tags_index.sql
+
+CREATE INDEX IF NOT EXISTS idx_series_raw_tags ON series USING GIN (raw_main_dicom_tags);
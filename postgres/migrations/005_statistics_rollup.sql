@@ -0,0 +1,12 @@
+-- Rollup table read by /statistics and maintained by ingest/soft-delete.
+-- Fresh installs get this from init.sql; run once with:
+--   psql -U dcm -d dcmdb -f postgres/migrations/005_statistics_rollup.sql
+-- then fill it from the existing catalogue (also usable to repair drift):
+--   docker compose exec dcm-core-service python -m app.services.stats_rollup
+
+CREATE TABLE IF NOT EXISTS statistics_rollup (
+    dimension   TEXT NOT NULL,
+    key         TEXT NOT NULL,
+    count       BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (dimension, key)
+);
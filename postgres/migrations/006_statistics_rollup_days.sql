@@ -0,0 +1,10 @@
+-- Backfill the per-day counts used by /statistics/timeseries into statistics_rollup.
+-- New studies maintain them from here on; run once with:
+--   psql -U dcm -d dcmdb -f postgres/migrations/006_statistics_rollup_days.sql
+
+INSERT INTO statistics_rollup (dimension, key, count)
+SELECT 'day', to_char(study_date, 'YYYY-MM-DD'), count(*)
+FROM studies
+WHERE deleted_at IS NULL AND study_date IS NOT NULL
+GROUP BY 2
+ON CONFLICT (dimension, key) DO UPDATE SET count = EXCLUDED.count;
@@ -0,0 +1,12 @@
+-- HyperLogLog sketches behind the unique-patient statistics.
+-- Fresh installs get this from init.sql; run once with:
+--   psql -U dcm -d dcmdb -f postgres/migrations/007_statistics_sketch.sql
+-- then fill it from the existing catalogue:
+--   docker compose exec dcm-core-service python -m app.services.stats_rollup
+
+CREATE TABLE IF NOT EXISTS statistics_sketch (
+    dimension   TEXT NOT NULL,
+    key         TEXT NOT NULL,
+    registers   BYTEA NOT NULL,
+    PRIMARY KEY (dimension, key)
+);
@@ -0,0 +1,18 @@
+-- Widen idx_instances_series_id to (series_id, instance_number) so the paged
+-- /studies/{uid}/series/{uid}/instances sub-resource reads instances in order
+-- instead of sorting them. Fresh installs get this from init.sql; run once with:
+--   psql -U dcm -d dcmdb -f postgres/migrations/008_instances_series_order_index.sql
+-- Safe to re-run: the index is only rebuilt while it is still single-column.
+
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_indexes
+        WHERE indexname = 'idx_instances_series_id'
+          AND indexdef LIKE '%(series_id, instance_number)%'
+    ) THEN
+        DROP INDEX IF EXISTS idx_instances_series_id;
+        CREATE INDEX idx_instances_series_id ON instances (series_id, instance_number);
+    END IF;
+END
+$$;
@@ -0,0 +1,6 @@
+-- idx_studies_updated_at served the max(updated_at) ETag probe on /statistics, which
+-- now hashes its response body instead; the index only slowed every study upsert.
+-- Run once with:
+--   psql -U dcm -d dcmdb -f postgres/migrations/009_drop_studies_updated_at_index.sql
+
+DROP INDEX IF EXISTS idx_studies_updated_at;
@@ -0,0 +1,74 @@
+-- Hash-partition instances by series_id (16 partitions) so vacuum, reindex and
+-- bulk purges run per partition, and per-series reads touch one partition.
+-- Also swaps the studies date/deleted_at indexes for one partial index over live rows.
+-- Fresh installs get this layout from init.sql; run once with:
+--   psql -U dcm -d dcmdb -f postgres/migrations/010_partition_instances.sql
+-- Safe to re-run: the copy only happens while instances is a plain table.
+-- The copy holds an exclusive lock on instances; stop the poller while it runs.
+--
+-- Unique keys on a partitioned table must include the partition key, so the
+-- instance keys become (series_id, sop_instance_uid) and (series_id, orthanc_id);
+-- the ingester upserts on the former.
+--
+-- studies is deliberately not range-partitioned by study_date: study_uid and
+-- orthanc_id could then only be unique per date range (the ingest upsert needs
+-- them globally unique), series.study_id could no longer reference studies(id)
+-- alone, and study_date is nullable and changes on re-ingest.
+
+BEGIN;
+
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'instances'::regclass) THEN
+        RETURN;
+    END IF;
+
+    LOCK TABLE instances IN ACCESS EXCLUSIVE MODE;
+
+    CREATE TABLE instances_partitioned (
+        id                  UUID NOT NULL DEFAULT uuid_generate_v4(),
+        sop_instance_uid    TEXT NOT NULL,
+        orthanc_id          TEXT NOT NULL,
+        series_id           UUID NOT NULL REFERENCES series (id) ON DELETE CASCADE,
+        instance_number     INT,
+        sop_class_uid       TEXT,
+        transfer_syntax_uid TEXT,
+        raw_main_dicom_tags JSONB DEFAULT '{}',
+        deleted_at          TIMESTAMPTZ
+    ) PARTITION BY HASH (series_id);
+
+    FOR i IN 0..15 LOOP
+        EXECUTE format(
+            'CREATE TABLE instances_p%s PARTITION OF instances_partitioned '
+            'FOR VALUES WITH (MODULUS 16, REMAINDER %s)', lpad(i::text, 2, '0'), i
+        );
+    END LOOP;
+
+    INSERT INTO instances_partitioned (
+        id, sop_instance_uid, orthanc_id, series_id, instance_number,
+        sop_class_uid, transfer_syntax_uid, raw_main_dicom_tags, deleted_at
+    )
+    SELECT id, sop_instance_uid, orthanc_id, series_id, instance_number,
+           sop_class_uid, transfer_syntax_uid, raw_main_dicom_tags, deleted_at
+    FROM instances;
+
+    DROP TABLE instances;
+    ALTER TABLE instances_partitioned RENAME TO instances;
+
+    -- Keys and indexes are created after the copy (faster) and after the drop (names are free)
+    ALTER TABLE instances ADD CONSTRAINT instances_pkey PRIMARY KEY (id, series_id);
+    ALTER TABLE instances ADD CONSTRAINT instances_series_sop_instance_uid_key UNIQUE (series_id, sop_instance_uid);
+    ALTER TABLE instances ADD CONSTRAINT instances_series_orthanc_id_key UNIQUE (series_id, orthanc_id);
+    CREATE INDEX idx_instances_series_id ON instances (series_id, instance_number);
+END
+$$;
+
+-- Date filters on /studies and the statistics timeseries only ever read live rows;
+-- an index on deleted_at alone was never selective enough to be used.
+CREATE INDEX IF NOT EXISTS idx_studies_live_study_date ON studies (study_date) WHERE deleted_at IS NULL;
+DROP INDEX IF EXISTS idx_studies_study_date;
+DROP INDEX IF EXISTS idx_studies_deleted_at;
+
+COMMIT;
+
+ANALYZE instances;
@@ -0,0 +1,7 @@
+-- studies.body_parts was written on every ingest but never queried: the cohort body-part
+-- filter is a substring match, which runs against series and cannot use the array's GIN
+-- index. Drop both for databases that ran an earlier 001. Run once with:
+--   psql -U dcm -d dcmdb -f postgres/migrations/011_drop_studies_body_parts.sql
+
+DROP INDEX IF EXISTS idx_studies_body_parts;
+ALTER TABLE studies DROP COLUMN IF EXISTS body_parts;
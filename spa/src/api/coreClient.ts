@@ -28,19 +28,74 @@ export interface Series {
   num_instances: number
 }
 
-export interface StudyListResponse {
-  total: number
+// view=summary row: table columns only, series loaded on demand via fetchStudy
+export interface StudySummary {
+  id: string
+  study_uid: string
+  orthanc_id: string
+  patient_id: string | null
+  patient_name: string | null
+  patient_sex: string | null
+  study_date: string | null
+  study_description: string | null
+  institution_name: string | null
+  num_series: number
+  num_instances: number
+  modalities: string[]
+  ingested_at: string
+  deleted_at: string | null
+}
+
+export interface StudyListResponse<T = Study> {
+  view: 'full' | 'summary'
+  total: number | null
+  total_is_estimate: boolean
+  has_more: boolean
   page: number
   page_size: number
-  items: Study[]
+  items: T[]
 }
 
 export const fetchStudies = (params?: Record<string, string | number>) =>
   coreApi.get<StudyListResponse>('/studies', { params }).then(r => r.data)
 
+export const fetchStudySummaries = (params?: Record<string, string | number>) =>
+  coreApi.get<StudyListResponse<StudySummary>>('/studies', { params: { ...params, view: 'summary' } }).then(r => r.data)
+
+export interface StudyBatchResponse<T> {
+  view: 'full' | 'summary'
+  items: T[]
+  missing: string[]
+}
+
+export const fetchStudiesBatch = (ids: { study_uids?: string[]; orthanc_ids?: string[] }) =>
+  coreApi.post<StudyBatchResponse<StudySummary>>('/studies/batch', { ...ids, view: 'summary' }).then(r => r.data)
+
 export const fetchStudy = (uid: string) =>
   coreApi.get<Study>(`/studies/${uid}`).then(r => r.data)
 
+export interface Instance {
+  id: string
+  sop_instance_uid: string
+  orthanc_id: string
+  instance_number: number | null
+  sop_class_uid: string | null
+  transfer_syntax_uid: string | null
+  deleted_at: string | null
+}
+
+export interface InstanceListResponse {
+  total: number
+  page: number
+  page_size: number
+  items: Instance[]
+}
+
+export const fetchSeriesInstances = (studyUid: string, seriesUid: string, page = 1, pageSize = 100) =>
+  coreApi
+    .get<InstanceListResponse>(`/studies/${studyUid}/series/${seriesUid}/instances`, { params: { page, page_size: pageSize } })
+    .then(r => r.data)
+
 // Orthanc direct proxy (Vite maps /orthanc → http://localhost:8042)
 export const orthancApi = axios.create({ baseURL: '/orthanc' })
 
@@ -93,6 +148,15 @@ export interface InstanceBucket {
   count: number
 }
 
+// HyperLogLog estimates; standard_error is relative (0.016 = ±1.6%)
+export interface UniquePatients {
+  total: number
+  standard_error: number
+  by_institution: { institution: string; patients: number }[]
+  by_modality: { modality: string; patients: number }[]
+  by_month: { year_month: string; patients: number }[]
+}
+
 export interface Statistics {
   totals: StatisticsTotals
   studies_by_modality: ModalityCount[]
@@ -101,7 +165,43 @@ export interface Statistics {
   sex_distribution: SexCount[]
   body_parts: BodyPartCount[]
   instance_distribution: InstanceBucket[]
+  unique_patients: UniquePatients
+}
+
+export type StatisticsSection = keyof Statistics
+
+export const fetchStatistics = <K extends StatisticsSection = StatisticsSection>(sections?: K[]) =>
+  coreApi
+    .get<Pick<Statistics, K>>('/statistics', { params: sections ? { sections: sections.join(',') } : undefined })
+    .then(r => r.data)
+
+export interface TimeseriesPoint {
+  period_start: string
+  count: number
 }
 
-export const fetchStatistics = () =>
-  coreApi.get<Statistics>('/statistics').then(r => r.data)
+export interface Timeseries {
+  bucket: 'day' | 'week' | 'month' | 'year'
+  from: string | null
+  to: string | null
+  points: TimeseriesPoint[]
+}
+
+export const fetchStatisticsTimeseries = (params: {
+  bucket?: Timeseries['bucket']
+  from?: string
+  to?: string
+  modality?: string
+  institution?: string
+}) => coreApi.get<Timeseries>('/statistics/timeseries', { params }).then(r => r.data)
+
+// Server-Sent Events from GET /events; returns a function that closes the stream
+export type CoreEventType = 'study_ingested' | 'study_deleted' | 'resync'
+
+export const subscribeCoreEvents = (onEvent: (type: CoreEventType, data: unknown) => void) => {
+  const source = new EventSource('/api/core/events')
+  for (const type of ['study_ingested', 'study_deleted', 'resync'] as const) {
+    source.addEventListener(type, e => onEvent(type, JSON.parse((e as MessageEvent).data)))
+  }
+  return () => source.close()
+}
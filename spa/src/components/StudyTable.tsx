@@ -1,16 +1,40 @@
 import { useState } from 'react'
 import { useQuery, useMutation, useQueryClient } from '@tanstack/react-query'
-import { Study, fetchStudyLabels, addStudyLabel, removeStudyLabel } from '../api/coreClient'
+import { StudySummary, fetchStudy, fetchStudyLabels, addStudyLabel, removeStudyLabel } from '../api/coreClient'
 import { Trash2, ChevronRight, Plus, X } from 'lucide-react'
 
 interface Props {
-  studies: Study[]
+  studies: StudySummary[]
   onDeleteStudy: (orthancId: string) => void
   deletingOrthancId: string | null
 }
 
 const LABEL_REGEX = /^[a-zA-Z0-9_-]{1,64}$/
 
+function StudySeriesList({ studyUid }: { studyUid: string }) {
+  const { data: study, isLoading } = useQuery({
+    queryKey: ['study', studyUid],
+    queryFn: () => fetchStudy(studyUid),
+  })
+
+  if (isLoading) return <p className="text-xs text-slate-400 dark:text-slate-500">Loading series...</p>
+  if (!study || study.series.length === 0) return null
+
+  return (
+    <div>
+      <p className="font-semibold text-slate-700 dark:text-slate-200 mt-2 mb-1">Series:</p>
+      <ul className="ml-3 list-disc space-y-0.5 text-slate-600 dark:text-slate-300">
+        {study.series.map(sr => (
+          <li key={sr.id}>
+            {sr.modality ?? '?'} — {sr.series_description ?? sr.series_uid} ({sr.num_instances} inst)
+            {sr.body_part_examined && <span className="text-slate-400 dark:text-slate-500"> [{sr.body_part_examined}]</span>}
+          </li>
+        ))}
+      </ul>
+    </div>
+  )
+}
+
 function StudyLabelsPanel({ orthancId }: { orthancId: string }) {
   const qc = useQueryClient()
   const [newLabel, setNewLabel] = useState('')
@@ -185,19 +209,7 @@ export default function StudyTable({ studies, onDeleteStudy, deletingOrthancId }
                           <p><strong className="text-slate-700 dark:text-slate-200">Orthanc ID:</strong> <code className="font-mono text-slate-600 dark:text-slate-300 bg-slate-100 dark:bg-slate-700 px-1.5 py-0.5 rounded">{s.orthanc_id}</code></p>
                           <p><strong className="text-slate-700 dark:text-slate-200">Ingested:</strong> {new Date(s.ingested_at).toLocaleString()}</p>
                           {s.deleted_at && <p><strong className="text-slate-700 dark:text-slate-200">Deleted:</strong> {new Date(s.deleted_at).toLocaleString()}</p>}
-                          {s.series.length > 0 && (
-                            <div>
-                              <p className="font-semibold text-slate-700 dark:text-slate-200 mt-2 mb-1">Series:</p>
-                              <ul className="ml-3 list-disc space-y-0.5 text-slate-600 dark:text-slate-300">
-                                {s.series.map(sr => (
-                                  <li key={sr.id}>
-                                    {sr.modality ?? '?'} — {sr.series_description ?? sr.series_uid} ({sr.num_instances} inst)
-                                    {sr.body_part_examined && <span className="text-slate-400 dark:text-slate-500"> [{sr.body_part_examined}]</span>}
-                                  </li>
-                                ))}
-                              </ul>
-                            </div>
-                          )}
+                          <StudySeriesList studyUid={s.study_uid} />
                         </div>
 
                         {/* Labels panel — only for non-deleted studies */}
@@ -1,5 +1,6 @@
-import { useQuery } from '@tanstack/react-query'
-import { fetchStatistics, type Statistics } from '../api/coreClient'
+import { useEffect } from 'react'
+import { useQuery, useQueryClient } from '@tanstack/react-query'
+import { fetchStatistics, subscribeCoreEvents, type Statistics } from '../api/coreClient'
 import {
   BarChart,
   Bar,
@@ -32,6 +33,9 @@ const ACCENT_PALETTE = [
   '#f97316', '#8b5cf6', '#14b8a6', '#ef4444', '#a3e635',
 ]
 
+// Catalogue events arriving within this window share one statistics refetch
+const EVENT_REFETCH_MS = 3_000
+
 // ── Tiny helpers ────────────────────────────────────────────────────────────
 
 function KpiCard({
@@ -343,10 +347,28 @@ function InstanceDistributionChart({ data }: { data: Statistics['instance_distri
 export default function StatisticsPage() {
   const { data, isLoading, isError, refetch, isFetching } = useQuery({
     queryKey: ['statistics'],
-    queryFn: fetchStatistics,
+    queryFn: () => fetchStatistics(),
     staleTime: 60_000,
   })
 
+  // Refetch on catalogue changes, at most once per EVENT_REFETCH_MS: a bulk ingest
+  // sends an event per study, far more often than the charts need redrawing
+  const queryClient = useQueryClient()
+  useEffect(() => {
+    let timer: ReturnType<typeof setTimeout> | undefined
+    const unsubscribe = subscribeCoreEvents(() => {
+      if (timer !== undefined) return
+      timer = setTimeout(() => {
+        timer = undefined
+        queryClient.invalidateQueries({ queryKey: ['statistics'] })
+      }, EVENT_REFETCH_MS)
+    })
+    return () => {
+      clearTimeout(timer)
+      unsubscribe()
+    }
+  }, [queryClient])
+
   return (
     <div className="max-w-7xl mx-auto px-6 py-8">
       {/* Page header */}
@@ -1,12 +1,13 @@
 import { useState } from 'react'
 import { useQuery, useMutation, useQueryClient } from '@tanstack/react-query'
-import { fetchStudies, deleteStudy } from '../api/coreClient'
+import { fetchStudySummaries, deleteStudy } from '../api/coreClient'
 import StudyTable from '../components/StudyTable'
 import ConfirmDialog from '../components/ConfirmDialog'
 import { Database } from 'lucide-react'
 
 export default function StudiesPage() {
   const qc = useQueryClient()
+  const [search, setSearch] = useState('')
   const [modality, setModality] = useState('')
   const [sex, setSex] = useState('')
   const [dateFrom, setDateFrom] = useState('')
@@ -15,7 +16,8 @@ export default function StudiesPage() {
   const [includeDeleted, setIncludeDeleted] = useState(false)
   const [pendingDeleteOrthancId, setPendingDeleteOrthancId] = useState<string | null>(null)
 
-  const params: Record<string, string | number> = { page, page_size: 20 }
+  const params: Record<string, string | number> = { page, page_size: 20, count: 'estimate' }
+  if (search) { params.q = search; params.rank = 'true' }
   if (modality) params.modality = modality
   if (sex) params.patient_sex = sex
   if (dateFrom) params.study_date_from = dateFrom
@@ -24,7 +26,7 @@ export default function StudiesPage() {
 
   const { data, isLoading, isError } = useQuery({
     queryKey: ['studies', params],
-    queryFn: () => fetchStudies(params),
+    queryFn: () => fetchStudySummaries(params),
   })
 
   const deleteMutation = useMutation({
@@ -53,6 +55,10 @@ export default function StudiesPage() {
       {/* Filter Card */}
       <div className="bg-white dark:bg-slate-800 rounded-xl shadow-card border border-slate-100 dark:border-slate-700 p-6">
         <div className="flex flex-wrap gap-4 items-end">
+          <div>
+            <label className="block text-xs font-medium text-slate-500 dark:text-slate-400 uppercase tracking-wider mb-1">Search</label>
+            <input className={inputCls} value={search} onChange={e => { setSearch(e.target.value); setPage(1) }} placeholder="Patient, description, accession…" />
+          </div>
           <div>
             <label className="block text-xs font-medium text-slate-500 dark:text-slate-400 uppercase tracking-wider mb-1">Modality</label>
             <input className={inputCls} value={modality} onChange={e => { setModality(e.target.value); setPage(1) }} placeholder="CT" />
@@ -85,7 +91,7 @@ export default function StudiesPage() {
 
       {data && (
         <>
-          <p className="text-sm text-slate-500 dark:text-slate-400">{data.total} total studies</p>
+          <p className="text-sm text-slate-500 dark:text-slate-400">{data.total_is_estimate ? '~' : ''}{data.total} total studies</p>
           {/* Table Card */}
           <div className="bg-white dark:bg-slate-800 rounded-xl shadow-card border border-slate-100 dark:border-slate-700 overflow-hidden">
             <StudyTable
@@ -104,7 +110,7 @@ export default function StudiesPage() {
             </button>
             <span className="px-3 py-2 text-sm text-slate-600 dark:text-slate-300">Page {page}</span>
             <button
-              disabled={data.items.length < 20}
+              disabled={!data.has_more}
               onClick={() => setPage(p => p + 1)}
               className="px-4 py-2 text-sm font-medium bg-white dark:bg-slate-800 text-slate-700 dark:text-slate-200 border border-slate-300 dark:border-slate-600 rounded-lg hover:bg-slate-50 dark:hover:bg-slate-700 hover:border-slate-400 transition-all duration-200 disabled:opacity-40"
             >